@@ -135,6 +135,7 @@ export class CdkInfraKdsToS3Stack extends cdk.Stack {
       "StreamInitialPosition": "TRIM_HORIZON",
       "PartitionFormat": "yyyy-MM-dd-HH",
       "BootstrapStackName": cfnParams.get("BootstrapStackName")!.valueAsString,
+      "RecordFormat": cfnParams.get("RecordFormat")!.valueAsString,
     };
 
     const app = new MsfJavaApp(this, "kds-to-s3-java-app-test", {
@@ -181,6 +182,7 @@ export class CdkInfraKdsToS3Stack extends cdk.Stack {
     new KdsDataGenLambdaConstruct(this, "KdsDataGenLambda", {
       streamArn: kinesisStream.streamArn,
       numberOfItems: cfnParams.get("NumberOfItems")!.valueAsNumber,
+      recordFormat: cfnParams.get("RecordFormat")!.valueAsString,
     })
 
   } // constructor
@@ -247,6 +249,13 @@ export class CdkInfraKdsToS3Stack extends cdk.Stack {
       description: "Number of test data items to generate"
     }));
 
+    params.set("RecordFormat", new cdk.CfnParameter(this, "RecordFormat", {
+      type: "String",
+      default: "json",
+      allowedValues: ["json", "avro", "msgpack"],
+      description: "Encoding of the test data items, read by the Flink app in the same format"
+    }));
+
     return params;
   }
 
@@ -56,6 +56,7 @@ public class StreamingJob {
 	private static final String S3_DEST_KEY = "BucketName";
 	private static final String SINK_PARALLELISM_KEY = "SinkParallelism";
 	private static final String PARTITION_FORMAT_KEY = "PartitionFormat";
+	private static final String RECORD_FORMAT_KEY = "RecordFormat";
 	private static final String FLINK_APPLICATION_PROPERTIES = "BlueprintMetadata";
 
 	private static Properties getAppProperties() throws IOException {
@@ -107,11 +108,13 @@ public class StreamingJob {
 		String streamName = "myKinesisStream";
 		String regionStr = "us-east-1";
 		String streamInitPos = "LATEST";
+		String recordFormat = StockDeserializationSchema.JSON;
 
 		if(!isLocal(env)) {
 			streamName = appProperties.get(KINESIS_STREAM_NAME).toString();
 			regionStr = appProperties.get(AWS_REGION).toString();
 			streamInitPos = appProperties.get(STREAM_INITIAL_POSITION).toString();
+			recordFormat = appProperties.getOrDefault(RECORD_FORMAT_KEY, recordFormat).toString();
 		}
 
 		Configuration sourceConfig = new Configuration();
@@ -129,7 +132,7 @@ public class StreamingJob {
 		KinesisStreamsSource<Stock> kinesisStockSource = KinesisStreamsSource.<Stock>builder()
 				.setStreamArn(streamArn)
 				.setSourceConfig(sourceConfig)
-				.setDeserializationSchema(new StockDeserializationSchema())
+				.setDeserializationSchema(new StockDeserializationSchema(recordFormat))
 				.build();
 
 		return kinesisStockSource;
@@ -18,25 +18,76 @@
 
  package com.amazonaws.services.kinesisanalytics.stock;
 
+import com.fasterxml.jackson.databind.DeserializationFeature;
 import com.fasterxml.jackson.databind.ObjectMapper;
 import com.fasterxml.jackson.databind.json.JsonMapper;
 import com.fasterxml.jackson.datatype.jsr310.JavaTimeModule;
+import org.apache.avro.Schema;
+import org.apache.avro.io.BinaryDecoder;
+import org.apache.avro.io.DatumReader;
+import org.apache.avro.io.DecoderFactory;
+import org.apache.avro.reflect.ReflectData;
+import org.apache.avro.reflect.ReflectDatumReader;
 import org.apache.flink.api.common.serialization.AbstractDeserializationSchema;
+import org.msgpack.jackson.dataformat.MessagePackFactory;
 
 import java.io.IOException;
+import java.io.InputStream;
 
+/**
+ * Reads stock records in the formats produced by the KDS datagen: json, msgpack
+ * or avro binary datums written with StockSchema.avsc. Fields the Stock POJO
+ * does not have, like the optional payload padding records, are skipped.
+ */
 public class StockDeserializationSchema extends AbstractDeserializationSchema<Stock> {
     private static final long serialVersionUID = 1L;
 
+    public static final String JSON = "json";
+    public static final String MSGPACK = "msgpack";
+    public static final String AVRO = "avro";
+
+    private final String format;
+
     private transient ObjectMapper objectMapper;
+    private transient DatumReader<Stock> avroReader;
+    private transient BinaryDecoder avroDecoder;
+
+    public StockDeserializationSchema() {
+        this(JSON);
+    }
+
+    public StockDeserializationSchema(String format) {
+        if (!JSON.equals(format) && !MSGPACK.equals(format) && !AVRO.equals(format)) {
+            throw new IllegalArgumentException("Unknown record format: " + format);
+        }
+        this.format = format;
+    }
 
     @Override
-    public void open(InitializationContext context) {
-        objectMapper = JsonMapper.builder().build().registerModule(new JavaTimeModule());
+    public void open(InitializationContext context) throws IOException {
+        if (AVRO.equals(format)) {
+            Schema writerSchema;
+            try (InputStream in = StockDeserializationSchema.class.getResourceAsStream("/StockSchema.avsc")) {
+                writerSchema = new Schema.Parser().parse(in);
+            }
+            avroReader = new ReflectDatumReader<>(writerSchema, ReflectData.get().getSchema(Stock.class));
+        } else if (MSGPACK.equals(format)) {
+            objectMapper = new ObjectMapper(new MessagePackFactory())
+                    .disable(DeserializationFeature.FAIL_ON_UNKNOWN_PROPERTIES);
+        } else {
+            objectMapper = JsonMapper.builder()
+                    .disable(DeserializationFeature.FAIL_ON_UNKNOWN_PROPERTIES)
+                    .build()
+                    .registerModule(new JavaTimeModule());
+        }
     }
 
     @Override
     public Stock deserialize(byte[] bytes) throws IOException {
+        if (avroReader != null) {
+            avroDecoder = DecoderFactory.get().binaryDecoder(bytes, avroDecoder);
+            return avroReader.read(null, avroDecoder);
+        }
         return objectMapper.readValue(bytes, Stock.class);
     }
 } // class
\ No newline at end of file
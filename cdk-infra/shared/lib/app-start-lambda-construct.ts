@@ -16,13 +16,13 @@
  * SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
  */
 
-import { readFileSync } from "fs";
 import { StackProps } from 'aws-cdk-lib';
 import * as cdk from 'aws-cdk-lib';
 import { Construct } from 'constructs';
 import * as ec2 from 'aws-cdk-lib/aws-ec2';
 import * as iam from 'aws-cdk-lib/aws-iam';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
+import { pythonInlineCode } from './python-inline-code';
 
 export interface AppStartLambdaConstructProps extends StackProps {
     account: string,
@@ -37,24 +37,45 @@ export class AppStartLambdaConstruct extends Construct {
         super(scope, id);
 
 
+        const statusCheckRules = 'arn:aws:events:' + props.region + ':' + props.account + ':rule/msf-app-start-*';
+
         // Run app start lambda
         this.appStartLambdaFn = new lambda.SingletonFunction(this, 'AppStartFunction', {
             uuid: '97e4f730-4ee1-11e8-3c2d-fa7ae01b6ebc',
             lambdaPurpose: "Start MSF Application",
-            code: lambda.Code.fromInline(readFileSync(`${__dirname}/../../../python/lambda_msf_app_start.py`, "utf-8")),
+            code: pythonInlineCode("lambda_msf_app_start.py", ["cfnresponse", "handler_metrics", "aws_clients", "scheduled_check", "app_waiter"]),
             handler: "index.handler",
             initialPolicy: [
                 new iam.PolicyStatement(
                     {
                         actions: ['kinesisanalytics:DescribeApplication',
-                            'kinesisanalytics:StartApplication',],
+                            'kinesisanalytics:StartApplication',
+                            // RestartOnUpdate snapshots and stops the running app
+                            'kinesisanalytics:StopApplication',
+                            'kinesisanalytics:CreateApplicationSnapshot',
+                            'kinesisanalytics:DescribeApplicationSnapshot',],
 
                         resources: ['arn:aws:kinesisanalytics:' + props.region + ':' + props.account + ':application/' + props.appName]
+                    }),
+                // with the Async property the pending start is checked by a scheduled rule per request
+                new iam.PolicyStatement(
+                    {
+                        actions: ['events:PutRule',
+                            'events:PutTargets',
+                            'events:RemoveTargets',
+                            'events:DeleteRule',],
+
+                        resources: [statusCheckRules]
                     })
             ],
             timeout: cdk.Duration.seconds(600),
             runtime: lambda.Runtime.PYTHON_3_9,
             memorySize: 1024, // need extra memory for kafka-client
         });
+
+        this.appStartLambdaFn.addPermission('StatusCheckInvoke' + cdk.Names.uniqueId(this), {
+            principal: new iam.ServicePrincipal('events.amazonaws.com'),
+            sourceArn: statusCheckRules,
+        });
     }
 }
\ No newline at end of file
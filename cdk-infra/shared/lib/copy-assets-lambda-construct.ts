@@ -22,7 +22,7 @@ import { Construct } from 'constructs';
 import * as iam from 'aws-cdk-lib/aws-iam';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
 import { aws_s3 as s3 } from 'aws-cdk-lib';
-import { readFileSync } from "fs";
+import { pythonInlineCode } from './python-inline-code';
 
 
 
@@ -58,17 +58,21 @@ export class CopyAssetsLambdaConstruct extends Construct {
         // Run copy assets creation lambda
         this.copyAssetsLambdaFn = new lambda.SingletonFunction(this, 'CopyAssetsFunction', {
             uuid: '97e4f730-4ee1-11e8-3c2d-fa7ae01b6ebc',
-            code: lambda.Code.fromInline(readFileSync(`${__dirname}/../../../python/lambda_copy_assets_to_s3.py`, "utf-8")),
+            code: pythonInlineCode("lambda_copy_assets_to_s3.py", ["cfnresponse", "handler_metrics", "aws_clients", "asset_copier", "s3_cleanup"]),
             handler: "index.handler",
             initialPolicy: [
                 new iam.PolicyStatement(
                     {
                         actions: ["s3:PutObject",
                                 "s3:PutObjectAcl",
+                                "s3:AbortMultipartUpload",
                                 "s3:GetObject",
                                 "s3:GetObjectAcl",
                                 "s3:DeleteObject",
+                                "s3:DeleteObjectVersion",
                                 "s3:ListBucket",
+                                "s3:ListBucketVersions",
+                                "s3:GetBucketVersioning",
                                 "s3:GetBucketLocation"],
                         resources: ['arn:aws:s3:::' + props.AssetBucket + '/*',
                                     'arn:aws:s3:::' + props.AssetBucket]
@@ -77,6 +81,8 @@ export class CopyAssetsLambdaConstruct extends Construct {
             timeout: cdk.Duration.seconds(300),
             runtime: lambda.Runtime.PYTHON_3_9,
             memorySize: 256,
+            // assets above one part are spooled to /tmp while they are hashed, by up to 4 workers
+            ephemeralStorageSize: cdk.Size.mebibytes(2048),
             environment: {
                 AssetList: props.AssetList,
                 bucketName: props.AssetBucket,
@@ -24,7 +24,7 @@ import * as iam from 'aws-cdk-lib/aws-iam';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
 import { aws_logs as logs } from "aws-cdk-lib";
 import * as kinesisanalyticsv2 from "aws-cdk-lib/aws-kinesisanalyticsv2";
-import { readFileSync } from "fs";
+import { pythonInlineCode } from './python-inline-code';
 
 
 
@@ -58,11 +58,13 @@ export class CreateStudioApp extends Construct {
         const subnet1 = props.vpc!.selectSubnets({
             subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS}).subnetIds.at(0)!.toString();
 
+        const deleteCheckRules = 'arn:aws:events:' + props.region + ':' + props.account + ':rule/msf-studio-delete-*';
+
         // Run app creation lambda
         this.createStudioAppFn = new lambda.SingletonFunction(this, 'CreateStudioAppFn', {
             uuid: 'a0b1c0c0-bc70-44bb-a514-ff763aa4182f',
             lambdaPurpose: "Create MSF Studio Application",
-            code: lambda.Code.fromInline(readFileSync(`${__dirname}/../../../python/lambda_create_studio_app.py`, "utf-8")),
+            code: pythonInlineCode("lambda_create_studio_app.py", ["cfnresponse", "handler_metrics", "aws_clients", "scheduled_check", "record_format", "kds_producer", "datagen_schema", "studio_notes", "notebook_builder", "studio_connectors", "app_waiter"]),
             handler: "index.handler",
             initialPolicy: [
                 new iam.PolicyStatement(
@@ -72,7 +74,11 @@ export class CreateStudioApp extends Construct {
                         "kinesisanalytics:DeleteApplication",
                         "kinesisanalytics:DescribeApplication",
                         "kinesisanalytics:StartApplication",
-                        "kinesisanalytics:CreateApplication"],
+                        // a running app is stopped before its VPC configurations are detached
+                        "kinesisanalytics:StopApplication",
+                        "kinesisanalytics:CreateApplication",
+                        // updates apply changed sizing and connector properties
+                        "kinesisanalytics:UpdateApplication"],
                         resources: ['arn:aws:kinesisanalytics:' + props.region + ':' + props.account + ':application/' + props.msfAppName,
                                     props.serviceExecutionRole],
                         conditions: {
@@ -84,7 +90,16 @@ export class CreateStudioApp extends Construct {
                             }
                         }
                     }),
+                // a delete outlasting the function is resumed by a scheduled rule per request
+                new iam.PolicyStatement(
+                    {
+                        actions: ['events:PutRule',
+                            'events:PutTargets',
+                            'events:RemoveTargets',
+                            'events:DeleteRule',],
 
+                        resources: [deleteCheckRules]
+                    }),
             ],
             timeout: cdk.Duration.seconds(300),
             runtime: lambda.Runtime.PYTHON_3_9,
@@ -106,5 +121,10 @@ export class CreateStudioApp extends Construct {
                 bootstrapStackName: props!.bootstrapStackName,
               },
         });
+
+        this.createStudioAppFn.addPermission('DeleteCheckInvoke' + cdk.Names.uniqueId(this), {
+            principal: new iam.ServicePrincipal('events.amazonaws.com'),
+            sourceArn: deleteCheckRules,
+        });
     }
 }
\ No newline at end of file
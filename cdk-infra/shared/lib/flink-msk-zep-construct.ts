@@ -45,6 +45,12 @@ export interface FlinkMSKZepContructProps extends StackProps {
   runZepNotebookAssetBucket: string;
   runZepNotebookAssetKey: string;
   bootstrapStackName: string;
+  // sizing of the Studio app, 4 KPUs without autoscaling by default
+  parallelism?: number;
+  parallelismPerKpu?: number;
+  autoscalingEnabled?: boolean;
+  // connector artifact bundles, see python/studio_connectors.py, kafka, kinesis and msk-iam by default
+  connectorBundles?: string[];
 }
 
 export class FlinkMSKZepContstruct extends Construct {
@@ -73,7 +79,13 @@ export class FlinkMSKZepContstruct extends Construct {
 
 
     const createAppResource = new cdk.CustomResource(this, 'CreateAppResource', {
-      serviceToken: createStudioAppConstruct.createStudioAppFn.functionArn
+      serviceToken: createStudioAppConstruct.createStudioAppFn.functionArn,
+      properties: {
+        Parallelism: props.parallelism,
+        ParallelismPerKpu: props.parallelismPerKpu,
+        AutoscalingEnabled: props.autoscalingEnabled,
+        ConnectorBundles: props.connectorBundles,
+      }
     });
 
     // 👇 create an output for create app response
@@ -16,17 +16,20 @@
  * SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
  */
 
-import {readFileSync} from 'fs';
 import { StackProps } from 'aws-cdk-lib';
 import * as cdk from 'aws-cdk-lib';
 import { Construct } from 'constructs';
 import * as iam from 'aws-cdk-lib/aws-iam';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
+import { pythonInlineCode } from './python-inline-code';
 
 
 export interface KdsDataGenLambdaConstructProps extends StackProps {
     streamArn: string,
     numberOfItems: number,
+    inFlightRequests?: number,
+    recordFormat?: string,
+    aggregateRecords?: boolean,
 }
 
 export class KdsDataGenLambdaConstruct extends Construct {
@@ -38,12 +41,12 @@ export class KdsDataGenLambdaConstruct extends Construct {
         // Run KDS DataGen Lambda
         this.kdsDataGenLambdaFn = new lambda.SingletonFunction(this, 'KdsDataGenFunction', {
             uuid: "e7e4ed0b-1438-4552-94ae-5edfb84ac21c",
-            code: lambda.Code.fromInline(readFileSync(`${__dirname}/../../../python/lambda_kds_datagen.py`, "utf-8")),
+            code: pythonInlineCode("lambda_kds_datagen.py", ["cfnresponse", "handler_metrics", "aws_clients", "record_format", "kds_producer", "datagen_schema"]),
             handler: "index.handler",
             initialPolicy: [
                 new iam.PolicyStatement(
                     {
-                        actions: ["kinesis:PutRecord"],
+                        actions: ["kinesis:PutRecord", "kinesis:PutRecords"],
                         resources: [props.streamArn]
                     })
             ],
@@ -56,7 +59,10 @@ export class KdsDataGenLambdaConstruct extends Construct {
             serviceToken: this.kdsDataGenLambdaFn.functionArn,
             properties: {
                 StreamArn: props.streamArn,
-                NumberOfItems: props.numberOfItems
+                NumberOfItems: props.numberOfItems,
+                InFlightRequests: props.inFlightRequests ?? 1,
+                RecordFormat: props.recordFormat ?? "json",
+                AggregateRecords: props.aggregateRecords ?? false
             }
           });
 
@@ -1,9 +1,9 @@
-import { readFileSync } from 'fs';
 import { StackProps } from "aws-cdk-lib";
 import { Construct } from "constructs";
 import * as cdk from 'aws-cdk-lib';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
 import * as iam from 'aws-cdk-lib/aws-iam';
+import { pythonInlineCode } from './python-inline-code';
 
 export enum MsfRuntimeEnvironment {
     FLINK_1_11 = "FLINK-1_11",
@@ -33,9 +33,20 @@ export interface MsfJavaAppProps extends StackProps {
     parallelism?: Number;
     parallelismPerKpu?: Number;
     autoscalingEnabled?: Boolean;
+    // STATEFUL or STATELESS, picks the defaults of the checkpoint, snapshot, autoscaling and monitoring settings
+    jobType?: string;
+    checkpointingEnabled?: Boolean;
     checkpointInterval?: Number;
     minPauseBetweenCheckpoints?: Number;
+    snapshotsEnabled?: Boolean;
+    // APPLICATION, OPERATOR, TASK or PARALLELISM
+    metricsLevel?: string;
+    logLevel?: string;
     applicationProperties?: Object;
+    // sizing mode, parallelism and checkpoint interval are recommended for the expected load
+    expectedRecordsPerSecond?: Number;
+    averageRecordBytes?: Number;
+    sourceShardCount?: Number;
 }
 
 // MsfJavaApp construct is used to create a new Java blueprint application.
@@ -45,13 +56,15 @@ export interface MsfJavaAppProps extends StackProps {
 // to the application which changes its initial version to 2. This is not 
 // desired for blueprints functionality in AWS console.
 export class MsfJavaApp extends Construct {
+    public customResource: cdk.CustomResource;
+
     constructor(scope: Construct, id: string, props: MsfJavaAppProps) {
         super(scope, id);
 
         const fn = new lambda.SingletonFunction(this, 'MsfJavaAppCustomResourceHandler', {
             uuid: 'c4e1d42d-595a-4bd6-99e9-c299b61f2358',
             lambdaPurpose: "Deploy an MSF app created created with Java",
-            code: lambda.Code.fromInline(readFileSync(`${__dirname}/../../../python/msf_java_app_custom_resource_handler.py`, "utf-8")),
+            code: pythonInlineCode("msf_java_app_custom_resource_handler.py", ["cfnresponse", "handler_metrics", "aws_clients", "app_waiter", "parallelism_advisor"]),
             handler: "index.handler",
             initialPolicy: [
                 new iam.PolicyStatement(
@@ -78,6 +91,7 @@ export class MsfJavaApp extends Construct {
                 actions: [
                     'kinesisanalytics:DescribeApplication',
                     'kinesisanalytics:CreateApplication',
+                    'kinesisanalytics:UpdateApplication',
                     'kinesisanalytics:DeleteApplication',
                 ],
                 resources: ['arn:aws:kinesisanalytics:' + props.region + ':' + props.account + ':application/' + props.appName]
@@ -86,9 +100,6 @@ export class MsfJavaApp extends Construct {
         const defaultProps = {
             parallelism: 2,
             parallelismPerKpu: 1,
-            autoscalingEnabled: false,
-            checkpointInterval: 60000,
-            minPauseBetweenCheckpoints: 5000,
             applicationProperties: {}
         };
 
@@ -96,7 +107,7 @@ export class MsfJavaApp extends Construct {
 
         const logStreamArn = `arn:${props.partition}:logs:${props.region}:${props.account}:log-group:${props.logGroupName}:log-stream:${props.logStreamName}`;
         const bucketArn = `arn:${props.partition}:s3:::${props.bucketName}`;
-        new cdk.CustomResource(this, `MSFJavaApp${id}`, {
+        this.customResource = new cdk.CustomResource(this, `MSFJavaApp${id}`, {
             serviceToken: fn.functionArn,
             properties:
             {
@@ -111,9 +122,17 @@ export class MsfJavaApp extends Construct {
                 Parallelism: props.parallelism,
                 ParallelismPerKpu: props.parallelismPerKpu,
                 AutoscalingEnabled: props.autoscalingEnabled,
+                JobType: props.jobType,
+                CheckpointingEnabled: props.checkpointingEnabled,
                 CheckpointInterval: props.checkpointInterval,
                 MinPauseBetweenCheckpoints: props.minPauseBetweenCheckpoints,
-                ApplicationProperties: props.applicationProperties
+                SnapshotsEnabled: props.snapshotsEnabled,
+                MetricsLevel: props.metricsLevel,
+                LogLevel: props.logLevel,
+                ApplicationProperties: props.applicationProperties,
+                ExpectedRecordsPerSecond: props.expectedRecordsPerSecond,
+                AverageRecordBytes: props.averageRecordBytes,
+                SourceShardCount: props.sourceShardCount,
             }
         });
     }
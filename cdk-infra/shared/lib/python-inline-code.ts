@@ -0,0 +1,55 @@
+/*
+ * Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ * Apache-2.0
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy of this
+ * software and associated documentation files (the "Software"), to deal in the Software
+ * without restriction, including without limitation the rights to use, copy, modify,
+ * merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+ * permit persons to whom the Software is furnished to do so.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+ * INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+ * PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+ * HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ * OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+ * SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ */
+
+import { readFileSync } from 'fs';
+import * as lambda from 'aws-cdk-lib/aws-lambda';
+
+const pythonDir = `${__dirname}/../../../python`;
+
+// Blueprint templates must synthesize into standalone CloudFormation templates,
+// so python handlers are deployed as single file inline code. Shared modules
+// from the python/ directory are embedded ahead of the handler source and
+// registered in sys.modules, which lets the handler keep its regular imports.
+// Modules must be listed after the shared modules they import.
+export function pythonInlineCode(handlerFile: string, sharedModules: string[] = []): lambda.InlineCode {
+    const handlerSource = readFileSync(`${pythonDir}/${handlerFile}`, "utf-8");
+    if (sharedModules.length === 0) {
+        return lambda.Code.fromInline(handlerSource);
+    }
+
+    const lines = [
+        "import sys as _sys",
+        "import types as _types",
+        "",
+        "",
+        "def _register_module(name, source):",
+        "    module = _types.ModuleType(name)",
+        "    module.__file__ = name + '.py'",
+        "    _sys.modules[name] = module",
+        "    exec(compile(source, module.__file__, 'exec'), module.__dict__)",
+        "",
+        "",
+    ];
+    for (const moduleName of sharedModules) {
+        const moduleSource = readFileSync(`${pythonDir}/${moduleName}.py`, "utf-8");
+        lines.push(`_register_module(${JSON.stringify(moduleName)}, ${JSON.stringify(moduleSource)})`);
+    }
+    lines.push("", "");
+
+    return lambda.Code.fromInline(lines.join("\n") + handlerSource);
+}
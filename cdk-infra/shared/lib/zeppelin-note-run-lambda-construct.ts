@@ -56,7 +56,8 @@ export class ZeppelinNoteRunConstruct extends Construct {
                         resources: ['arn:aws:kinesisanalytics:' + props.region + ':' + props.account + ':application/' + props.appName]
                     })
             ],
-            timeout: cdk.Duration.seconds(120),
+            // polls until the streaming jobs of the note run, see timeout_seconds of lambda_function.py
+            timeout: cdk.Duration.seconds(600),
             runtime: lambda.Runtime.PYTHON_3_9,
             memorySize: 256,
             environment: {
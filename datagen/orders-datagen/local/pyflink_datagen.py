@@ -4,10 +4,15 @@ from pyflink.table import DataTypes
 from pyflink.table.udf import udf
 from pyflink.table.expressions import lit, col, call
 import os
+import sys
 import pathlib
 from pathlib import Path
 import json
 
+# the order schema is shared with the other blueprint data generators
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..", "..", "python"))
+import datagen_schema
+
 
 env_settings = EnvironmentSettings \
     .new_instance() \
@@ -78,27 +83,14 @@ def kafka_dest_main():
         """
 
     table_env.execute_sql("DROP TABLE IF EXISTS datagen_source")
+    orders = datagen_schema.orders_schema()
     source_ddl = f"""
         CREATE TABLE IF NOT EXISTS datagen_source (
-            product_id   BIGINT,
-            order_number BIGINT,
-            quantity     INT,
-            price_int    INT,
-            price        AS CAST(price_int/100.0 AS DECIMAL(32, 2)),
-            buyer        STRING,
-            order_time   TIMESTAMP(3)
+{orders.flink_columns(indent="            ")},
+            price        AS CAST(price_int/100.0 AS DECIMAL(32, 2))
         )
         WITH (
-            'connector'= 'datagen',
-            'fields.product_id.min' = '1',
-            'fields.product_id.max' = '99999',
-            'fields.quantity.min' = '1',
-            'fields.quantity.max' = '25',
-            'fields.price_int.min' = '29',
-            'fields.price_int.max' = '99999999',
-            'fields.order_number.min' = '1',
-            'fields.order_number.max' = '9999999999',
-            'fields.buyer.length' = '15'
+{orders.flink_datagen_options(indent="            ")}
         )
         """
 
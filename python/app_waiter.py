@@ -0,0 +1,176 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import logging
+import random
+import time
+
+import aws_clients
+import handler_metrics
+
+LOGGER = logging.getLogger(__name__)
+
+# Polling backoff, every delay is drawn from [delay / 2, delay] to spread concurrent deployments
+initial_delay_seconds = 1
+max_delay_seconds = 20
+backoff_multiplier = 2
+
+# time kept in reserve to report the outcome to CloudFormation
+safety_margin_seconds = 10
+
+throttling_error_codes = ('ThrottlingException', 'TooManyRequestsException', 'Throttling', 'RequestLimitExceeded')
+
+# statuses an application passes through on its own
+transitional_statuses = ('STARTING', 'STOPPING', 'UPDATING', 'AUTOSCALING', 'FORCE_STOPPING',
+                         'ROLLING_BACK', 'MAINTENANCE')
+
+
+class Deadline:
+    '''Time left for waiting, from the Lambda context when there is one'''
+
+    def __init__(self, context=None, default_seconds=300, clock=time.monotonic):
+        self.clock = clock
+        seconds = default_seconds
+        if hasattr(context, 'get_remaining_time_in_millis'):
+            seconds = context.get_remaining_time_in_millis() / 1000
+        self.expires = clock() + seconds - safety_margin_seconds
+
+    def remaining(self):
+        return self.expires - self.clock()
+
+
+class Backoff:
+    '''Exponential backoff with jitter, never sleeping past the deadline'''
+
+    def __init__(self, deadline, sleep=None):
+        self.deadline = deadline
+        self.sleep = sleep or time.sleep
+        self.delay = initial_delay_seconds
+
+    def wait(self, reason):
+        remaining = self.deadline.remaining()
+        if remaining <= 0:
+            LOGGER.error("Timed out %s", reason)
+            raise Exception('Operation timed out')
+        self.sleep(min(remaining, random.uniform(self.delay / 2, self.delay)))
+        self.delay = min(max_delay_seconds, self.delay * backoff_multiplier)
+
+
+def is_throttling(e):
+    return aws_clients.error_code(e) in throttling_error_codes
+
+
+def call(fn, backoff, **kwargs):
+    '''Call an API, backing off and retrying while it is throttled'''
+    while True:
+        try:
+            return fn(**kwargs)
+        except Exception as e:
+            if not is_throttling(e):
+                raise
+            LOGGER.warning("Throttled calling %s, backing off", getattr(fn, '__name__', fn))
+            backoff.wait("retrying throttled requests")
+
+
+def application_detail(client, app_name, backoff):
+    '''Description of the application, None when it does not exist'''
+    try:
+        return call(client.describe_application, backoff, ApplicationName=app_name)['ApplicationDetail']
+    except Exception as e:
+        if aws_clients.error_code(e) == 'ResourceNotFoundException':
+            return None
+        raise
+
+
+def application_status(client, app_name, backoff):
+    '''Current status of the application, None when it does not exist'''
+    detail = application_detail(client, app_name, backoff)
+    return None if detail is None else detail.get('ApplicationStatus')
+
+
+def backoff_for(context=None, default_seconds=300, sleep=None, clock=time.monotonic):
+    '''Backoff bounded by the remaining time of the Lambda, or `default_seconds` without a context'''
+    return Backoff(Deadline(context, default_seconds, clock), sleep)
+
+
+@handler_metrics.timed('wait_for_status')
+def wait_while(client, app_name, statuses, backoff):
+    '''Poll the application until its status is not one of `statuses` and return that status
+
+    Polling backs off exponentially and gives up before the deadline of
+    `backoff`, None is returned once the application does not exist.
+    '''
+    while True:
+        status = application_status(client, app_name, backoff)
+        if status not in statuses:
+            LOGGER.info("Application %s status: %s", app_name, status)
+            return status
+        LOGGER.info("Application %s is still %s", app_name, status)
+        backoff.wait(f"waiting for application {app_name} to leave {status}")
+
+
+def start_application(client, app_name, backoff, run_configuration=None):
+    '''Start the application when it is READY and wait until it is RUNNING'''
+    if application_status(client, app_name, backoff) == "READY":
+        # We assume that after a successful invocation of this API
+        # application would not be in READY state.
+        kwargs = {'RunConfiguration': run_configuration} if run_configuration else {}
+        call(client.start_application, backoff, ApplicationName=app_name, **kwargs)
+    status = wait_while(client, app_name, ["STARTING"], backoff)
+    if status != "RUNNING":
+        raise Exception(f"Unable to start the app in state: {status}")
+    return status
+
+
+def stop_application(client, app_name, backoff):
+    '''Stop the application when it is RUNNING and wait until it is READY'''
+    if application_status(client, app_name, backoff) == "RUNNING":
+        call(client.stop_application, backoff, ApplicationName=app_name)
+    status = wait_while(client, app_name, ["STOPPING", "FORCE_STOPPING"], backoff)
+    if status != "READY":
+        raise Exception(f"Unable to stop the app in state: {status}")
+    return status
+
+
+def delete_application(client, app_name, backoff):
+    '''Delete the application once it is not changing state and wait until it is gone'''
+    detail = application_detail(client, app_name, backoff)
+    if detail is None:
+        LOGGER.info("Application %s doesn't exist or is already deleted", app_name)
+        return None
+    LOGGER.info("Application %s exists, going to delete it %s", app_name, detail)
+
+    if detail.get("ApplicationStatus") in transitional_statuses:
+        # an app cannot be deleted while it is changing state
+        wait_while(client, app_name, transitional_statuses, backoff)
+
+    response = call(client.delete_application, backoff,
+                    ApplicationName=app_name, CreateTimestamp=detail["CreateTimestamp"])
+    LOGGER.info("Delete response %s", response)
+
+    # the app is deleted asynchronously
+    return wait_while(client, app_name, ["DELETING"], backoff)
+
+
+def snapshot_status(client, app_name, snapshot_name, backoff):
+    response = call(client.describe_application_snapshot, backoff,
+                    ApplicationName=app_name, SnapshotName=snapshot_name)
+    return response['SnapshotDetails']['SnapshotStatus']
+
+
+def create_snapshot(client, app_name, backoff, snapshot_name):
+    '''Snapshot a RUNNING application and wait until the snapshot is READY'''
+    status = application_status(client, app_name, backoff)
+    if status != "RUNNING":
+        raise Exception(f"Unable to snapshot the app in state: {status}")
+    call(client.create_application_snapshot, backoff, ApplicationName=app_name, SnapshotName=snapshot_name)
+    with handler_metrics.phase('wait_for_snapshot'):
+        while True:
+            status = snapshot_status(client, app_name, snapshot_name, backoff)
+            if status != "CREATING":
+                break
+            backoff.wait(f"waiting for snapshot {snapshot_name} of application {app_name}")
+    if status != "READY":
+        raise Exception(f"Unable to snapshot the app, snapshot {snapshot_name} is {status}")
+    LOGGER.info("Application %s snapshot %s is READY", app_name, snapshot_name)
+    return status
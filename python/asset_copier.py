@@ -0,0 +1,178 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import hashlib
+import logging
+import tempfile
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+import aws_clients
+import handler_metrics
+
+LOGGER = logging.getLogger(__name__)
+
+# every part but the last must be at least 5 MiB, the same size is read from the response at a time
+part_size = 8 * 1024 * 1024
+default_max_workers = 4
+http_timeout_seconds = 60
+
+# object metadata recording the content digest and the HTTP validators of the source
+digest_key = 'sha256'
+etag_key = 'source-etag'
+last_modified_key = 'source-last-modified'
+
+
+def s3_key_of(url):
+    return url.rsplit('/', 1)[-1]
+
+
+def read_part(response):
+    '''Read up to `part_size` bytes, a single read may return less than asked for'''
+    chunks = []
+    remaining = part_size
+    while remaining > 0:
+        chunk = response.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def stored_metadata(s3_client, bucket, key):
+    '''Metadata of the current copy of an asset, empty when there is none'''
+    try:
+        return s3_client.head_object(Bucket=bucket, Key=key)['Metadata']
+    except Exception as e:
+        if aws_clients.error_code(e) in ('404', 'NoSuchKey', 'NotFound'):
+            return {}
+        raise
+
+
+def source_metadata(response):
+    headers = {etag_key: response.headers.get('ETag'), last_modified_key: response.headers.get('Last-Modified')}
+    return {k: v for k, v in headers.items() if v}
+
+
+def conditional_headers(stored):
+    headers = {}
+    if etag_key in stored:
+        headers['If-None-Match'] = stored[etag_key]
+    if last_modified_key in stored:
+        headers['If-Modified-Since'] = stored[last_modified_key]
+    return headers
+
+
+def replace_metadata(s3_client, bucket, key, metadata):
+    # an in place copy is the only way to change the metadata of an object
+    s3_client.copy_object(Bucket=bucket, Key=key, CopySource={'Bucket': bucket, 'Key': key},
+                          Metadata=metadata, MetadataDirective='REPLACE')
+
+
+def upload_stream(s3_client, response, bucket, key, metadata=None, stored_digest=None):
+    '''Stream a file like object into S3, holding at most one part in memory
+
+    Returns the size and SHA-256 digest of the stream and whether it was stored,
+    content matching `stored_digest` is not stored again.
+    '''
+    metadata = dict(metadata or {})
+    digest = hashlib.sha256()
+    part = read_part(response)
+    digest.update(part)
+    if len(part) < part_size:
+        if digest.hexdigest() == stored_digest:
+            return len(part), stored_digest, False
+        metadata[digest_key] = digest.hexdigest()
+        s3_client.put_object(Bucket=bucket, Key=key, Body=part, Metadata=metadata)
+        return len(part), metadata[digest_key], True
+
+    # larger streams are spooled to local storage while they are hashed, so
+    # identical content is detected before anything is uploaded and the digest
+    # is part of the metadata the multipart upload creates the object with
+    with tempfile.TemporaryFile() as spool:
+        size = 0
+        while part:
+            spool.write(part)
+            size += len(part)
+            part = read_part(response)
+            digest.update(part)
+        if digest.hexdigest() == stored_digest:
+            return size, stored_digest, False
+        metadata[digest_key] = digest.hexdigest()
+        spool.seek(0)
+        upload_parts(s3_client, spool, bucket, key, metadata)
+    return size, metadata[digest_key], True
+
+
+def upload_parts(s3_client, stream, bucket, key, metadata):
+    upload_id = s3_client.create_multipart_upload(Bucket=bucket, Key=key, Metadata=metadata)['UploadId']
+    try:
+        parts = []
+        part = read_part(stream)
+        while part:
+            number = len(parts) + 1
+            result = s3_client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                           PartNumber=number, Body=part)
+            parts.append({'ETag': result['ETag'], 'PartNumber': number})
+            part = read_part(stream)
+        s3_client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                            MultipartUpload={'Parts': parts})
+    except Exception:
+        s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+
+def copy_asset(s3_client, url, bucket):
+    '''Copy a single asset from its URL to the bucket, keyed by its file name
+
+    Assets whose source is unchanged since the last copy are skipped with a
+    conditional request, identical content is not uploaded again. Returns the
+    key and whether the asset was copied.
+    '''
+    key = s3_key_of(url)
+    stored = stored_metadata(s3_client, bucket, key)
+    request = urllib.request.Request(url, headers=conditional_headers(stored))
+    try:
+        # the body is streamed by upload_stream, this is the time to the response headers
+        with handler_metrics.phase('download'):
+            response = urllib.request.urlopen(request, timeout=http_timeout_seconds)
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            raise
+        LOGGER.info("Skipped %s, not modified since the last copy", url)
+        return key, False
+    with response:
+        metadata = source_metadata(response)
+        size, digest, copied = upload_stream(s3_client, response, bucket, key, metadata,
+                                             stored.get(digest_key))
+    if not copied:
+        metadata[digest_key] = digest
+        if metadata != stored:
+            # remember the new validators, so the next copy can skip the download
+            replace_metadata(s3_client, bucket, key, metadata)
+        LOGGER.info("Skipped %s, s3://%s/%s holds identical content", url, bucket, key)
+        return key, False
+    LOGGER.info("Copied %s to s3://%s/%s (%d bytes)", url, bucket, key, size)
+    return key, True
+
+
+def copy_assets(s3_client, urls, bucket, max_workers=default_max_workers):
+    '''Copy assets concurrently with a bounded worker pool sharing one S3 client
+
+    Returns (key, copied) pairs. Raises the first failure, assets that did not
+    start yet are not copied.
+    '''
+    keys = [s3_key_of(url) for url in urls]
+    if len(set(keys)) != len(keys):
+        raise Exception(f"Assets must have distinct file names: {urls}")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(copy_asset, s3_client, url, bucket) for url in urls]
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+        for future in futures:
+            if future in done and future.exception() is not None:
+                raise future.exception()
+    return [f.result() for f in futures]
@@ -0,0 +1,42 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+# boto3 clients shared by all invocations of a Lambda container. Creating a
+# client loads its service model, which takes longer than most API calls, so
+# each client is created once, on first use, and reused by warm invocations.
+
+import threading
+
+import handler_metrics
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def client(service_name, max_pool_connections=None):
+    '''Client of the default session, with a connection pool of at least `max_pool_connections`
+
+    The client times its API calls, see handler_metrics.
+    '''
+    key = (service_name, max_pool_connections)
+    with _lock:
+        if key not in _clients:
+            # requests that need no client, like most deletes, never import boto3
+            import boto3
+            kwargs = {}
+            if max_pool_connections:
+                from botocore.config import Config
+                kwargs['config'] = Config(max_pool_connections=max_pool_connections)
+            _clients[key] = handler_metrics.TimedClient(boto3.client(service_name, **kwargs))
+        return _clients[key]
+
+
+def clear():
+    with _lock:
+        _clients.clear()
+
+
+def error_code(e):
+    '''Error code of a botocore ClientError, None for any other exception'''
+    response = getattr(e, 'response', None)
+    return response.get('Error', {}).get('Code') if isinstance(response, dict) else None
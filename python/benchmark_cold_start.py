@@ -0,0 +1,130 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+import aws_clients
+
+python_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class StubClient:
+    '''Answers every API call of a handler scenario without leaving the process'''
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def __getattr__(self, name):
+        response = self.responses[name]
+        return lambda **kwargs: response(kwargs) if callable(response) else response
+
+
+def not_found(kwargs):
+    error = Exception("ResourceNotFoundException")
+    error.response = {'Error': {'Code': 'ResourceNotFoundException'}}
+    raise error
+
+
+java_app_props = {
+    "AppName": "app", "RuntimeEnvironment": "FLINK-1_15", "ServiceExecutionRole": "role",
+    "BucketArn": "bucket", "FileKey": "key", "LogStreamArn": "log-stream", "ApplicationProperties": {},
+}
+
+studio_environment = {name: "x" for name in [
+    "app_name", "execution_role", "bootstrap_string", "bootstrapStackName", "subnet_1", "source_topic_name",
+    "security_group", "glue_db_arn", "log_stream_arn", "RuntimeEnvironment", "blueprintName", "stackId"]}
+
+# handler module, event and the stubbed API responses of a typical request
+scenarios = {
+    'lambda_msf_app_start': (
+        {"RequestType": "Create", "ResourceProperties": {"AppName": "app"}},
+        {'describe_application': {"ApplicationDetail": {"ApplicationStatus": "RUNNING"}}}),
+    'msf_java_app_custom_resource_handler': (
+        {"RequestType": "Create", "ResourceProperties": java_app_props},
+        {'describe_application': {"ApplicationDetail": {"ApplicationStatus": "RUNNING"}}}),
+    'lambda_copy_assets_to_s3': (
+        {"RequestType": "Delete", "ResourceProperties": {}},
+        {'get_bucket_versioning': {}, 'list_objects_v2': {}}),
+    'lambda_kds_datagen': (
+        {"RequestType": "Create", "ResourceProperties": {"StreamArn": "arn", "NumberOfItems": "500"}},
+        {'put_records': lambda kwargs: {'FailedRecordCount': 0, 'Records': [{} for _ in kwargs['Records']]}}),
+    'lambda_create_studio_app': (
+        {"RequestType": "Delete", "ResourceProperties": {}},
+        {'describe_application': not_found}),
+}
+
+
+def cold_import_seconds(module, repeat):
+    '''Median time to import a handler in a fresh interpreter, like the init phase of a new container'''
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], cwd=python_dir, check=True,
+                                capture_output=True, text=True).stdout
+        timings.append(float(output.split()[-1]))
+    return statistics.median(timings)
+
+
+def client_creation_seconds(service_name):
+    '''Time to get a client from the registry, first created and then reused'''
+    aws_clients.clear()
+    start = time.perf_counter()
+    aws_clients.client(service_name)
+    created = time.perf_counter() - start
+    start = time.perf_counter()
+    aws_clients.client(service_name)
+    return created, time.perf_counter() - start
+
+
+def warm_invocation_seconds(module_name, repeat):
+    '''Median latency of warm invocations with stubbed AWS APIs'''
+    event, responses = scenarios[module_name]
+    module = __import__(module_name)
+    context = MagicMock(log_stream_name="log-stream")
+    del context.get_remaining_time_in_millis
+    with patch("boto3.client", lambda service, **kwargs: StubClient(responses)), \
+            patch("cfnresponse.send"), patch.dict(os.environ, {"bucketName": "bucket", **studio_environment}), \
+            contextlib.redirect_stdout(io.StringIO()):
+        aws_clients.clear()
+        module.handler(event, context)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            module.handler(event, context)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure cold start import time and warm invocation latency of the custom resource handlers")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per handler import")
+    parser.add_argument("--invocations", type=int, default=50, help="Warm invocations per handler")
+    args = parser.parse_args()
+
+    # client creation needs a region but no credentials
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'handler':<40} {'cold import':>12} {'warm invocation':>16}")
+    for module in scenarios:
+        cold = cold_import_seconds(module, args.repeat)
+        warm = warm_invocation_seconds(module, args.invocations)
+        print(f"{module:<40} {cold * 1000:>9.1f} ms {warm * 1000:>13.2f} ms")
+    print()
+    for service in ['kinesisanalyticsv2', 'kinesis', 's3']:
+        created, reused = client_creation_seconds(service)
+        print(f"{service} client: created in {created * 1000:.1f} ms, reused in {reused * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import argparse
+import datetime
+import json
+import random
+import time
+
+import datagen_schema
+import kds_producer
+import record_format
+
+
+def get_data():
+    return {
+        'event_time': datetime.datetime.now().isoformat(),
+        'ticker': random.choice(datagen_schema.stock_tickers),
+        'price': round(random.random() * 100, 2),
+    }
+
+
+def per_record(count):
+    for _ in range(count):
+        data = get_data()
+        kds_producer.to_entry(json.dumps(data), data["ticker"])
+
+
+def columnar(count):
+    for _ in datagen_schema.stock_schema().generate_entries(count, seed=1):
+        pass
+
+
+# Kinesis shard write limits
+shard_records_per_second = 1000
+shard_bytes_per_second = 1024 * 1024
+
+
+def format_capacity(count):
+    '''Stored bytes per record and records/s a single shard accepts, per format and aggregation'''
+    for fmt in record_format.formats:
+        entries = list(datagen_schema.stock_schema().generate_entries(count, seed=1, fmt=fmt))
+        for aggregate in [False, True]:
+            put = list(kds_producer.aggregate_entries(entries)) if aggregate else entries
+            size = sum(kds_producer.entry_size(e) for e in put)
+            per_shard = min(shard_records_per_second * count / len(put), shard_bytes_per_second * count / size)
+            yield fmt + (" + KPL aggregation" if aggregate else ""), size / count, per_shard
+
+
+def best_of(fn, count, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(count)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare per-record and columnar stock record synthesis and the record formats")
+    parser.add_argument("--count", type=int, default=200000, help="Records per run")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per generator, the best one is reported")
+    args = parser.parse_args()
+
+    baseline = best_of(per_record, args.count, args.repeat)
+    for name, fn in [("per-record", per_record), ("columnar", columnar)]:
+        elapsed = baseline if fn is per_record else best_of(fn, args.count, args.repeat)
+        print(f"{name:>10}: {args.count / elapsed:>12,.0f} records/s "
+              f"({elapsed * 1e9 / args.count:,.0f} ns/record, {baseline / elapsed:.2f}x)")
+    print()
+    for name, record_bytes, per_shard in format_capacity(min(args.count, 100000)):
+        print(f"{name:>26}: {record_bytes:6.1f} bytes/record, {per_shard:>10,.0f} records/s per shard")
+
+
+if __name__ == "__main__":
+    main()
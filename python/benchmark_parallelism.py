@@ -0,0 +1,59 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import argparse
+import csv
+
+import datagen_schema
+import kds_producer
+import parallelism_advisor
+import record_format
+
+
+def record_sizes(payload_sizes, fmt, count):
+    '''Average stored bytes of the datagen stock records per payload size'''
+    for payload_bytes in payload_sizes:
+        entries = datagen_schema.stock_schema(payload_bytes=payload_bytes).generate_entries(count, seed=1, fmt=fmt)
+        yield payload_bytes, sum(kds_producer.entry_size(e) for e in entries) / count
+
+
+def read_samples(path):
+    '''(record_bytes, records_per_second) rows of a CSV file with a header'''
+    with open(path, newline='') as f:
+        return [(float(row['record_bytes']), float(row['records_per_second'])) for row in csv.DictReader(f)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Calibrate the cost model of parallelism_advisor from throughput measurements")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sizes = commands.add_parser("sizes", help="Print the record size of every datagen payload size to measure")
+    sizes.add_argument("--payload-bytes", type=int, nargs="+", default=[0, 256, 1024, 4096])
+    sizes.add_argument("--format", choices=record_format.formats, default='json')
+    sizes.add_argument("--count", type=int, default=10000)
+    fit = commands.add_parser("fit", help="Fit the cost model to measured throughput")
+    fit.add_argument("measurements", help="CSV file with record_bytes and records_per_second columns")
+    fit.add_argument("--records-per-second", type=float, default=10000,
+                     help="Expected load of the example recommendation")
+    fit.add_argument("--record-bytes", type=float, default=200,
+                     help="Average record size of the example recommendation")
+    fit.add_argument("--shards", type=int, help="Source shard count of the example recommendation")
+    args = parser.parse_args()
+
+    if args.command == "sizes":
+        print("Measure the highest rate a single KPU app (Parallelism 1, ParallelismPerKpu 1) sustains")
+        print("without falling behind, e.g. with local_kds_datagen.py --rate R --payload-bytes P:")
+        for payload_bytes, record_bytes in record_sizes(args.payload_bytes, args.format, args.count):
+            print(f"  --payload-bytes {payload_bytes:>6}: {record_bytes:8.1f} record_bytes")
+        return
+
+    model = parallelism_advisor.calibrate(read_samples(args.measurements))
+    print(f"record cost: {model.record_cost_seconds:.3e} s, byte cost: {model.byte_cost_seconds:.3e} s")
+    print(f"KPU capacity at {args.record_bytes:.0f} bytes/record: "
+          f"{model.records_per_second(args.record_bytes):,.0f} records/s")
+    recommendation = parallelism_advisor.recommend(args.records_per_second, args.record_bytes, args.shards, model)
+    print(f"Recommendation for {args.records_per_second:,.0f} records/s: {recommendation}")
+
+
+if __name__ == "__main__":
+    main()
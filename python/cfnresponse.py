@@ -0,0 +1,71 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+# Drop-in replacement of the cfnresponse module CloudFormation provides to inline
+# Lambda code. A response that never arrives leaves the stack waiting for an hour,
+# so the PUT is retried on connection errors, timeouts and 5xx responses.
+
+import json
+import logging
+import random
+import time
+import urllib3
+
+LOGGER = logging.getLogger(__name__)
+
+SUCCESS = "SUCCESS"
+FAILED = "FAILED"
+
+connect_timeout_seconds = 5
+read_timeout_seconds = 15
+max_attempts = 6
+backoff_base_seconds = 0.5
+backoff_max_seconds = 8
+
+# created once per container, warm invocations reuse its keep-alive connections
+http = urllib3.PoolManager(timeout=urllib3.Timeout(connect=connect_timeout_seconds, read=read_timeout_seconds),
+                           retries=False)
+
+
+def response_body(event, context, responseStatus, responseData, physicalResourceId=None, noEcho=False, reason=None):
+    body = {
+        'Status': responseStatus,
+        'Reason': reason or "See the details in CloudWatch Log Stream: {}".format(context.log_stream_name),
+        'PhysicalResourceId': physicalResourceId or context.log_stream_name,
+        'StackId': event['StackId'],
+        'RequestId': event['RequestId'],
+        'LogicalResourceId': event['LogicalResourceId'],
+        'NoEcho': noEcho,
+        'Data': responseData
+    }
+    # the response is limited to 4096 bytes, so leave out the whitespace
+    return json.dumps(body, separators=(',', ':')).encode('utf-8')
+
+
+def send(event, context, responseStatus, responseData, physicalResourceId=None, noEcho=False, reason=None):
+    '''PUT the response to the pre-signed URL of the event, returns the HTTP status or None when all attempts failed
+
+    Failures are logged rather than raised, like the module this replaces.
+    '''
+    body = response_body(event, context, responseStatus, responseData, physicalResourceId, noEcho, reason)
+    LOGGER.info("Response body: %s", body.decode('utf-8'))
+    headers = {
+        'content-type': '',
+        'content-length': str(len(body))
+    }
+
+    for attempt in range(1, max_attempts + 1):
+        try:
+            response = http.request('PUT', event['ResponseURL'], headers=headers, body=body)
+            # a 4xx does not change on a retry, e.g. an expired URL
+            if response.status < 500:
+                LOGGER.info("Status code: %s", response.status)
+                return response.status
+            error = f"status code {response.status}"
+        except urllib3.exceptions.HTTPError as e:
+            error = e
+        LOGGER.warning("Sending the response failed (attempt %d/%d): %s", attempt, max_attempts, error)
+        if attempt < max_attempts:
+            time.sleep(random.uniform(0, min(backoff_max_seconds, backoff_base_seconds * 2 ** (attempt - 1))))
+    LOGGER.error("Unable to send the response after %d attempts", max_attempts)
+    return None
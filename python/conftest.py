@@ -0,0 +1,14 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import pytest
+
+import aws_clients
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    # tests patch boto3.client, so clients must not outlive a test
+    aws_clients.clear()
+    yield
+    aws_clients.clear()
@@ -0,0 +1,438 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import datetime
+import json
+import random
+import string
+import threading
+
+import kds_producer
+import record_format
+
+# number of records synthesized per columnar chunk when streaming entries
+default_chunk_size = 10000
+
+epoch = datetime.datetime(1970, 1, 1)
+
+# Avro types of the Flink column types, event times are written as text like in JSON
+avro_types = {'STRING': 'string', 'INT': 'int', 'BIGINT': 'long', 'FLOAT': 'float', 'DOUBLE': 'double'}
+
+
+class Field:
+    '''A column of a synthetic record
+
+    `generate` returns `count` values for one chunk, `encode` turns them
+    into JSON text fragments and `plain_values` into plain values for the binary
+    formats. Every field draws from its own random stream.
+    '''
+
+    def __init__(self, name, flink_type, avro_type=None):
+        self.name = name
+        self.flink_type = flink_type
+        self.avro_type = avro_type or avro_types.get(flink_type, 'string')
+
+    def generate(self, rng, count, start_us, step_us):
+        raise NotImplementedError
+
+    def encode(self, values):
+        return [json.dumps(v) for v in values]
+
+    def plain_values(self, values):
+        return list(values)
+
+    def flink_datagen_options(self):
+        return {}
+
+
+class Choice(Field):
+    '''One of a fixed set of values, Zipf skewed when `skew` > 0'''
+
+    def __init__(self, name, values, skew=0.0, flink_type="STRING"):
+        super().__init__(name, flink_type)
+        if not values:
+            raise ValueError(f"Field {name} needs at least one value")
+        self.values = list(values)
+        self.encoded = [json.dumps(v) for v in self.values]
+        self.cum_weights = None
+        if skew > 0:
+            total = 0.0
+            self.cum_weights = []
+            for rank in range(len(self.values)):
+                total += 1.0 / (rank + 1) ** skew
+                self.cum_weights.append(total)
+
+    def generate(self, rng, count, start_us, step_us):
+        return rng.choices(range(len(self.values)), cum_weights=self.cum_weights, k=count)
+
+    def encode(self, values):
+        encoded = self.encoded
+        return [encoded[i] for i in values]
+
+    def plain_values(self, values):
+        choices = self.values
+        return [choices[i] for i in values]
+
+
+class Uniform(Field):
+    '''Uniformly distributed float rounded to `decimals` digits'''
+
+    def __init__(self, name, low, high, decimals=2, flink_type="DOUBLE", avro_type=None):
+        super().__init__(name, flink_type, avro_type)
+        self.low = low
+        self.high = high
+        self.decimals = decimals
+        self.format = f"%.{decimals}f"
+
+    def generate(self, rng, count, start_us, step_us):
+        uniform = rng.random
+        low, width = self.low, self.high - self.low
+        return [low + uniform() * width for _ in range(count)]
+
+    def encode(self, values):
+        fmt = self.format
+        return [fmt % v for v in values]
+
+    def plain_values(self, values):
+        decimals = self.decimals
+        return [round(v, decimals) for v in values]
+
+    def flink_datagen_options(self):
+        return {'min': f"{self.low:.2f}", 'max': f"{self.high:.2f}"}
+
+
+class IntRange(Field):
+    '''Uniformly distributed integer between `low` and `high` inclusive'''
+
+    def __init__(self, name, low, high, flink_type="BIGINT"):
+        super().__init__(name, flink_type)
+        self.low = low
+        self.high = high
+
+    def generate(self, rng, count, start_us, step_us):
+        randrange, low, high = rng.randrange, self.low, self.high + 1
+        return [randrange(low, high) for _ in range(count)]
+
+    def encode(self, values):
+        return [str(v) for v in values]
+
+    def flink_datagen_options(self):
+        return {'min': str(self.low), 'max': str(self.high)}
+
+
+class RandomString(Field):
+    '''Random ASCII letters of a fixed length, also used to pad records to a payload size'''
+
+    def __init__(self, name, length):
+        super().__init__(name, "STRING")
+        self.length = length
+
+    def generate(self, rng, count, start_us, step_us):
+        # slicing one random pool per chunk is much cheaper than drawing every character
+        pool = ''.join(rng.choices(string.ascii_letters, k=self.length * 2))
+        randrange, length = rng.randrange, self.length
+        return [pool[o:o + length] for o in (randrange(length + 1) for _ in range(count))]
+
+    def encode(self, values):
+        return ['"' + v + '"' for v in values]
+
+    def flink_datagen_options(self):
+        return {'length': str(self.length)}
+
+
+class EventTime(Field):
+    '''Monotonic event time, `step_us` microseconds between consecutive records'''
+
+    def __init__(self, name, flink_type="TIMESTAMP(3)"):
+        super().__init__(name, flink_type)
+
+    def generate(self, rng, count, start_us, step_us):
+        return range(start_us, start_us + count * step_us, step_us)
+
+    def encode(self, values):
+        seconds_cache = {}
+        encoded = []
+        for value in values:
+            seconds, micros = divmod(value, 1000000)
+            prefix = seconds_cache.get(seconds)
+            if prefix is None:
+                prefix = (epoch + datetime.timedelta(seconds=seconds)).strftime('"%Y-%m-%dT%H:%M:%S')
+                seconds_cache[seconds] = prefix
+            encoded.append('%s.%06d"' % (prefix, micros))
+        return encoded
+
+    def plain_values(self, values):
+        return [v[1:-1] for v in self.encode(values)]
+
+
+class EventTimeDisorder:
+    '''Realistic event time disorder for watermark stress testing
+
+    - `late_fraction` of the records are delayed by up to `max_lateness_ms`,
+      drawn from a `uniform` or `exponential` distribution
+    - with `burst_probability` a burst of `burst_size` records shares one event
+      time and is followed by a matching gap, keeping the average rate
+    - every partition key gets a fixed clock skew of up to +/- `key_clock_skew_ms`
+    - `idle_key_fraction` of the keys stop emitting during every other window of
+      `idle_period_ms`, which leaves the shards only they map to idle
+    '''
+
+    distributions = ['uniform', 'exponential']
+
+    def __init__(self, max_lateness_ms=0, late_fraction=0.0, lateness_distribution='exponential',
+                 burst_probability=0.0, burst_size=1, key_clock_skew_ms=0,
+                 idle_key_fraction=0.0, idle_period_ms=0):
+        if lateness_distribution not in self.distributions:
+            raise ValueError(f"Unknown lateness distribution: {lateness_distribution}")
+        for name, value in [('late_fraction', late_fraction), ('burst_probability', burst_probability),
+                            ('idle_key_fraction', idle_key_fraction)]:
+            if not 0 <= value <= 1:
+                raise ValueError(f"{name} must be between 0 and 1: {value}")
+        if max_lateness_ms < 0 or key_clock_skew_ms < 0 or burst_size < 1:
+            raise ValueError("Lateness and clock skew must not be negative, burst size must be positive")
+        if idle_key_fraction > 0 and idle_period_ms <= 0:
+            raise ValueError("Idle keys need a positive idle period")
+        self.max_lateness_us = int(max_lateness_ms * 1000)
+        self.late_fraction = late_fraction
+        self.lateness_distribution = lateness_distribution
+        self.burst_probability = burst_probability
+        self.burst_size = burst_size
+        self.key_clock_skew_us = int(key_clock_skew_ms * 1000)
+        self.idle_key_fraction = idle_key_fraction
+        self.idle_period_us = int(idle_period_ms * 1000)
+
+    def key_offset_us(self, key):
+        # fixed per key and independent of the seed, like a misconfigured producer clock
+        return int((random.Random(f"clock-{key}").random() * 2 - 1) * self.key_clock_skew_us)
+
+    def bursty(self, times, rng, step_us):
+        result = []
+        t = times[0]
+        while len(result) < len(times):
+            size = 1
+            if rng.random() < self.burst_probability:
+                size = min(self.burst_size, len(times) - len(result))
+            result.extend([t] * size)
+            t += size * step_us
+        return result
+
+    def lateness_us(self, rng):
+        if self.lateness_distribution == 'uniform':
+            return int(rng.random() * self.max_lateness_us)
+        # mean of a third of the bound, capped so lateness stays bounded
+        return min(self.max_lateness_us, int(rng.expovariate(3.0 / self.max_lateness_us)))
+
+    def apply(self, times, keys, key_count, rng, step_us):
+        '''Return disordered event times and partition key indices for one chunk'''
+        times = list(times)
+        keys = list(keys)
+        if self.burst_probability > 0 and times:
+            times = self.bursty(times, rng, step_us)
+        if self.idle_key_fraction > 0:
+            active_count = max(1, key_count - int(key_count * self.idle_key_fraction))
+            for i, t in enumerate(times):
+                if keys[i] >= active_count and (t // self.idle_period_us) % 2 == 1:
+                    keys[i] = rng.randrange(active_count)
+        if self.key_clock_skew_us > 0:
+            offsets = [self.key_offset_us(k) for k in range(key_count)]
+            times = [t + offsets[k] for t, k in zip(times, keys)]
+        if self.late_fraction > 0 and self.max_lateness_us > 0:
+            uniform, late_fraction = rng.random, self.late_fraction
+            times = [t - self.lateness_us(rng) if uniform() < late_fraction else t for t in times]
+        return times, keys
+
+
+class Schema:
+    '''Record layout shared by every data generator of the blueprints'''
+
+    def __init__(self, name, fields, partition_key, disorder=None, avro_name=None, avro_namespace=None,
+                 avro_optional=None):
+        self.name = name
+        self.avro_name = avro_name or name
+        self.avro_namespace = avro_namespace
+        self.fields = list(fields)
+        self.field_names = [f.name for f in self.fields]
+        # optional fields of the Avro writer schema by name, with their type, nullable and
+        # written as null when the schema leaves them out, so consumers read one writer schema
+        self.avro_optional = dict(avro_optional or {})
+        self.avro_absent = [n for n in self.avro_optional if n not in self.field_names]
+        if partition_key not in self.field_names:
+            raise ValueError(f"Partition key {partition_key} is not a field of {name}")
+        self.partition_key = partition_key
+        self.disorder = disorder
+        if disorder is not None:
+            event_times = [i for i, f in enumerate(self.fields) if isinstance(f, EventTime)]
+            if not event_times or not isinstance(self.field(partition_key), Choice):
+                raise ValueError(
+                    f"Event time disorder needs an event time field and a choice partition key in {name}")
+            self.event_time_index = event_times[0]
+        self.template = '{' + ', '.join(json.dumps(n) + ': %s' for n in self.field_names) + '}'
+        self.encoders = {}
+
+    def field(self, name):
+        return self.fields[self.field_names.index(name)]
+
+    def rngs(self, seed=None):
+        '''One random stream per field, so changing one field leaves the values of the others intact'''
+        # the last stream drives the event time disorder
+        if seed is None:
+            return [random.Random() for _ in range(len(self.fields) + 1)]
+        names = self.field_names + ['disorder']
+        return [random.Random(f"{seed}-{self.name}-{n}") for n in names]
+
+    def avro_encoder(self):
+        fields = [(f.name, ['null', f.avro_type] if f.name in self.avro_optional else f.avro_type)
+                  for f in self.fields]
+        fields += [(n, ['null', self.avro_optional[n]]) for n in self.avro_absent]
+        return record_format.AvroEncoder(self.avro_name, self.avro_namespace, fields)
+
+    def encoder(self, fmt):
+        '''Encoder of the binary formats, built once per format'''
+        encoder = self.encoders.get(fmt)
+        if encoder is None:
+            if fmt == 'avro':
+                encoder = self.avro_encoder()
+            elif fmt == 'msgpack':
+                encoder = record_format.MessagePackEncoder(self.field_names)
+            else:
+                raise ValueError(f"Unknown record format: {fmt}")
+            self.encoders[fmt] = encoder
+        return encoder
+
+    def generate_batch(self, count, rngs, start_us, step_us=1, fmt='json'):
+        '''Synthesize `count` records as (encoded bytes, partition key) pairs
+
+        JSON records never contain newlines.
+        '''
+        columns = [f.generate(rng, count, start_us, step_us) for f, rng in zip(self.fields, rngs)]
+        key_index = self.field_names.index(self.partition_key)
+        if self.disorder is not None:
+            columns[self.event_time_index], columns[key_index] = self.disorder.apply(
+                columns[self.event_time_index], columns[key_index],
+                len(self.fields[key_index].values), rngs[-1], step_us)
+        key_field = self.field(self.partition_key)
+        keys = columns[key_index]
+        if isinstance(key_field, Choice):
+            keys = [key_field.values[i] for i in keys]
+        if fmt != 'json':
+            encode = self.encoder(fmt).encode
+            values = [f.plain_values(c) for f, c in zip(self.fields, columns)]
+            if fmt == 'avro':
+                values += [[None] * count for _ in self.avro_absent]
+            return [(encode(row), str(key)) for row, key in zip(zip(*values), keys)]
+        encoded = [f.encode(c) for f, c in zip(self.fields, columns)]
+        template = self.template
+        return [((template % row).encode('utf-8'), str(key)) for row, key in zip(zip(*encoded), keys)]
+
+    def generate_entries(self, count, seed=None, start_us=None, step_us=1, chunk_size=default_chunk_size,
+                         fmt='json'):
+        '''Stream `count` PutRecords entries synthesized one columnar chunk at a time
+
+        The same seed, start time and chunk size always produce the same records.
+        '''
+        rngs = self.rngs(seed)
+        if start_us is None:
+            start_us = now_us()
+        for offset in range(0, count, chunk_size):
+            size = min(chunk_size, count - offset)
+            for data, key in self.generate_batch(size, rngs, start_us + offset * step_us, step_us, fmt):
+                yield kds_producer.to_entry(data, key)
+
+    def entry_factory(self, seed=None, chunk_size=1000, fmt='json'):
+        '''Thread safe callable returning one entry at a time, for per-record producers'''
+        lock = threading.Lock()
+        rngs = self.rngs(seed)
+        buffered = []
+
+        def next_entry():
+            with lock:
+                if not buffered:
+                    batch = self.generate_batch(chunk_size, rngs, now_us(), fmt=fmt)
+                    buffered.extend(reversed(batch))
+                data, key = buffered.pop()
+            return kds_producer.to_entry(data, key)
+        return next_entry
+
+    def flink_columns(self, indent="  "):
+        return ",\n".join(f"{indent}{f.name} {f.flink_type}" for f in self.fields)
+
+    def flink_datagen_options(self, indent="    "):
+        '''WITH options of the Flink datagen connector reproducing the field distributions'''
+        options = [("connector", "datagen")]
+        for f in self.fields:
+            for key, value in f.flink_datagen_options().items():
+                options.append((f"fields.{f.name}.{key}", value))
+        return ",\n".join(f"{indent}'{k}' = '{v}'" for k, v in options)
+
+
+def now_us():
+    return (datetime.datetime.now() - epoch) // datetime.timedelta(microseconds=1)
+
+
+stock_tickers = ['AAPL', 'AMZN', 'MSFT', 'INTC', 'TBV']
+# prices of the KDS datagen, the Studio notebook generates prices up to studio_max_price
+default_max_price = 100
+studio_max_price = 1000
+
+
+def stock_schema(ticker_count=len(stock_tickers), skew=0.0, payload_bytes=0, disorder=None,
+                 max_price=default_max_price):
+    '''Stock ticker records read by the KDS and Studio blueprints
+
+    Beyond the five real tickers synthetic symbols are added, `skew` turns the
+    ticker distribution into a Zipf distribution for hot key testing,
+    `payload_bytes` pads every record with a random string field and
+    `disorder` injects event time disorder. Prices are drawn between 0 and
+    `max_price`.
+    '''
+    tickers = stock_tickers[:ticker_count] + [f"T{i:04d}" for i in range(len(stock_tickers), ticker_count)]
+    fields = [
+        Choice('ticker', tickers, skew=skew),
+        EventTime('event_time'),
+        # the Stock POJO of the Java apps stores the price as a float
+        Uniform('price', 0, max_price, avro_type='float'),
+    ]
+    if payload_bytes > 0:
+        fields.append(RandomString('payload', payload_bytes))
+    return Schema('stock', fields, partition_key='ticker', disorder=disorder,
+                  avro_name='Stock', avro_namespace='com.amazonaws.services.kinesisanalytics.stock',
+                  # StockSchema.avsc of the Java apps declares the payload as an optional string
+                  avro_optional={'payload': 'string'})
+
+
+def stock_schema_from_properties(props):
+    '''Build the stock schema from custom resource properties, which CloudFormation passes as strings'''
+    return stock_schema(ticker_count=int(props.get('TickerCount', len(stock_tickers))),
+                        skew=float(props.get('KeySkew', 0)),
+                        payload_bytes=int(props.get('PayloadBytes', 0)),
+                        disorder=disorder_from_properties(props))
+
+
+disorder_properties = ['MaxLatenessMs', 'LateFraction', 'LatenessDistribution', 'BurstProbability',
+                       'BurstSize', 'KeyClockSkewMs', 'IdleKeyFraction', 'IdlePeriodMs']
+
+
+def disorder_from_properties(props):
+    if not any(p in props for p in disorder_properties):
+        return None
+    return EventTimeDisorder(
+        max_lateness_ms=float(props.get('MaxLatenessMs', 0)),
+        late_fraction=float(props.get('LateFraction', 0)),
+        lateness_distribution=props.get('LatenessDistribution', 'exponential'),
+        burst_probability=float(props.get('BurstProbability', 0)),
+        burst_size=int(props.get('BurstSize', 1)),
+        key_clock_skew_ms=float(props.get('KeyClockSkewMs', 0)),
+        idle_key_fraction=float(props.get('IdleKeyFraction', 0)),
+        idle_period_ms=float(props.get('IdlePeriodMs', 0)))
+
+
+def orders_schema():
+    '''Order records produced by the orders datagen into Kafka'''
+    return Schema('orders', [
+        IntRange('product_id', 1, 99999),
+        IntRange('order_number', 1, 9999999999),
+        IntRange('quantity', 1, 25, flink_type="INT"),
+        IntRange('price_int', 29, 99999999, flink_type="INT"),
+        RandomString('buyer', 15),
+        EventTime('order_time'),
+    ], partition_key='product_id')
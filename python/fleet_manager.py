@@ -0,0 +1,164 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+# Start, stop, snapshot or delete many MSF applications at once:
+#
+#   python fleet_manager.py stop app-1 app-2 --apps-file more-apps.txt --region us-east-1
+#
+# Every application runs the same describe -> act -> wait sequence as the
+# custom resource handlers, API calls of all applications share one rate limit.
+
+import argparse
+import functools
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+import app_waiter
+import kds_load
+from rate_limiter import TokenBucket
+
+LOGGER = logging.getLogger(__name__)
+
+default_max_workers = 8
+# well below the per account quotas of the kinesisanalyticsv2 control plane APIs
+default_calls_per_second = 5
+default_timeout_seconds = 1800
+
+
+class RateLimitedClient:
+    '''Client proxy taking a token from a shared bucket before every API call'''
+
+    def __init__(self, client, limiter):
+        self.client = client
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def limited(*args, **kwargs):
+            self.limiter.acquire()
+            return attribute(*args, **kwargs)
+        return limited
+
+
+actions = {
+    'start': app_waiter.start_application,
+    'stop': app_waiter.stop_application,
+    'snapshot': app_waiter.create_snapshot,
+    'delete': app_waiter.delete_application,
+}
+
+
+def run_action(client, app_name, action, timeout_seconds, clock, sleep, **kwargs):
+    '''Run one action, returns its result instead of raising so other applications carry on'''
+    start = clock()
+    backoff = app_waiter.Backoff(app_waiter.Deadline(None, timeout_seconds, clock), sleep)
+    result = {'app': app_name, 'action': action, 'status': None, 'error': None}
+    try:
+        result['status'] = actions[action](client, app_name, backoff, **kwargs)
+    except Exception as e:
+        LOGGER.error("Failed to %s %s: %s", action, app_name, e)
+        result['error'] = str(e)
+    result['seconds'] = clock() - start
+    LOGGER.info("%s %s finished in %.1f s", action, app_name, result['seconds'])
+    return result
+
+
+def run_fleet(client, app_names, action, max_workers=default_max_workers,
+              calls_per_second=default_calls_per_second, timeout_seconds=default_timeout_seconds,
+              snapshot_name=None, clock=time.monotonic, sleep=None):
+    '''Run an action on every application with a bounded pool of workers
+
+    All API calls, including status polls, take a token from a bucket refilled
+    at `calls_per_second`. A failing application does not stop the others,
+    the results are returned in the order of `app_names`.
+    '''
+    if action not in actions:
+        raise ValueError(f"Unknown action {action}, expected one of {sorted(actions)}")
+    if len(set(app_names)) != len(app_names):
+        raise ValueError(f"Applications must be distinct: {app_names}")
+    kwargs = {}
+    if action == 'snapshot':
+        if not snapshot_name:
+            raise ValueError("A snapshot name is required")
+        kwargs['snapshot_name'] = snapshot_name
+
+    limiter = TokenBucket(calls_per_second, max(1, calls_per_second), clock, sleep or time.sleep)
+    limited = RateLimitedClient(client, limiter)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_action, limited, app_name, action, timeout_seconds, clock, sleep, **kwargs)
+                   for app_name in app_names]
+    return [f.result() for f in futures]
+
+
+def print_fleet_report(results, elapsed):
+    width = max([len(r['app']) for r in results] + [len('Application')])
+    print(f"{'Application':<{width}}  {'Action':<8}  {'Seconds':>8}  Result")
+    for r in results:
+        outcome = f"FAILED: {r['error']}" if r['error'] else str(r['status'])
+        print(f"{r['app']:<{width}}  {r['action']:<8}  {r['seconds']:>8.1f}  {outcome}")
+    durations = sorted(r['seconds'] for r in results)
+    failed = sum(1 for r in results if r['error'])
+    print(f"{len(results) - failed} of {len(results)} applications succeeded in {elapsed:.1f} s")
+    print(f"Duration per application: p50 {kds_load.percentile(durations, 50):.1f} s, "
+          f"max {kds_load.percentile(durations, 100):.1f} s")
+
+
+def read_app_names(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("action", choices=sorted(actions), help="Action to run on every application")
+    parser.add_argument("apps", nargs="*", help="Names of the MSF applications")
+    parser.add_argument("--apps-file", help="File with one application name per line")
+    parser.add_argument("--region", help="AWS region of the applications")
+    parser.add_argument("--workers", type=int, default=default_max_workers,
+                        help="Number of applications handled concurrently")
+    parser.add_argument("--calls-per-second", type=float, default=default_calls_per_second,
+                        help="API calls per second across all applications")
+    parser.add_argument("--timeout", type=int, default=default_timeout_seconds,
+                        help="Seconds to wait for each application")
+    parser.add_argument("--snapshot-name",
+                        help="Name of the snapshots taken by the snapshot action, defaults to a timestamp")
+    args = parser.parse_args()
+    app_names = list(args.apps)
+    if args.apps_file:
+        app_names += read_app_names(args.apps_file)
+    if not app_names:
+        parser.error("no applications given")
+    if len(set(app_names)) != len(app_names):
+        parser.error("applications must be distinct")
+    if args.workers <= 0:
+        parser.error("--workers must be positive")
+    if args.calls_per_second <= 0:
+        parser.error("--calls-per-second must be positive")
+    if args.timeout <= app_waiter.safety_margin_seconds:
+        parser.error(f"--timeout must be greater than {app_waiter.safety_margin_seconds}")
+    snapshot_name = args.snapshot_name or time.strftime("fleet-%Y%m%d-%H%M%S", time.gmtime())
+
+    logging.basicConfig(level=logging.INFO)
+    # the pool of HTTP connections must not be smaller than the pool of workers
+    config = Config(max_pool_connections=args.workers)
+    client = boto3.client('kinesisanalyticsv2', region_name=args.region, config=config)
+    print(f"Running {args.action} on {len(app_names)} applications")
+    start = time.monotonic()
+    results = run_fleet(client, app_names, args.action, args.workers, args.calls_per_second,
+                        args.timeout, snapshot_name)
+    print_fleet_report(results, time.monotonic() - start)
+    if any(r['error'] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
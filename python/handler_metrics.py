@@ -0,0 +1,123 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+# Timing of the phases of a custom resource request. Every client from
+# aws_clients times its API calls, the wait loops of app_waiter and the slow
+# steps of the handlers are timed with `phase`. When the handler returns the
+# durations are printed as one CloudWatch Embedded Metric Format (EMF) line,
+# phase_report.py summarizes these lines across many requests.
+
+import contextlib
+import functools
+import json
+import threading
+import time
+
+namespace = 'StreamingDataBlueprints/CustomResources'
+dimensions = ['Handler', 'RequestType']
+
+# the recording of the request being handled, phases outside a request are not recorded
+_active = None
+
+
+class Recording:
+    '''Total duration and count of every phase of one request, phases may nest and overlap'''
+
+    def __init__(self, handler_name, request_type, clock=time.perf_counter):
+        self.handler_name = handler_name
+        self.request_type = request_type
+        self.clock = clock
+        self.started = clock()
+        self.phases = {}
+        # API calls of thread pools are recorded concurrently
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self.lock:
+            total, count = self.phases.get(name, (0.0, 0))
+            self.phases[name] = (total + seconds, count + 1)
+
+    def metrics(self, timestamp_ms):
+        '''EMF document of the recorded phases, in milliseconds'''
+        phases = dict(self.phases)
+        phases['total'] = (self.clock() - self.started, 1)
+        document = {
+            '_aws': {
+                'Timestamp': timestamp_ms,
+                'CloudWatchMetrics': [{
+                    'Namespace': namespace,
+                    'Dimensions': [dimensions],
+                    'Metrics': [{'Name': name, 'Unit': 'Milliseconds'} for name in phases],
+                }],
+            },
+            'Handler': self.handler_name,
+            'RequestType': self.request_type,
+            'PhaseCounts': {name: count for name, (_, count) in phases.items()},
+        }
+        document.update({name: round(seconds * 1000, 3) for name, (seconds, _) in phases.items()})
+        return document
+
+
+@contextlib.contextmanager
+def phase(name):
+    '''Time the enclosed block as `name` in the recording of the current request'''
+    recording = _active
+    if recording is None:
+        yield
+        return
+    start = recording.clock()
+    try:
+        yield
+    finally:
+        recording.add(name, recording.clock() - start)
+
+
+def timed(name):
+    '''Decorator timing every call of the function as phase `name`'''
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TimedClient:
+    '''Wraps a boto3 client, timing every API call as a phase named after the operation'''
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+        return timed(name)(attr)
+
+
+def request_type(event):
+    for pending in ('PendingStart', 'PendingDelete'):
+        if pending in event:
+            return pending
+    return event.get('RequestType', 'Unknown')
+
+
+def instrumented(handler_name, emit=print, clock=time.perf_counter):
+    '''Decorator of a Lambda handler recording its phases and emitting them when it returns
+
+    The EMF line is printed rather than logged, the log format of Lambda
+    would prefix it and CloudWatch only extracts metrics from plain JSON lines.
+    '''
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            global _active
+            _active = Recording(handler_name, request_type(event), clock)
+            try:
+                return handler(event, context)
+            finally:
+                recording, _active = _active, None
+                emit(json.dumps(recording.metrics(int(time.time() * 1000)), separators=(',', ':')))
+        return wrapper
+    return decorator
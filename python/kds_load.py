@@ -0,0 +1,152 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import kds_producer
+from rate_limiter import TokenBucket
+
+LOGGER = logging.getLogger(__name__)
+
+default_batch_size = 100
+
+
+def list_shard_hash_ranges(client, stream_arn):
+    '''Return (shard id, starting hash key, ending hash key) of every open shard'''
+    ranges = []
+    kwargs = {'StreamARN': stream_arn, 'ShardFilter': {'Type': 'AT_LATEST'}}
+    while True:
+        response = client.list_shards(**kwargs)
+        for shard in response['Shards']:
+            hash_range = shard['HashKeyRange']
+            ranges.append((shard['ShardId'],
+                           int(hash_range['StartingHashKey']),
+                           int(hash_range['EndingHashKey'])))
+        if 'NextToken' not in response:
+            return ranges
+        # NextToken cannot be combined with the stream identifier or filter
+        kwargs = {'NextToken': response['NextToken']}
+
+
+def assign_shards(shard_ranges, workers):
+    '''Give every worker all shards, each starting its round robin at a different shard'''
+    if not shard_ranges:
+        raise Exception("Stream has no open shards")
+    return [shard_ranges[i % len(shard_ranges):] + shard_ranges[:i % len(shard_ranges)]
+            for i in range(workers)]
+
+
+class PutStats:
+    '''Thread safe counters and latencies of PutRecords calls'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.records = 0
+        self.throttled = 0
+        self.failed = 0
+
+    def record_put(self, latency, batch_size, response):
+        throttled = sum(1 for r in response['Records']
+                        if r.get('ErrorCode') == 'ProvisionedThroughputExceededException')
+        failed = response.get('FailedRecordCount', 0)
+        with self.lock:
+            self.latencies.append(latency)
+            self.records += batch_size - failed
+            self.throttled += throttled
+            self.failed += failed - throttled
+
+    def summary(self, elapsed):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            return {
+                'records': self.records,
+                'put_calls': len(latencies),
+                'records_per_second': self.records / elapsed if elapsed > 0 else 0.0,
+                'p50_latency_ms': percentile(latencies, 50) * 1000,
+                'p99_latency_ms': percentile(latencies, 99) * 1000,
+                'throttled_records': self.throttled,
+                'failed_records': self.failed,
+            }
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, int(round(pct / 100 * len(sorted_values))) - 1)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class RecordBudget:
+    '''Hands out chunks of a fixed record count to concurrent workers'''
+
+    def __init__(self, count):
+        self.remaining = count
+        self.lock = threading.Lock()
+
+    def take(self, size):
+        with self.lock:
+            size = min(size, self.remaining)
+            self.remaining -= size
+            return size
+
+    def cancel(self):
+        '''Stop handing out records, workers finish their current batch and exit'''
+        with self.lock:
+            self.remaining = 0
+
+
+def run_worker(client, stream_arn, shards, entry_factory, limiter, budget, batch_size, stats, rng):
+    shard_index = 0
+    try:
+        while True:
+            size = budget.take(batch_size)
+            if size == 0:
+                return
+            limiter.acquire(size)
+            batch = []
+            for _ in range(size):
+                _, start, end = shards[shard_index]
+                shard_index = (shard_index + 1) % len(shards)
+                entry = entry_factory()
+                entry['ExplicitHashKey'] = str(rng.randint(start, end))
+                batch.append(entry)
+            kds_producer.put_batch(client, stream_arn, batch, stats.record_put)
+    except Exception:
+        # keep the other workers from draining the budget before the error surfaces
+        budget.cancel()
+        raise
+
+
+def run_load(client, stream_arn, count, rate, workers, entry_factory, batch_size=default_batch_size):
+    '''Send `count` records at up to `rate` records/s from a pool of `workers` producers
+
+    Every worker cycles through the open shards of the stream and sets an
+    explicit hash key inside the range of the next shard, so records are spread
+    evenly regardless of their partition key. Returns a summary of the
+    achieved throughput, put latencies and throttling.
+    '''
+    if rate <= 0 or workers < 1 or batch_size < 1:
+        raise ValueError(
+            f"Rate, workers and batch size must be positive: {rate}, {workers}, {batch_size}")
+    shard_ranges = list_shard_hash_ranges(client, stream_arn)
+    shards = assign_shards(shard_ranges, workers)
+    batch_size = max(1, min(batch_size, kds_producer.max_records_per_request, int(rate)))
+    limiter = TokenBucket(rate, capacity=max(batch_size, rate / 10))
+    budget = RecordBudget(count)
+    stats = PutStats()
+
+    LOGGER.info("Producing %d records at %s records/s with %d workers over %d shards",
+                count, rate, workers, len(shard_ranges))
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_worker, client, stream_arn, shards[i], entry_factory,
+                                   limiter, budget, batch_size, stats, random.Random())
+                   for i in range(workers)]
+        for future in futures:
+            future.result()
+    return stats.summary(time.monotonic() - start)
@@ -0,0 +1,227 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import hashlib
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from record_format import varint
+
+LOGGER = logging.getLogger(__name__)
+
+# Kinesis PutRecords service limits
+max_records_per_request = 500
+max_bytes_per_request = 5 * 1024 * 1024
+max_bytes_per_record = 1024 * 1024
+
+# KPL aggregated record format, magic prefix and default AggregationMaxSize of the KPL
+kpl_magic = b'\xf3\x89\x9a\xc2'
+kpl_max_bytes = 51200
+
+# Retry settings for entries that fail inside a partially failed batch
+max_attempts = 8
+backoff_base_seconds = 0.05
+backoff_max_seconds = 2
+
+
+def to_entry(data, partition_key):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return {'Data': data, 'PartitionKey': partition_key}
+
+
+def entry_size(entry):
+    # both the data blob and the partition key count towards the limits
+    return len(entry['Data']) + len(entry['PartitionKey'].encode('utf-8'))
+
+
+def batch_entries(entries):
+    '''Group entries into PutRecords sized batches'''
+    batch = []
+    batch_bytes = 0
+    for entry in entries:
+        size = entry_size(entry)
+        if size > max_bytes_per_record:
+            raise Exception(
+                f"Record of {size} bytes exceeds the {max_bytes_per_record} bytes limit")
+        if len(batch) == max_records_per_request or batch_bytes + size > max_bytes_per_request:
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(entry)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def proto_bytes(field, value):
+    return varint(field << 3 | 2) + varint(len(value)) + value
+
+
+def aggregated_entry(key_table, records):
+    message = b''.join(proto_bytes(1, k) for k in key_table) + b''.join(records)
+    data = kpl_magic + message + hashlib.md5(message).digest()
+    return to_entry(data, key_table[0].decode('utf-8'))
+
+
+def kpl_record(key_index, data):
+    return proto_bytes(3, varint(1 << 3) + varint(key_index) + proto_bytes(3, data))
+
+
+def aggregate_entries(entries, max_bytes=kpl_max_bytes):
+    '''Pack consecutive entries into KPL aggregated records of at most `max_bytes`
+
+    An aggregated record is routed by the partition key of its first entry,
+    consumers that de-aggregate get the original records and keys back.
+    '''
+    empty_size = len(kpl_magic) + hashlib.md5().digest_size
+    key_indexes, key_table, records, size = {}, [], [], empty_size
+    for entry in entries:
+        key = entry['PartitionKey'].encode('utf-8')
+        index = key_indexes.get(key, len(key_table))
+        record = kpl_record(index, entry['Data'])
+        added = len(record) + (len(proto_bytes(1, key)) if index == len(key_table) else 0)
+        first_key = key_table[0] if key_table else key
+        if records and size + added + len(first_key) > max_bytes:
+            yield aggregated_entry(key_table, records)
+            key_indexes, key_table, records, size = {}, [], [], empty_size
+            index = 0
+            record = kpl_record(index, entry['Data'])
+            added = len(record) + len(proto_bytes(1, key))
+        if index == len(key_table):
+            key_indexes[key] = index
+            key_table.append(key)
+        records.append(record)
+        size += added
+    if records:
+        yield aggregated_entry(key_table, records)
+
+
+def read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, offset
+
+
+def proto_fields(data):
+    '''(field number, value) pairs of the varint and length delimited fields of a message'''
+    offset = 0
+    while offset < len(data):
+        tag, offset = read_varint(data, offset)
+        if tag & 7 == 0:
+            value, offset = read_varint(data, offset)
+        elif tag & 7 == 2:
+            length, offset = read_varint(data, offset)
+            value, offset = data[offset:offset + length], offset + length
+        else:
+            raise Exception(f"Unsupported protobuf wire type {tag & 7}")
+        yield tag >> 3, value
+
+
+def deaggregate(entry):
+    '''Original entries of an aggregated record, other records are returned unchanged'''
+    data = entry['Data']
+    message = data[len(kpl_magic):-16]
+    if not data.startswith(kpl_magic) or hashlib.md5(message).digest() != data[-16:]:
+        return [entry]
+    key_table = []
+    entries = []
+    for field, value in proto_fields(message):
+        if field == 1:
+            key_table.append(value.decode('utf-8'))
+        elif field == 3:
+            record = dict(proto_fields(value))
+            entries.append(to_entry(record.get(3, b''), key_table[record[1]]))
+    return entries
+
+
+def put_batch(client, stream_arn, batch, on_put=None):
+    '''Put a single batch, retrying only the entries that failed
+
+    `on_put(latency, batch_size, response)` is called after every PutRecords call.
+    '''
+    for attempt in range(max_attempts):
+        start = time.monotonic()
+        response = client.put_records(StreamARN=stream_arn, Records=batch)
+        if on_put is not None:
+            on_put(time.monotonic() - start, len(batch), response)
+        if response.get('FailedRecordCount', 0) == 0:
+            return
+        failed = [(entry, result) for entry, result in zip(batch, response['Records'])
+                  if 'ErrorCode' in result]
+        LOGGER.info("%d of %d records failed, retrying (attempt %d)",
+                    len(failed), len(batch), attempt + 1)
+        batch = [entry for entry, _ in failed]
+        time.sleep(random.uniform(
+            0, min(backoff_max_seconds, backoff_base_seconds * 2 ** attempt)))
+    error = failed[0][1]
+    raise Exception(
+        f"Unable to put {len(batch)} records after {max_attempts} attempts: "
+        f"{error['ErrorCode']} {error.get('ErrorMessage', '')}")
+
+
+def put_records(client, stream_arn, entries, on_put=None):
+    '''Put all entries using batched PutRecords calls, returns the number of records sent'''
+    count = 0
+    for batch in batch_entries(entries):
+        put_batch(client, stream_arn, batch, on_put)
+        count += len(batch)
+    return count
+
+
+async def put_records_async(client, stream_arn, entries, in_flight, on_put=None):
+    '''Put all entries keeping up to `in_flight` PutRecords calls running at once
+
+    Batches are fed through a bounded queue while entries are consumed lazily,
+    so memory stays flat regardless of the number of entries. The client is a
+    regular thread safe boto3 client whose blocking calls run in an executor.
+    '''
+    # asyncio is slow to import and only the concurrent mode needs it
+    import asyncio
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=in_flight)
+    executor = ThreadPoolExecutor(max_workers=in_flight)
+
+    async def produce():
+        for batch in batch_entries(entries):
+            await queue.put(batch)
+        for _ in range(in_flight):
+            await queue.put(None)
+
+    async def consume():
+        count = 0
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return count
+            await loop.run_in_executor(executor, put_batch, client, stream_arn, batch, on_put)
+            count += len(batch)
+
+    producer = asyncio.ensure_future(produce())
+    consumers = [asyncio.ensure_future(consume()) for _ in range(in_flight)]
+    try:
+        counts = await asyncio.gather(*consumers)
+        await producer
+        return sum(counts)
+    except BaseException:
+        producer.cancel()
+        for consumer in consumers:
+            consumer.cancel()
+        raise
+    finally:
+        executor.shutdown(wait=True)
+
+
+def put_records_concurrently(client, stream_arn, entries, in_flight, on_put=None):
+    '''Blocking entry point of put_records_async'''
+    if in_flight < 1:
+        raise ValueError(f"Number of in flight requests must be positive: {in_flight}")
+    import asyncio
+    return asyncio.run(put_records_async(client, stream_arn, entries, in_flight, on_put))
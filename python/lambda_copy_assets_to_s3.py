@@ -1,14 +1,21 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # Apache-2.0
 
+import asset_copier
+import aws_clients
 import cfnresponse
+import handler_metrics
 import json
+import logging
 import os
-import urllib.request
+import s3_cleanup
 from urllib.parse import urlparse
-import boto3
 
+LOGGER = logging.getLogger()
+LOGGER.setLevel(logging.INFO)
 
+
+@handler_metrics.instrumented('lambda_copy_assets_to_s3')
 def handler(event, context):
 
     try:
@@ -33,34 +40,27 @@ def handler(event, context):
                         raise Exception(
                             f"Unrecognized String in Bootstrapping List: {file_string}")
 
-                print(file_string)
-
-                s3_key = file_string.rsplit('/', 1)[-1]
-
-                # Download the JAR file
-                jar_file_path = '/tmp/file.jar'
-                urllib.request.urlretrieve(file_string, jar_file_path)
-
-                # Upload the JAR file to S3
-                s3_client = boto3.client('s3')
-                s3_client.upload_file(jar_file_path, bucket_name, s3_key)
-
-                # Remove the local JAR file
-                os.remove(jar_file_path)
+            # Stream every JAR file straight into S3 with one shared client
+            max_workers = int(os.environ.get("MaxConcurrency", asset_copier.default_max_workers))
+            s3_client = aws_clients.client('s3', max_pool_connections=max_workers)
+            with handler_metrics.phase('copy_assets'):
+                results = asset_copier.copy_assets(s3_client, file_list, bucket_name, max_workers)
 
-                # Print the completion message
-                print('JAR file uploaded to S3 successfully.')
+            # Print the completion message
+            copied = sum(1 for _, c in results if c)
+            print(f"{copied} JAR files uploaded to S3 successfully, {len(results) - copied} unchanged.")
 
             print("CREATE RESPONSE", "create_response")
             cfnresponse.send(event, context, cfnresponse.SUCCESS, {
                              "Message": "Resource creation successful!"})
         elif (event["RequestType"] == "Delete"):
             print("DELETE" + str("delete_response"))
-            s3 = boto3.resource('s3')
             bucket_name = os.environ.get("bucketName")
-            bucket = s3.Bucket(bucket_name)
-            for obj in bucket.objects.filter():
-                s3.Object(bucket.name, obj.key).delete()
+            max_workers = int(os.environ.get("MaxConcurrency", s3_cleanup.default_max_workers))
+            s3_client = aws_clients.client('s3', max_pool_connections=max_workers)
+            with handler_metrics.phase('empty_bucket'):
+                deleted = s3_cleanup.empty_bucket(s3_client, bucket_name, max_workers)
+            print(f"Deleted {deleted} objects from {bucket_name}")
             cfnresponse.send(event, context, cfnresponse.SUCCESS, {
                              "Message": "Resource deletion successful!"})
         else:
@@ -1,32 +1,55 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # Apache-2.0
 
-import json
-import boto3
+import app_waiter
+import aws_clients
 import os
 import cfnresponse
-import json
+import handler_metrics
 import logging
+import notebook_builder
+import scheduled_check
 import signal
-import time
+import studio_connectors
 
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 
 timeout_seconds = 300
 
+# A delete the Lambda cannot finish in time is resumed by a scheduled check,
+# which sends the deferred response once the app is gone.
+rule_prefix = 'msf-studio-delete-'
+# time a check spends on the teardown, checks run every minute and must not overlap
+check_seconds = 50
 
+# errors of a teardown step racing another change of the app, the step is retried
+conflict_error_codes = ('ConcurrentModificationException', 'ResourceInUseException')
+
+# defaults of the optional resource properties, environment variables of the same name replace them
+default_properties = {
+    'Parallelism': '4', 'ParallelismPerKpu': '1', 'AutoscalingEnabled': 'false',
+    'ConnectorBundles': ",".join(studio_connectors.default_bundles),
+}
+# range of the numeric properties
+numeric_ranges = {'Parallelism': (1, None), 'ParallelismPerKpu': (1, 8)}
+
+
+@handler_metrics.instrumented('lambda_create_studio_app')
 def handler(event, context):
 
     # setup alarm for remaining runtime minus a second
     signal.alarm(timeout_seconds)
+    if 'PendingDelete' in event:
+        check_pending_delete(event['PendingDelete'], context)
+        return
 
     try:
         LOGGER.info('REQUEST RECEIVED: %s', event)
         LOGGER.info('REQUEST Context: %s', context)
 
         # set up env vars
-        client = boto3.client("kinesisanalyticsv2")
+        client = aws_clients.client("kinesisanalyticsv2")
         app_name = os.environ["app_name"]
         execution_role = os.environ["execution_role"]
         bootstrap_string = os.environ["bootstrap_string"]
@@ -41,15 +64,23 @@ def handler(event, context):
         stack_id = os.environ["stackId"]
 
         if event['RequestType'] == 'Create' or event['RequestType'] == 'Update':
-            LOGGER.info('In Create')
-
-            create_app(client, app_name, execution_role, bootstrap_string, bootstrap_stack_name, subnet1,
-                       source_topic, security_group, glue_db_arn, log_stream_arn, zep_flink_version,
-                       blueprint_name, stack_id)
-            cfnresponse.send(event, context, cfnresponse.SUCCESS, {
-                             "Message": "Successfully Created Application"})
+            props = resolve(event.get('ResourceProperties', {}), zep_flink_version)
+            if event['RequestType'] == 'Update' and update_app(client, app_name, props, zep_flink_version, context):
+                message = "Successfully Updated Application"
+            else:
+                LOGGER.info('In Create')
+                create_app(client, app_name, execution_role, bootstrap_string, bootstrap_stack_name, subnet1,
+                           source_topic, security_group, glue_db_arn, log_stream_arn, zep_flink_version,
+                           blueprint_name, stack_id, props)
+                message = "Successfully Created Application"
+            cfnresponse.send(event, context, cfnresponse.SUCCESS, {"Message": message})
         if event['RequestType'] == 'Delete':
-            delete_app(client, app_name)
+            if not delete_app(client, app_name, app_waiter.backoff_for(context, timeout_seconds)):
+                rule = scheduled_check.schedule(rule_prefix, 'PendingDelete', event, context,
+                                                f"Checks whether MSF Studio application {app_name} is deleted")
+                LOGGER.info("Application %s is not deleted yet, scheduled checks with %s", app_name, rule)
+                # the scheduled check sends the response
+                return
             cfnresponse.send(event, context, cfnresponse.SUCCESS, {
                              "Message": "Successfully Deleted Application"})
     except Exception as e:
@@ -59,9 +90,96 @@ def handler(event, context):
                          {"Message": str(e)})
 
 
+def resolve(props, runtime_environment):
+    '''Properties with their defaults applied, raises when any of them is invalid'''
+    props = {
+        **default_properties,
+        **{k: os.environ[k] for k in default_properties if os.environ.get(k)},
+        **{k: v for k, v in props.items() if v not in (None, '')},
+    }
+    errors = []
+    for name, (minimum, maximum) in numeric_ranges.items():
+        try:
+            value = int(props[name])
+        except ValueError:
+            errors.append(f"{name} must be an integer, not {props[name]}")
+            continue
+        if value < minimum or maximum is not None and value > maximum:
+            errors.append(f"{name} must be at least {minimum}" +
+                          (f" and at most {maximum}" if maximum is not None else "") + f", not {value}")
+    if str(props['AutoscalingEnabled']).lower() not in ('true', 'false'):
+        errors.append(f"AutoscalingEnabled must be true or false, not {props['AutoscalingEnabled']}")
+    props['ConnectorBundles'] = studio_connectors.bundle_names(props['ConnectorBundles'])
+    errors.extend(studio_connectors.artifact_errors(props['ConnectorBundles'], runtime_environment))
+    if errors:
+        raise Exception("Invalid configuration: " + "; ".join(errors))
+    return props
+
+
+def parallelism_configuration(props):
+    return {
+        "ConfigurationType": "CUSTOM",
+        "Parallelism": int(props['Parallelism']),
+        "ParallelismPerKPU": int(props['ParallelismPerKpu']),
+        "AutoScalingEnabled": str(props['AutoscalingEnabled']).lower() == 'true',
+    }
+
+
+def configuration_update(detail, props, runtime_environment):
+    '''ApplicationConfigurationUpdate applying the sizing and connectors of the properties, empty when they are applied'''
+    configuration = detail.get("ApplicationConfigurationDescription", {})
+    update = {}
+
+    current = configuration.get("FlinkApplicationConfigurationDescription", {}).get(
+        "ParallelismConfigurationDescription", {})
+    parallelism = parallelism_configuration(props)
+    if any(current.get(k) != parallelism[k] for k in ("Parallelism", "ParallelismPerKPU", "AutoScalingEnabled")):
+        update["FlinkApplicationConfigurationUpdate"] = {"ParallelismConfigurationUpdate": {
+            "ConfigurationTypeUpdate": "CUSTOM",
+            "ParallelismUpdate": parallelism["Parallelism"],
+            "ParallelismPerKPUUpdate": parallelism["ParallelismPerKPU"],
+            "AutoScalingEnabledUpdate": parallelism["AutoScalingEnabled"],
+        }}
+
+    artifacts = studio_connectors.custom_artifacts(props['ConnectorBundles'], runtime_environment)
+    current_artifacts = [
+        {'ArtifactType': a['ArtifactType'], 'MavenReference': a['MavenReferenceDescription']}
+        for a in configuration.get("ZeppelinApplicationConfigurationDescription", {}).get(
+            "CustomArtifactsConfigurationDescription", [])
+        if 'MavenReferenceDescription' in a
+    ]
+    if artifacts != current_artifacts:
+        update["ZeppelinApplicationConfigurationUpdate"] = {"CustomArtifactsConfigurationUpdate": artifacts}
+    return update
+
+
+def update_app(client, app_name, props, runtime_environment, context=None):
+    '''Apply changed sizing and connector properties to the app, returns False when it does not exist'''
+    backoff = app_waiter.backoff_for(context, timeout_seconds)
+    if app_waiter.wait_while(client, app_name, app_waiter.transitional_statuses, backoff) is None:
+        LOGGER.info("App %s doesn't exist, creating it", app_name)
+        return False
+    detail = app_waiter.application_detail(client, app_name, backoff)
+    update = configuration_update(detail, props, runtime_environment)
+    if not update:
+        LOGGER.info('Nothing to update')
+        return True
+    # the version id guards against concurrent changes since the describe call
+    response = app_waiter.call(client.update_application, backoff, ApplicationName=app_name,
+                               CurrentApplicationVersionId=detail["ApplicationVersionId"],
+                               ApplicationConfigurationUpdate=update)
+    LOGGER.info("Update response %s", response)
+
+    # a running app restarts with the new configuration
+    status = app_waiter.wait_while(client, app_name, app_waiter.transitional_statuses, backoff)
+    if status not in ("READY", "RUNNING"):
+        raise Exception(f"Unable to update the app, it is {status}")
+    return True
+
+
 def create_app(client, app_name, execution_role, bootstrap_string, bootstrap_stack_name, subnet1,
                source_topic, security_group, glue_db_arn, log_stream_arn, zep_flink_version,
-               blueprint_name, stack_id):
+               blueprint_name, stack_id, props):
 
     # check if app already exists
     try:
@@ -82,12 +200,7 @@ def create_app(client, app_name, execution_role, bootstrap_string, bootstrap_sta
         ServiceExecutionRole=execution_role,
         ApplicationConfiguration={
             "FlinkApplicationConfiguration": {
-                "ParallelismConfiguration": {
-                    "ConfigurationType": "CUSTOM",
-                    "Parallelism": 4,
-                    "ParallelismPerKPU": 1,
-                    "AutoScalingEnabled": False,
-                }
+                "ParallelismConfiguration": parallelism_configuration(props)
             },
             'EnvironmentProperties': {
                 'PropertyGroups': [
@@ -116,32 +229,8 @@ def create_app(client, app_name, execution_role, bootstrap_string, bootstrap_sta
                 "CatalogConfiguration": {
                     "GlueDataCatalogConfiguration": {"DatabaseARN": glue_db_arn}
                 },
-                "CustomArtifactsConfiguration": [
-                    {
-                        'ArtifactType': "DEPENDENCY_JAR",
-                        'MavenReference': {
-                            'GroupId': "org.apache.flink",
-                            'ArtifactId': "flink-connector-kafka",
-                            'Version': "1.15.4",
-                        },
-                    },
-                    {
-                        'ArtifactType': "DEPENDENCY_JAR",
-                        'MavenReference': {
-                            'GroupId': "org.apache.flink",
-                            'ArtifactId': "flink-sql-connector-kinesis",
-                            'Version': "1.15.4",
-                        },
-                    },
-                    {
-                        'ArtifactType': "DEPENDENCY_JAR",
-                        'MavenReference': {
-                            'GroupId': "software.amazon.msk",
-                            'ArtifactId': "aws-msk-iam-auth",
-                            'Version': "1.1.6",
-                        },
-                    },
-                ],
+                "CustomArtifactsConfiguration": studio_connectors.custom_artifacts(
+                    props['ConnectorBundles'], zep_flink_version),
             },
         },
         CloudWatchLoggingOptions=[
@@ -152,89 +241,92 @@ def create_app(client, app_name, execution_role, bootstrap_string, bootstrap_sta
     LOGGER.info("Create response %s", response)
 
 
-def delete_app(client, app_name):
-    LOGGER.info("Request to delete app")
-
-    # check if app already deleted
-    describe_response = ""
+def teardown_step(client, app_name, backoff):
+    '''Take the next step of deleting the app and return the status it leads to, None once the app is gone
+
+    Every step starts from the current description of the app, so a teardown
+    resumes wherever an earlier invocation left it: a running app is stopped,
+    its VPC configurations are detached one at a time, then the app is deleted.
+    While the app changes state the step only returns its status.
+    '''
+    detail = app_waiter.application_detail(client, app_name, backoff)
+    if detail is None:
+        return None
+    status = detail.get("ApplicationStatus")
+    if status in app_waiter.transitional_statuses or status == "DELETING":
+        return status
     try:
-        describe_response = client.describe_application(
-            ApplicationName=app_name)
-
-        LOGGER.info("App exists, going to delete it %s", describe_response)
+        if status == "RUNNING":
+            LOGGER.info("Stopping application %s", app_name)
+            app_waiter.call(client.stop_application, backoff, ApplicationName=app_name)
+            return "STOPPING"
+        vpc_configurations = detail.get("ApplicationConfigurationDescription", {}).get(
+            "VpcConfigurationDescriptions") or []
+        if vpc_configurations:
+            vpc_id = vpc_configurations[0]["VpcConfigurationId"]
+            LOGGER.info("Detaching VPC configuration %s from application %s, %d left",
+                        vpc_id, app_name, len(vpc_configurations))
+            app_waiter.call(client.delete_application_vpc_configuration, backoff,
+                            ApplicationName=app_name,
+                            CurrentApplicationVersionId=detail["ApplicationVersionId"],
+                            VpcConfigurationId=vpc_id)
+            return "UPDATING"
+        LOGGER.info("Deleting application %s", app_name)
+        app_waiter.call(client.delete_application, backoff,
+                        ApplicationName=app_name, CreateTimestamp=detail["CreateTimestamp"])
+        return "DELETING"
     except Exception as e:
-        LOGGER.info("App doesn't exist or already deleted %s", e)
-        return
+        if aws_clients.error_code(e) not in conflict_error_codes:
+            raise
+        # the app changed since it was described, e.g. a stale version id
+        LOGGER.info("Application %s is busy, retrying: %s", app_name, e)
+        return status
 
-    app_version = describe_response["ApplicationDetail"]["ApplicationVersionId"]
-    vpc_configuration = describe_response["ApplicationDetail"][
-        "ApplicationConfigurationDescription"]["VpcConfigurationDescriptions"][0]
-    vpc_id = vpc_configuration["VpcConfigurationId"]
 
-    LOGGER.info("Attempting to delete VPC from MSF App, VPC ID %s", vpc_id)
+@handler_metrics.timed('delete_app')
+def delete_app(client, app_name, backoff):
+    '''Tear down the app, returns False when the deadline of `backoff` comes first
 
-    delete_vpc_response = client.delete_application_vpc_configuration(
-        ApplicationName=app_name,
-        CurrentApplicationVersionId=app_version,
-        VpcConfigurationId=vpc_id)
-
-    LOGGER.info("Deleted VPC from App %s", delete_vpc_response)
-
-    create_timestamp = describe_response["ApplicationDetail"]["CreateTimestamp"]
-
-    while (True):
-        desc_response = client.describe_application(ApplicationName=app_name)
-        status = desc_response['ApplicationDetail']['ApplicationStatus']
-        if status == "UPDATING":
-            # wait until status is not updating
-            LOGGER.info("Status is still UPDATING, sleeping until it is not.")
-            time.sleep(1)
-        else:
-            LOGGER.info("App is done updating, proceeding with delete.")
-            break
-
-    delete_response = client.delete_application(
-        ApplicationName=app_name, CreateTimestamp=create_timestamp)
-    LOGGER.info("Delete response %s", delete_response)
+    The teardown can be resumed with another call, see teardown_step.
+    '''
+    LOGGER.info("Request to delete app")
+    while True:
+        status = teardown_step(client, app_name, backoff)
+        if status is None:
+            LOGGER.info("Application %s is deleted", app_name)
+            return True
+        if backoff.deadline.remaining() <= backoff.delay:
+            LOGGER.info("Application %s is still %s, no time left to wait", app_name, status)
+            return False
+        LOGGER.info("Application %s is %s", app_name, status)
+        backoff.wait(f"waiting for application {app_name} to leave {status}")
+
+
+def check_pending_delete(pending, context, now=None):
+    '''Scheduled check of a pending delete, continues the teardown and responds once the app is gone'''
+    event = pending['Event']
+    app_name = os.environ["app_name"]
+    try:
+        client = aws_clients.client("kinesisanalyticsv2")
+        if not delete_app(client, app_name, app_waiter.backoff_for(None, check_seconds)):
+            if not scheduled_check.is_expired(pending, now):
+                return
+            raise Exception('Operation timed out')
+        result = (cfnresponse.SUCCESS, {"Message": "Successfully Deleted Application"})
+    except Exception as e:
+        LOGGER.info('FAILED!')
+        LOGGER.info(str(e))
+        result = (cfnresponse.FAILED, {"Message": str(e)})
+    # stop the checks before responding, so the response is sent once
+    scheduled_check.cancel(rule_prefix, event)
+    cfnresponse.send(event, context, *result)
 
 
+@handler_metrics.timed('generate_code_content')
 def generate_code_content(app_name, execution_role, bootstrap_string, subnet1, source_topic, security_group, glue_db_arn, log_stream_arn):
-
-    code_content = {}
-    code_content["paragraphs"] = []
-
-
-
-
-    create_udf_content = {}
-    create_udf_content["text"] = """%flink \n\nclass RandomTickerUDF extends ScalarFunction {\n  private val randomStrings: List[String] = List(\"AAPL\", \"AMZN\", \"MSFT\", \"INTC\", \"TBV\")\n    private val random: scala.util.Random = new scala.util.Random(System.nanoTime())\n\n  \n  override def isDeterministic(): Boolean = {\n      return false;\n  }\n  \n  \n  def eval(): String = {\n        val randomIndex = random.nextInt(randomStrings.length)\n        randomStrings(randomIndex)\n    }\n}\n\nstenv.registerFunction(\"random_ticker_udf\", new RandomTickerUDF())"""
-    create_udf_content["title"] = """<h3><font  color="#3071A9">1) User Defined Function for generating stock ticker data</font></h3>"""
-    create_udf_content["config"] = {}
-    create_udf_content["config"]["title"] = "true"
-
-    create_stock_table_content = {}
-    create_stock_table_content["text"] = """%flink.ssql(type=update)\nDROP TABLE IF EXISTS stock_table;\nCREATE TABLE stock_table (\n  ticker STRING,\n  event_time TIMESTAMP(3),\n  price DOUBLE,\n  WATERMARK for event_time as event_time - INTERVAL '15' SECONDS\n) WITH (\n  'connector' = 'kafka',\n  'topic' = 'sourceTopic',\n  'properties.bootstrap.servers' = '""" + bootstrap_string + """',\n  'properties.security.protocol' = 'SASL_SSL',\n  'properties.sasl.mechanism' = 'AWS_MSK_IAM',\n  'properties.sasl.jaas.config' = 'software.amazon.msk.auth.iam.IAMLoginModule required;',\n  'properties.sasl.client.callback.handler.class' = 'software.amazon.msk.auth.iam.IAMClientCallbackHandler',\n  'properties.group.id' = 'myGroup',\n  'scan.startup.mode' = 'earliest-offset',\n  'format' = 'json'\n);\n\n\nSELECT * FROM stock_table;"""
-    create_stock_table_content["title"] = """<h3><font  color="#3071A9">2) Defining a source table to source MSK topic and querying data</font></h3>"""
-    create_stock_table_content["config"] = {}
-    create_stock_table_content["config"]["title"] = "true"
-
-    insert_datagen_content = {}
-    insert_datagen_content["text"] = """%flink.ssql(parallelism=1)\nDROP TABLE IF EXISTS generate_stock_data;\nCREATE TABLE generate_stock_data(\n  ticker STRING,\n  event_time TIMESTAMP(3),\n  price DOUBLE\n)\nWITH (\n    'connector' = 'datagen',\n    'fields.price.kind' = 'random',\n    'fields.price.min' ='0.00',\n    'fields.price.max' = '1000.00'\n\n\n);\n\n\nINSERT INTO stock_table \nSELECT random_ticker_udf() as ticker, event_time, price from generate_stock_data;"""
-    insert_datagen_content["title"] = """<h3><font  color="#3071A9" >3) Please run this paragraph before running any additional event_time based queries in order to generate new data into the MSK topic</font></h3>"""
-    insert_datagen_content["config"] = {}
-    insert_datagen_content["config"]["title"]= "true"
-
-    code_content["paragraphs"].append(create_udf_content)
-    code_content["paragraphs"].append(create_stock_table_content)
-    code_content["paragraphs"].append(insert_datagen_content)
-
-    code_content["name"] = app_name
-    code_content["id"] = "ABCDEFGHI"
-    code_content["defaultInterpreterGroup"] = "flink"
-    code_content["version"] = "0.9.0-rc1-msf1"
-    code_content["path"] = "/" + app_name
-
-    return json.dumps(code_content)
+    # the notebook tables and the ticker UDF follow the stock schema shared with the KDS datagen
+    note = notebook_builder.datagen_note(app_name, bootstrap_string, source_topic)
+    return notebook_builder.note_text(note)
 
 
 def timeout_handler(_signal, _frame):
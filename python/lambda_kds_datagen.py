@@ -1,13 +1,13 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # Apache-2.0
 
+import aws_clients
 import cfnresponse
+import datagen_schema
+import handler_metrics
+import kds_producer
 import logging
 import signal
-import boto3
-import datetime
-import random
-import json
 
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
@@ -15,24 +15,25 @@ LOGGER.setLevel(logging.INFO)
 timeout_seconds = 120
 
 
-def get_data():
-    return {
-        'event_time': datetime.datetime.now().isoformat(),
-        'ticker': random.choice(['AAPL', 'AMZN', 'MSFT', 'INTC', 'TBV']),
-        'price': round(random.random() * 100, 2),
-    }
-
-
-def generate_records(streamArn, numberOfItems):
-    client = boto3.client('kinesis')
-    for _ in range(numberOfItems):
-        data = get_data()
-        client.put_record(
-            StreamARN=streamArn,
-            Data=json.dumps(data),
-            PartitionKey=data["ticker"])
+def generate_records(streamArn, numberOfItems, inFlightRequests=1, seed=None, schema=None,
+                     recordFormat='json', aggregate=False):
+    schema = schema or datagen_schema.stock_schema()
+    # entries are generated and aggregated lazily while they are sent
+    entries = schema.generate_entries(numberOfItems, seed, fmt=recordFormat)
+    if aggregate:
+        entries = kds_producer.aggregate_entries(entries)
+    # put_records is timed per API call, send_records is the elapsed time of all of
+    # them plus the generation of the records in between
+    with handler_metrics.phase('send_records'):
+        if inFlightRequests > 1:
+            client = aws_clients.client('kinesis', max_pool_connections=inFlightRequests)
+            kds_producer.put_records_concurrently(client, streamArn, entries, inFlightRequests)
+        else:
+            client = aws_clients.client('kinesis')
+            kds_producer.put_records(client, streamArn, entries)
 
 
+@handler_metrics.instrumented('lambda_kds_datagen')
 def handler(event, context):
     # Setup alarm for remaining runtime minus a second
     signal.alarm(timeout_seconds)
@@ -40,8 +41,13 @@ def handler(event, context):
         LOGGER.info('Request Event: %s', event)
         LOGGER.info('Request Context: %s', context)
         if event['RequestType'] == 'Create':
-            generate_records(event['ResourceProperties']['StreamArn'], int(
-                event['ResourceProperties']['NumberOfItems']))
+            props = event['ResourceProperties']
+            seed = int(props['Seed']) if 'Seed' in props else None
+            generate_records(props['StreamArn'], int(props['NumberOfItems']),
+                             int(props.get('InFlightRequests', 1)), seed,
+                             datagen_schema.stock_schema_from_properties(props),
+                             props.get('RecordFormat', 'json'),
+                             str(props.get('AggregateRecords', 'false')).lower() == 'true')
             cfnresponse.send(event, context, cfnresponse.SUCCESS, {
                              "Message": "Resource created"})
         elif event['RequestType'] == 'Update':
@@ -1,34 +1,49 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # Apache-2.0
 
+import app_waiter
+import aws_clients
 import cfnresponse
-import json
+import handler_metrics
 import logging
+import scheduled_check
 import signal
-import boto3
-import time
 
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 
 timeout_seconds = 550
-poll_interval_seconds = 1
 
+# With the Async resource property the handler only starts the app. A scheduled
+# check sends the deferred response once the app left STARTING.
+rule_prefix = 'msf-app-start-'
 
+success_messages = {'Create': "Resource created", 'Update': "Resource updated"}
+
+# ApplicationRestoreType resource property, with RESTORE_FROM_CUSTOM_SNAPSHOT
+# the SnapshotName property names the snapshot
+restore_types = ['RESTORE_FROM_LATEST_SNAPSHOT', 'RESTORE_FROM_CUSTOM_SNAPSHOT', 'SKIP_RESTORE']
+
+
+@handler_metrics.instrumented('lambda_msf_app_start')
 def handler(event, context):
     # Setup alarm for remaining runtime minus a second
     signal.alarm(timeout_seconds)
+    if 'PendingStart' in event:
+        check_pending_start(event['PendingStart'], context)
+        return
     try:
         LOGGER.info('Request Event: %s', event)
         LOGGER.info('Request Context: %s', context)
-        if event['RequestType'] == 'Create':
-            start_app(event['ResourceProperties']['AppName'])
+        if event['RequestType'] in success_messages:
+            if is_async(event):
+                if begin_start(event, context):
+                    # the scheduled check sends the response
+                    return
+            else:
+                start_app(event, context)
             cfnresponse.send(event, context, cfnresponse.SUCCESS, {
-                             "Message": "Resource created"})
-        elif event['RequestType'] == 'Update':
-            start_app(event['ResourceProperties']['AppName'])
-            cfnresponse.send(event, context, cfnresponse.SUCCESS, {
-                             "Message": "Resource updated"})
+                             "Message": success_messages[event['RequestType']]})
         elif event['RequestType'] == 'Delete':
             cfnresponse.send(event, context, cfnresponse.SUCCESS, {
                              "Message": "Resource deleted"})
@@ -43,24 +58,105 @@ def handler(event, context):
                          {"Message": str(e)})
 
 
-def start_app(appName):
-    client = boto3.client('kinesisanalyticsv2')
-    desc_response = client.describe_application(ApplicationName=appName)
-    status = desc_response['ApplicationDetail']['ApplicationStatus']
+def start_app(event, context=None):
+    props = event['ResourceProperties']
+    run_configuration = run_configuration_of(props)
+    client = aws_clients.client('kinesisanalyticsv2')
+    backoff = app_waiter.backoff_for(context, timeout_seconds)
+    if restart_requested(event):
+        stop_for_restart(client, event, backoff)
+    app_waiter.start_application(client, props['AppName'], backoff, run_configuration)
+
+
+def is_enabled(props, name):
+    return str(props.get(name, 'false')).lower() == 'true'
+
+
+def is_async(event):
+    return is_enabled(event['ResourceProperties'], 'Async')
+
+
+def restart_requested(event):
+    return event['RequestType'] == 'Update' and is_enabled(event['ResourceProperties'], 'RestartOnUpdate')
+
+
+def run_configuration_of(props):
+    '''RunConfiguration of start_application from the resource properties, None for the service defaults'''
+    run_configuration = {}
+    restore_type = props.get('ApplicationRestoreType')
+    if restore_type:
+        if restore_type not in restore_types:
+            raise Exception(f"Unknown ApplicationRestoreType: {restore_type}, expected one of {restore_types}")
+        restore = {'ApplicationRestoreType': restore_type}
+        if restore_type == 'RESTORE_FROM_CUSTOM_SNAPSHOT':
+            if not props.get('SnapshotName'):
+                raise Exception("SnapshotName is required to restore from a custom snapshot")
+            restore['SnapshotName'] = props['SnapshotName']
+        run_configuration['ApplicationRestoreConfiguration'] = restore
+    if 'AllowNonRestoredState' in props:
+        run_configuration['FlinkRunConfiguration'] = {
+            'AllowNonRestoredState': is_enabled(props, 'AllowNonRestoredState')}
+    return run_configuration or None
+
+
+def stop_for_restart(client, event, backoff):
+    '''Stop a running app so the start applies the run configuration, snapshotting its state first'''
+    props = event['ResourceProperties']
+    appName = props['AppName']
+    if app_waiter.application_status(client, appName, backoff) != "RUNNING":
+        return
+    if props.get('ApplicationRestoreType') != 'SKIP_RESTORE':
+        # restoring from the latest snapshot picks up this one
+        app_waiter.create_snapshot(client, appName, backoff, f"restart-{event['RequestId']}")
+    app_waiter.stop_application(client, appName, backoff)
+
+
+def begin_start(event, context, now=None):
+    '''Start the app and schedule a status check, returns False when it is already running'''
+    appName = event['ResourceProperties']['AppName']
+    run_configuration = run_configuration_of(event['ResourceProperties'])
+    client = aws_clients.client('kinesisanalyticsv2')
+    backoff = app_waiter.backoff_for(context, timeout_seconds)
+    if restart_requested(event):
+        stop_for_restart(client, event, backoff)
+    status = app_waiter.application_status(client, appName, backoff)
     if status == "READY":
-        # We assume that after a successful invocation of this API
-        # application would not be in READY state.
-        client.start_application(ApplicationName=appName)
-    while (True):
-        desc_response = client.describe_application(ApplicationName=appName)
-        status = desc_response['ApplicationDetail']['ApplicationStatus']
-        if status != "STARTING":
-            if status != "RUNNING":
-                raise Exception(f"Unable to start the app in state: {status}")
-            LOGGER.info(f"Application status changed: {status}")
-            break
-        else:
-            time.sleep(poll_interval_seconds)
+        kwargs = {'RunConfiguration': run_configuration} if run_configuration else {}
+        app_waiter.call(client.start_application, backoff, ApplicationName=appName, **kwargs)
+        status = app_waiter.application_status(client, appName, backoff)
+    if status == "RUNNING":
+        return False
+    if status != "STARTING":
+        raise Exception(f"Unable to start the app in state: {status}")
+
+    rule = scheduled_check.schedule(rule_prefix, 'PendingStart', event, context,
+                                    f"Checks whether MSF application {appName} is running", now)
+    LOGGER.info("Application %s is STARTING, scheduled status checks with %s", appName, rule)
+    return True
+
+
+def check_pending_start(pending, context, now=None):
+    '''Scheduled check of a pending start, responds to CloudFormation once the app left STARTING'''
+    event = pending['Event']
+    appName = event['ResourceProperties']['AppName']
+    try:
+        client = aws_clients.client('kinesisanalyticsv2')
+        status = app_waiter.application_status(client, appName, app_waiter.backoff_for(context, timeout_seconds))
+        if status == "STARTING":
+            if not scheduled_check.is_expired(pending, now):
+                LOGGER.info("Application %s is still STARTING", appName)
+                return
+            raise Exception('Operation timed out')
+        if status != "RUNNING":
+            raise Exception(f"Unable to start the app in state: {status}")
+        LOGGER.info("Application status changed: %s", status)
+        result = (cfnresponse.SUCCESS, {"Message": success_messages[event['RequestType']]})
+    except Exception as e:
+        LOGGER.error("Failed %s", e)
+        result = (cfnresponse.FAILED, {"Message": str(e)})
+    # stop the checks before responding, so the response is sent once
+    scheduled_check.cancel(rule_prefix, event)
+    cfnresponse.send(event, context, *result)
 
 
 def timeout_handler(_signal, _frame):
@@ -9,6 +9,10 @@ zip -r ../my-deployment.zip .;
 
 cd ../
 
-zip my-deployment.zip lambda_function.py
+zip my-deployment.zip lambda_function.py zeppelin_runner.py
 
-zip my-deployment.zip cfnresponse.py
\ No newline at end of file
+# the hardened response module shared by all custom resource handlers
+zip -j my-deployment.zip ../cfnresponse.py
+
+# the note id shared with the create function
+zip -j my-deployment.zip ../studio_notes.py
\ No newline at end of file
@@ -3,61 +3,30 @@
 
 import cfnresponse
 import logging
-import requests
 import signal
-import json
-import boto3
 import os
+import studio_notes
+import zeppelin_runner
 
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 
-timeout_seconds = 120
-note_url_id = "ABCDEFGHI"
+# the timeout of the function, the note starts two streaming jobs one after the
+# other and each may take minutes until Flink runs it
+timeout_seconds = 600
+safety_margin_seconds = 5
 
 
-def run_all_paragraphs(my_msf_appname):
+def run_all_paragraphs(my_msf_appname, context=None):
 
-    msf = boto3.client('kinesisanalyticsv2')
+    # warm invocations reuse the authenticated session of the app
+    zeppelin = zeppelin_runner.zeppelin_for(my_msf_appname)
 
-    response = msf.create_application_presigned_url(
-        ApplicationName=my_msf_appname,
-        UrlType='ZEPPELIN_UI_URL',
-        SessionExpirationDurationInSeconds=1800
-    )
-
-    responseString = ''
-
-    if not response or 'AuthorizedUrl' not in response:
-        # app is invalid
-        # or MSF app is not running
-        responseString = "Unable to get pre signed url for app"
-        raise Exception(responseString)
-
-    rest_api_url = response['AuthorizedUrl']
-
-    note_url = rest_api_url.replace(
-        '/zeppelin/', '/zeppelin/api/notebook/job/' + note_url_id)
-
-    s = requests.Session()
-
-    # send a GET request to the note_url
-    # This does NOT run the note. It does the auth for us with the endpoint
-    s.get(note_url)
-
-    # send post request now that we have the VerifiedAuthToken cookie
-    # split the request url so that we do not have anything past '?auth'
-    url_array = note_url.split('?auth')
-
-    second_response = s.post(url_array[0])
-
-    if 'exception' in second_response.json():
-        # there was an issue running the note
-        response_json = second_response.json()['message']
-    else:
-        response_json = json.loads(second_response.text)
-
-    return response_json
+    # stop polling a few seconds before the alarm, to report which paragraphs are stuck
+    seconds = timeout_seconds - safety_margin_seconds
+    if hasattr(context, 'get_remaining_time_in_millis'):
+        seconds = min(seconds, context.get_remaining_time_in_millis() / 1000 - safety_margin_seconds)
+    return zeppelin_runner.run_note(zeppelin, studio_notes.note_id, zeppelin_runner.Deadline(seconds))
 
 
 def lambda_handler(event, context):
@@ -70,7 +39,7 @@ def lambda_handler(event, context):
         env_app_name = os.environ["AppName"]
 
         if event['RequestType'] == 'Create':
-            note_response = run_all_paragraphs(env_app_name)
+            note_response = run_all_paragraphs(env_app_name, context)
             cfnresponse.send(event, context, cfnresponse.SUCCESS, {
                              "Message": str(note_response)})
         elif event['RequestType'] == 'Update':
@@ -0,0 +1,278 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import json
+import threading
+import pytest
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import lambda_function
+import notebook_builder
+import zeppelin_runner
+
+class FakeZeppelin(ThreadingHTTPServer):
+    '''Zeppelin notebook API serving one note, paragraphs advance one status per poll of the note
+
+    Submitted paragraphs go PENDING, RUNNING and then FINISHED, `streaming`
+    paragraphs stay RUNNING and get a Flink job URL unless they are `stuck`.
+    Every authentication issues a new token, `expire_tokens` invalidates them.
+    '''
+
+    def __init__(self, note, streaming=(), failing=(), stuck=()):
+        super().__init__(('127.0.0.1', 0), FakeZeppelinHandler)
+        self.note_id = note['id']
+        self.paragraphs = [dict(p, id=f"paragraph_{i}", status='READY') for i, p in enumerate(note['paragraphs'], 1)]
+        self.streaming = set(streaming)
+        self.failing = set(failing)
+        self.stuck = set(stuck)
+        self.lock = threading.Lock()
+        self.polls = 0
+        self.submissions = []
+        self.connections = set()
+        self.tokens = set()
+        self.authentications = 0
+        self.rejected = 0
+
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/zeppelin/?auth=token"
+
+    def expire_tokens(self):
+        with self.lock:
+            self.tokens.clear()
+
+    def paragraph(self, paragraph_id):
+        return next(p for p in self.paragraphs if p['id'] == paragraph_id)
+
+    def advance(self):
+        self.polls += 1
+        for p in self.paragraphs:
+            if p['status'] == 'PENDING':
+                p['status'] = 'RUNNING'
+            elif p['status'] == 'RUNNING' and p['id'] in self.failing:
+                p['status'] = 'ERROR'
+                p['results'] = {'code': 'ERROR', 'msg': [{'type': 'TEXT', 'data': 'Table not found'}]}
+            elif p['status'] == 'RUNNING' and p['id'] in self.streaming:
+                if p['id'] not in self.stuck:
+                    p['runtimeInfos'] = {'jobUrl': {'values': ['http://flink/job']}}
+            elif p['status'] == 'RUNNING':
+                p['status'] = 'FINISHED'
+
+
+class FakeZeppelinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, status, content, headers=()):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, method):
+        server = self.server
+        path, _, query = self.path.partition('?')
+        with server.lock:
+            server.connections.add(self.client_address)
+            if path == '/zeppelin/' and query == 'auth=token':
+                server.authentications += 1
+                token = f"secret-{server.authentications}"
+                server.tokens.add(token)
+                return self.reply(200, {}, [('Set-Cookie', f"VerifiedAuthToken={token}; Path=/")])
+            cookie = (self.headers.get('Cookie') or '').partition('VerifiedAuthToken=')[2].split(';')[0]
+            if cookie not in server.tokens:
+                server.rejected += 1
+                return self.reply(401, {'status': 'UNAUTHORIZED'})
+            parts = path.split('/')[4:]
+            if method == 'GET' and parts == [server.note_id]:
+                server.advance()
+                return self.reply(200, {'status': 'OK', 'body': {'id': server.note_id,
+                                                                 'paragraphs': server.paragraphs}})
+            if method == 'POST' and len(parts) == 3 and parts[:2] == ['job', server.note_id]:
+                server.paragraph(parts[2])['status'] = 'PENDING'
+                server.submissions.append((parts[2], server.polls))
+                return self.reply(200, {'status': 'OK'})
+        self.reply(404, {'status': 'NOT_FOUND', 'message': path})
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def log_message(self, *args):
+        pass
+
+
+def stock_note():
+    return notebook_builder.datagen_note('app', 'b-1:9098', 'stocks')
+
+
+@pytest.fixture
+def zeppelin_server(request):
+    server = FakeZeppelin(stock_note(), **request.param)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture(autouse=True)
+def fresh_sessions():
+    zeppelin_runner.clear()
+    yield
+    zeppelin_runner.clear()
+
+
+def run(server, seconds=60, zeppelin=None):
+    clock = FakeClock()
+    zeppelin = zeppelin or zeppelin_runner.Zeppelin(server.url)
+    return zeppelin_runner.run_note(zeppelin, server.note_id, zeppelin_runner.Deadline(seconds, clock), clock.sleep)
+
+
+def test_dependencies_of_the_stock_note():
+    udf, source, datagen = [zeppelin_runner.Paragraph(dict(p, id=str(i)))
+                            for i, p in enumerate(stock_note()['paragraphs'], 1)]
+
+    assert udf.creates == {'random_ticker_udf'} and not udf.streaming
+    assert source.creates == {'stock_table'} and source.streaming
+    assert datagen.creates == {'generate_stock_data'} and datagen.streaming
+    assert zeppelin_runner.dependencies([udf, source, datagen]) == {'1': [], '2': [], '3': ['1', '2']}
+
+
+def test_ddl_paragraphs_wait_for_the_paragraphs_using_what_they_drop():
+    select = zeppelin_runner.Paragraph({'id': 'select', 'text': '%flink.ssql\nSELECT * FROM orders;'})
+    ddl = zeppelin_runner.Paragraph({'id': 'ddl', 'text': '%flink.ssql\nCREATE TABLE orders (id INT);'})
+    other = zeppelin_runner.Paragraph({'id': 'other', 'text': '%md\n# Orders'})
+
+    assert zeppelin_runner.dependencies([select, other, ddl]) == {'select': [], 'other': [], 'ddl': ['select']}
+
+
+@pytest.mark.parametrize("zeppelin_server", [{'streaming': ['paragraph_2', 'paragraph_3']}], indirect=True)
+@patch("zeppelin_runner.LOGGER", MagicMock())
+def test_run_note_runs_independent_paragraphs_together(zeppelin_server):
+    statuses = run(zeppelin_server)
+
+    assert statuses == {'paragraph_1': 'FINISHED', 'paragraph_2': 'RUNNING', 'paragraph_3': 'RUNNING'}
+    submissions = dict(zeppelin_server.submissions)
+    # the UDF and the source table are created together, the insert once both are done
+    assert submissions['paragraph_1'] == submissions['paragraph_2'] == 1
+    assert submissions['paragraph_3'] == 3
+    assert len(zeppelin_server.connections) == 1
+
+
+@pytest.mark.parametrize("zeppelin_server", [{'failing': ['paragraph_2']}], indirect=True)
+@patch("zeppelin_runner.LOGGER", MagicMock())
+def test_run_note_reports_a_failed_paragraph(zeppelin_server):
+    with pytest.raises(Exception, match="failed with ERROR: Table not found"):
+        run(zeppelin_server)
+    assert 'paragraph_3' not in dict(zeppelin_server.submissions)
+
+
+@pytest.mark.parametrize("zeppelin_server", [{'streaming': ['paragraph_2', 'paragraph_3'],
+                                              'stuck': ['paragraph_3']}], indirect=True)
+@patch("zeppelin_runner.LOGGER", MagicMock())
+def test_run_note_times_out_waiting_for_the_insert(zeppelin_server):
+    with pytest.raises(Exception, match=r"Timed out waiting for paragraphs \['paragraph_3'\]"):
+        run(zeppelin_server, seconds=30)
+
+
+@pytest.mark.parametrize("zeppelin_server", [{'streaming': ['paragraph_2', 'paragraph_3']}], indirect=True)
+@patch("zeppelin_runner.LOGGER", MagicMock())
+@patch("lambda_function.LOGGER", MagicMock())
+@patch("time.sleep", MagicMock())
+def test_run_all_paragraphs(zeppelin_server):
+    msf = msf_client(zeppelin_server)
+
+    with patch("boto3.client", return_value=msf), patch("studio_notes.note_id", zeppelin_server.note_id):
+        statuses = lambda_function.run_all_paragraphs('app')
+        # a warm invocation skips the presigned URL and the authentication
+        lambda_function.run_all_paragraphs('app')
+
+    assert statuses['paragraph_3'] == 'RUNNING'
+    assert msf.create_application_presigned_url.call_count == 1
+    assert zeppelin_server.authentications == 1
+
+
+def msf_client(server):
+    client = MagicMock()
+    client.create_application_presigned_url.return_value = {'AuthorizedUrl': server.url()}
+    return client
+
+
+@pytest.mark.parametrize("zeppelin_server", [{}], indirect=True)
+@patch("zeppelin_runner.LOGGER", MagicMock())
+def test_session_is_reused_until_shortly_before_it_expires(zeppelin_server):
+    clock = FakeClock()
+    client = msf_client(zeppelin_server)
+    zeppelin = zeppelin_runner.Zeppelin(lambda: zeppelin_runner.presigned_url(client, 'app'), clock=clock)
+
+    for _ in range(3):
+        zeppelin.note(zeppelin_server.note_id)
+    assert client.create_application_presigned_url.call_count == 1
+    assert zeppelin_server.authentications == 1
+
+    clock.sleep(zeppelin_runner.session_duration_seconds - zeppelin_runner.refresh_margin_seconds + 1)
+    zeppelin.note(zeppelin_server.note_id)
+
+    assert client.create_application_presigned_url.call_count == 2
+    assert zeppelin_server.rejected == 0
+    client.create_application_presigned_url.assert_called_with(
+        ApplicationName='app', UrlType='ZEPPELIN_UI_URL',
+        SessionExpirationDurationInSeconds=zeppelin_runner.session_duration_seconds)
+
+
+@pytest.mark.parametrize("zeppelin_server", [{'streaming': ['paragraph_2', 'paragraph_3']}], indirect=True)
+@patch("zeppelin_runner.LOGGER", MagicMock())
+def test_rejected_session_is_renewed(zeppelin_server):
+    zeppelin = zeppelin_runner.zeppelin_for('app', msf_client(zeppelin_server))
+    zeppelin.note(zeppelin_server.note_id)
+
+    zeppelin_server.expire_tokens()
+    statuses = run(zeppelin_server, zeppelin=zeppelin)
+
+    assert statuses['paragraph_3'] == 'RUNNING'
+    assert zeppelin_server.rejected == 1
+    assert zeppelin_server.authentications == 2
+
+
+@pytest.mark.parametrize("zeppelin_server", [{}], indirect=True)
+@patch("zeppelin_runner.LOGGER", MagicMock())
+def test_rejection_after_renewal_raises(zeppelin_server):
+    zeppelin = zeppelin_runner.Zeppelin(zeppelin_server.url)
+    zeppelin.authenticate = MagicMock()
+    zeppelin.base_url = zeppelin_server.url().split('?')[0].rstrip('/')
+
+    with pytest.raises(requests.HTTPError):
+        zeppelin.note(zeppelin_server.note_id)
+    assert zeppelin_server.rejected == 2
+
+
+def test_sessions_are_cached_per_app():
+    client = MagicMock()
+
+    assert zeppelin_runner.zeppelin_for('app', client) is zeppelin_runner.zeppelin_for('app', client)
+    assert zeppelin_runner.zeppelin_for('other', client) is not zeppelin_runner.zeppelin_for('app', client)
+
+
+def test_presigned_url_is_required():
+    client = MagicMock()
+    client.create_application_presigned_url.return_value = {}
+
+    with pytest.raises(Exception, match="Unable to get pre signed url"):
+        zeppelin_runner.presigned_url(client, 'app')
@@ -0,0 +1,237 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+# Runs the paragraphs of a Zeppelin note through the paragraph API. Paragraphs
+# are ordered by the tables and functions they create and use, independent
+# paragraphs are submitted together and the note is polled until every
+# paragraph finished or, for streaming queries, until its Flink job runs.
+
+import logging
+import random
+import re
+import threading
+import time
+
+import requests
+
+LOGGER = logging.getLogger(__name__)
+
+# connect and read timeout of every request
+request_timeout = (5, 30)
+
+# lifetime of a presigned URL session, it is renewed this long before it expires
+session_duration_seconds = 1800
+refresh_margin_seconds = 120
+
+# authenticated sessions by application name
+_sessions = {}
+_client = None
+_lock = threading.Lock()
+
+# polling backoff, every delay is drawn from [delay / 2, delay]
+initial_delay_seconds = 0.5
+max_delay_seconds = 5
+backoff_multiplier = 2
+
+failed_statuses = ('ERROR', 'ABORT')
+
+created_name = re.compile(
+    r"\bCREATE\s+(?:TEMPORARY\s+)?(?:SYSTEM\s+)?(?:TABLE|VIEW|FUNCTION|CATALOG|DATABASE)\s+"
+    r"(?:IF\s+NOT\s+EXISTS\s+)?`?([\w.]+)`?", re.IGNORECASE)
+registered_function = re.compile(r"\b(?:registerFunction|createTemporary\w*Function)\(\s*\"(\w+)\"")
+streaming_statement = re.compile(r"\b(?:INSERT\s+INTO|SELECT)\b", re.IGNORECASE)
+word = re.compile(r"\w+")
+
+
+class Zeppelin:
+    '''Notebook REST API of the Zeppelin server of a Studio app, over one keep-alive session
+
+    `presign` returns a presigned URL of the app, its response sets the
+    VerifiedAuthToken cookie authenticating the session. The session is
+    authenticated again shortly before it expires and when a request is
+    rejected with 401 or 403.
+    '''
+
+    def __init__(self, presign, session=None, clock=time.monotonic):
+        self.presign = presign
+        self.session = session or requests.Session()
+        self.clock = clock
+        self.base_url = None
+        self.expires = 0
+        self.lock = threading.Lock()
+
+    def authenticate(self):
+        authorized_url = self.presign()
+        self.session.get(authorized_url, timeout=request_timeout).raise_for_status()
+        self.base_url = authorized_url.split('?auth')[0].rstrip('/')
+        self.expires = self.clock() + session_duration_seconds
+        LOGGER.info("Authenticated with %s", self.base_url)
+
+    def ensure_authenticated(self, rejected=False):
+        with self.lock:
+            if rejected or self.expires - self.clock() < refresh_margin_seconds:
+                self.authenticate()
+
+    def request(self, method, path):
+        self.ensure_authenticated()
+        response = self.send(method, path)
+        if response.status_code in (401, 403):
+            LOGGER.info("%s %s was rejected with %d, authenticating again", method, path, response.status_code)
+            self.ensure_authenticated(rejected=True)
+            response = self.send(method, path)
+        response.raise_for_status()
+        content = response.json()
+        if content.get('status') != 'OK':
+            raise Exception(f"{method} {path} failed: {content.get('message', content)}")
+        return content.get('body')
+
+    def send(self, method, path):
+        return self.session.request(method, f"{self.base_url}/api/notebook/{path}", timeout=request_timeout)
+
+    def note(self, note_id):
+        return self.request('GET', note_id)
+
+    def run_paragraph(self, note_id, paragraph_id):
+        '''Submit a paragraph, it runs asynchronously'''
+        self.request('POST', f"job/{note_id}/{paragraph_id}")
+
+
+def presigned_url(client, app_name):
+    response = client.create_application_presigned_url(
+        ApplicationName=app_name,
+        UrlType='ZEPPELIN_UI_URL',
+        SessionExpirationDurationInSeconds=session_duration_seconds
+    )
+    if not response or 'AuthorizedUrl' not in response:
+        # app is invalid
+        # or MSF app is not running
+        raise Exception("Unable to get pre signed url for app")
+    return response['AuthorizedUrl']
+
+
+def msf_client():
+    '''kinesisanalyticsv2 client, created on the first authentication of the container'''
+    global _client
+    with _lock:
+        if _client is None:
+            import boto3
+            _client = boto3.client('kinesisanalyticsv2')
+        return _client
+
+
+def zeppelin_for(app_name, client=None):
+    '''Zeppelin of the app, its authenticated session is shared by all notebook operations of the container'''
+    with _lock:
+        zeppelin = _sessions.get(app_name)
+        if zeppelin is None:
+            zeppelin = Zeppelin(lambda: presigned_url(client or msf_client(), app_name))
+            _sessions[app_name] = zeppelin
+        return zeppelin
+
+
+def clear():
+    global _client
+    with _lock:
+        _sessions.clear()
+        _client = None
+
+
+class Paragraph:
+    '''What a paragraph creates and refers to, parsed from its text'''
+
+    def __init__(self, content):
+        self.id = content['id']
+        self.title = content.get('title') or self.id
+        text = content.get('text') or ''
+        first_line, _, body = text.partition('\n')
+        self.interpreter = first_line.split('(')[0].strip() if first_line.startswith('%') else ''
+        if not self.interpreter:
+            body = text
+        if self.interpreter and not self.interpreter.startswith('%flink'):
+            # markdown and other interpreters neither create nor use tables
+            body = ''
+        self.creates = {n.lower() for n in created_name.findall(body) + registered_function.findall(body)}
+        self.uses = {w.lower() for w in word.findall(body)}
+        # queries and inserts of the streaming SQL interpreter keep running
+        self.streaming = self.interpreter == '%flink.ssql' and bool(streaming_statement.search(body))
+
+    def __repr__(self):
+        return f"Paragraph({self.id})"
+
+
+def dependencies(paragraphs):
+    '''Earlier paragraphs every paragraph waits for, those creating what it uses or using what it creates'''
+    return {
+        p.id: [q.id for q in paragraphs[:i] if q.creates & p.uses or p.creates & q.uses]
+        for i, p in enumerate(paragraphs)
+    }
+
+
+def is_started(paragraph, content):
+    '''Whether a submitted paragraph got far enough for the paragraphs waiting for it
+
+    Streaming paragraphs never finish. Their statements ahead of the query
+    ran once the Flink job of the query is submitted, which adds its URL to
+    the runtime infos of the paragraph.
+    '''
+    status = content.get('status')
+    if status == 'FINISHED':
+        return True
+    return paragraph.streaming and status == 'RUNNING' and 'jobUrl' in (content.get('runtimeInfos') or {})
+
+
+def error_of(content):
+    messages = ((content.get('results') or {}).get('msg') or [])
+    return " ".join(m.get('data', '') for m in messages).strip() or content.get('errorMessage') or ''
+
+
+class Deadline:
+    def __init__(self, seconds, clock=time.monotonic):
+        self.clock = clock
+        self.expires = clock() + seconds
+
+    def remaining(self):
+        return self.expires - self.clock()
+
+
+def run_note(zeppelin, note_id, deadline, sleep=None):
+    '''Run every paragraph of the note, independent paragraphs in parallel
+
+    Returns the status of every paragraph once all of them are started, see
+    is_started. Raises when a paragraph fails or the deadline passes.
+    '''
+    sleep = sleep or time.sleep
+    paragraphs = [Paragraph(c) for c in zeppelin.note(note_id)['paragraphs']]
+    waits_for = dependencies(paragraphs)
+    LOGGER.info("Running note %s: %s", note_id,
+                {p.id: waits_for[p.id] for p in paragraphs})
+    submitted = set()
+    started = set()
+    contents = {}
+    delay = initial_delay_seconds
+    while True:
+        ready = [p for p in paragraphs if p.id not in submitted and all(d in started for d in waits_for[p.id])]
+        for p in ready:
+            LOGGER.info("Submitting paragraph %s", p.title)
+            zeppelin.run_paragraph(note_id, p.id)
+            submitted.add(p.id)
+        if len(started) == len(paragraphs):
+            return {p.id: contents[p.id].get('status') for p in paragraphs}
+
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            pending = [p.id for p in paragraphs if p.id not in started]
+            raise Exception(f"Timed out waiting for paragraphs {pending} of note {note_id}")
+        sleep(min(remaining, random.uniform(delay / 2, delay)))
+        delay = min(max_delay_seconds, delay * backoff_multiplier)
+
+        contents = {c['id']: c for c in zeppelin.note(note_id)['paragraphs']}
+        for p in paragraphs:
+            if p.id not in submitted or p.id in started:
+                continue
+            content = contents[p.id]
+            if content.get('status') in failed_statuses:
+                raise Exception(f"Paragraph {p.title} failed with {content['status']}: {error_of(content)}")
+            if is_started(p, content):
+                LOGGER.info("Paragraph %s is %s", p.title, content['status'])
+                started.add(p.id)
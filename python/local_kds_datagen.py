@@ -1,25 +1,42 @@
 import boto3
-import json
-import datetime
-import random
+from botocore.config import Config
+import kds_load
+import datagen_schema
+import kds_producer
+import record_format
 import argparse
+import logging
 
-def get_data():
-    return {
-        'event_time': datetime.datetime.now().isoformat(),
-        'ticker': random.choice(['AAPL', 'AMZN', 'MSFT', 'INTC', 'TBV']),
-        'price': round(random.random() * 100, 2),
-    }
 
+def generate_records(streamArn, numberOfItems, region, inFlightRequests=1, seed=None, schema=None,
+                     recordFormat='json', aggregate=False):
+    schema = schema or datagen_schema.stock_schema()
+    entries = schema.generate_entries(numberOfItems, seed, fmt=recordFormat)
+    if aggregate:
+        entries = kds_producer.aggregate_entries(entries)
+    if inFlightRequests > 1:
+        config = Config(max_pool_connections=inFlightRequests)
+        client = boto3.client('kinesis', region_name=region, config=config)
+        kds_producer.put_records_concurrently(client, streamArn, entries, inFlightRequests)
+    else:
+        client = boto3.client('kinesis', region_name=region)
+        kds_producer.put_records(client, streamArn, entries)
 
-def generate_records(streamArn, numberOfItems, region):
-    client = boto3.client('kinesis', region_name=region)
-    for _ in range(numberOfItems):
-        data = get_data()
-        client.put_record(
-            StreamARN=streamArn,
-            Data=json.dumps(data),
-            PartitionKey=data["ticker"])
+
+def generate_load(streamArn, numberOfItems, region, rate, workers, batchSize, seed=None, schema=None,
+                  recordFormat='json'):
+    schema = schema or datagen_schema.stock_schema()
+    config = Config(max_pool_connections=workers)
+    client = boto3.client('kinesis', region_name=region, config=config)
+    return kds_load.run_load(client, streamArn, numberOfItems, rate, workers,
+                             schema.entry_factory(seed, fmt=recordFormat), batchSize)
+
+
+def print_load_report(summary):
+    print(f"Sent {summary['records']} records in {summary['put_calls']} PutRecords calls")
+    print(f"Throughput: {summary['records_per_second']:.1f} records/s")
+    print(f"Put latency: p50 {summary['p50_latency_ms']:.1f} ms, p99 {summary['p99_latency_ms']:.1f} ms")
+    print(f"Throttled records: {summary['throttled_records']}, other failed records: {summary['failed_records']}")
 
 
 def main():
@@ -27,9 +44,78 @@ def main():
     parser.add_argument("--stream-arn", help="Kinesis data stream ARN produce test records into")
     parser.add_argument("--count", type=int, help="Number of test records to produce")
     parser.add_argument("--region", help="AWS region of Kinesis data stream specified via --stream-arn")
+    parser.add_argument("--rate", type=float,
+                        help="Target rate in records/s, enables the multi-threaded load generator")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Number of concurrent producers used together with --rate")
+    parser.add_argument("--batch-size", type=int, default=kds_load.default_batch_size,
+                        help="Records per PutRecords call used together with --rate")
+    parser.add_argument("--in-flight", type=int, default=1,
+                        help="Number of concurrent PutRecords calls when not using --rate")
+    parser.add_argument("--seed", type=int,
+                        help="Random seed for a reproducible data set")
+    parser.add_argument("--tickers", type=int, default=len(datagen_schema.stock_tickers),
+                        help="Number of distinct tickers, synthetic symbols are added beyond the real ones")
+    parser.add_argument("--key-skew", type=float, default=0.0,
+                        help="Zipf exponent of the ticker distribution, 0 for uniform")
+    parser.add_argument("--payload-bytes", type=int, default=0,
+                        help="Pad every record with a random string field of this length")
+    parser.add_argument("--format", choices=record_format.formats, default='json',
+                        help="Encoding of the records, avro records match the Stock schema of the Java app")
+    parser.add_argument("--aggregate", action="store_true",
+                        help="Pack records into KPL aggregated records, not supported together with --rate")
+    parser.add_argument("--late-fraction", type=float, default=0.0,
+                        help="Fraction of records delivered late, between 0 and 1")
+    parser.add_argument("--max-lateness-ms", type=float, default=0.0,
+                        help="Upper bound of the event time lateness of late records")
+    parser.add_argument("--lateness-distribution", choices=datagen_schema.EventTimeDisorder.distributions,
+                        default='exponential', help="Distribution of the lateness of late records")
+    parser.add_argument("--burst-probability", type=float, default=0.0,
+                        help="Probability that a record starts a burst sharing one event time")
+    parser.add_argument("--burst-size", type=int, default=1,
+                        help="Number of records in a burst")
+    parser.add_argument("--key-clock-skew-ms", type=float, default=0.0,
+                        help="Maximum fixed clock skew of every ticker, in both directions")
+    parser.add_argument("--idle-key-fraction", type=float, default=0.0,
+                        help="Fraction of tickers that pause during every other idle period")
+    parser.add_argument("--idle-period-ms", type=float, default=0.0,
+                        help="Length of the alternating active and idle periods of idle tickers")
     args = parser.parse_args()
+    if args.rate is not None and args.rate <= 0:
+        parser.error("--rate must be positive")
+    if args.workers < 1:
+        parser.error("--workers must be positive")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be positive")
+    if args.in_flight < 1:
+        parser.error("--in-flight must be positive")
+    if args.tickers < 1:
+        parser.error("--tickers must be positive")
+    if args.aggregate and args.rate is not None:
+        parser.error("--aggregate cannot be used together with --rate")
+    if args.key_skew < 0 or args.payload_bytes < 0:
+        parser.error("--key-skew and --payload-bytes must not be negative")
+    disorder = None
+    if args.late_fraction or args.burst_probability or args.key_clock_skew_ms or args.idle_key_fraction:
+        try:
+            disorder = datagen_schema.EventTimeDisorder(
+                args.max_lateness_ms, args.late_fraction, args.lateness_distribution,
+                args.burst_probability, args.burst_size, args.key_clock_skew_ms,
+                args.idle_key_fraction, args.idle_period_ms)
+        except ValueError as e:
+            parser.error(str(e))
+    schema = datagen_schema.stock_schema(args.tickers, args.key_skew, args.payload_bytes, disorder)
+
+    logging.basicConfig(level=logging.INFO)
     print(f"Producing {args.count} records into {args.stream_arn}")
-    generate_records(args.stream_arn, args.count, args.region)
+    if args.rate is not None:
+        summary = generate_load(args.stream_arn, args.count, args.region,
+                                args.rate, args.workers, args.batch_size, args.seed, schema, args.format)
+        print_load_report(summary)
+    else:
+        generate_records(args.stream_arn, args.count, args.region, args.in_flight, args.seed, schema,
+                         args.format, args.aggregate)
     print("done, bye")
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
-import boto3
-import botocore
+import app_waiter
+import aws_clients
 import cfnresponse
+import handler_metrics
 import logging
+import parallelism_advisor
 import signal
 
 LOGGER = logging.getLogger()
@@ -9,7 +11,45 @@ LOGGER.setLevel(logging.INFO)
 
 timeout_seconds = 300
 
+# resource properties mapped to the fields of the configurations they set
+parallelism_fields = {'Parallelism': 'Parallelism', 'ParallelismPerKpu': 'ParallelismPerKPU',
+                      'AutoscalingEnabled': 'AutoScalingEnabled'}
+checkpoint_fields = {'CheckpointingEnabled': 'CheckpointingEnabled', 'CheckpointInterval': 'CheckpointInterval',
+                     'MinPauseBetweenCheckpoints': 'MinPauseBetweenCheckpoints'}
+monitoring_fields = {'MetricsLevel': 'MetricsLevel', 'LogLevel': 'LogLevel'}
+snapshot_fields = {'SnapshotsEnabled': 'SnapshotsEnabled'}
+code_location_fields = {'BucketArn': 'BucketARN', 'FileKey': 'FileKey'}
 
+job_types = ['STATEFUL', 'STATELESS']
+metrics_levels = ['APPLICATION', 'OPERATOR', 'TASK', 'PARALLELISM']
+log_levels = ['INFO', 'WARN', 'ERROR', 'DEBUG']
+
+# defaults of the optional properties per JobType. Stateless jobs only checkpoint
+# their source positions, so they checkpoint rarely, skip snapshots and autoscale.
+# Both keep the APPLICATION metrics level apps had before it was configurable,
+# finer levels multiply the CloudWatch metrics billed and are opt-in.
+job_type_defaults = {
+    'STATEFUL': {
+        'Parallelism': '1', 'ParallelismPerKpu': '1', 'AutoscalingEnabled': 'false',
+        'CheckpointingEnabled': 'true', 'CheckpointInterval': '60000', 'MinPauseBetweenCheckpoints': '5000',
+        'SnapshotsEnabled': 'true', 'MetricsLevel': 'APPLICATION', 'LogLevel': 'INFO',
+    },
+    'STATELESS': {
+        'Parallelism': '1', 'ParallelismPerKpu': '1', 'AutoscalingEnabled': 'true',
+        'CheckpointingEnabled': 'true', 'CheckpointInterval': '300000', 'MinPauseBetweenCheckpoints': '60000',
+        'SnapshotsEnabled': 'false', 'MetricsLevel': 'APPLICATION', 'LogLevel': 'INFO',
+    },
+}
+
+# smallest valid value of the numeric properties
+numeric_minimums = {'Parallelism': 1, 'ParallelismPerKpu': 1, 'CheckpointInterval': 1, 'MinPauseBetweenCheckpoints': 0}
+boolean_properties = ['AutoscalingEnabled', 'CheckpointingEnabled', 'SnapshotsEnabled']
+
+# changing these requires a new application
+replacement_properties = ['AppName', 'RuntimeEnvironment', 'LogStreamArn']
+
+
+@handler_metrics.instrumented('msf_java_app_custom_resource_handler')
 def handler(event, context):
 
     # setup alarm for remaining runtime minus a second
@@ -18,19 +58,24 @@ def handler(event, context):
     try:
         LOGGER.info('REQUEST RECEIVED: %s', event)
         LOGGER.info('REQUEST Context: %s', context)
-        client = boto3.client('kinesisanalyticsv2')
+        client = aws_clients.client('kinesisanalyticsv2')
         props = event['ResourceProperties']
 
         # set up env vars
         if event['RequestType'] == 'Create':
             LOGGER.info('Creating MSF Java app')
+            props, recommendation = sized(resolve(props))
             create_app(client=client, props=props)
-            cfnresponse.send(event, context, cfnresponse.SUCCESS, { "Message": "Successfully Created Application"})
+            cfnresponse.send(event, context, cfnresponse.SUCCESS, {
+                "Message": "Successfully Created Application", **recommendation})
         elif event['RequestType'] == 'Update':
-            LOGGER.info('Nothing to update')
-            cfnresponse.send(event, context, cfnresponse.SUCCESS, { "Message": "Successfully Updated Application"})
+            old_props, _ = sized(resolve(event.get('OldResourceProperties', props)))
+            props, recommendation = sized(resolve(props))
+            update_app(client=client, old_props=old_props, props=props, context=context)
+            cfnresponse.send(event, context, cfnresponse.SUCCESS, {
+                "Message": "Successfully Updated Application", **recommendation})
         elif event['RequestType'] == 'Delete':
-            delete_app(client=client, props=props)
+            delete_app(client=client, props=props, context=context)
             cfnresponse.send(event, context, cfnresponse.SUCCESS, { "Message": "Successfully Deleted Application"})
 
     except Exception as e:
@@ -38,6 +83,47 @@ def handler(event, context):
         cfnresponse.send(event, context, cfnresponse.FAILED, {"Message": str(e)})
 
 
+def is_true(value):
+    return str(value).lower() == 'true'
+
+
+def resolve(props):
+    '''Properties with the defaults of their JobType applied, raises when any of them is invalid'''
+    job_type = props.get('JobType') or 'STATEFUL'
+    if job_type not in job_types:
+        raise Exception(f"Invalid configuration: JobType must be one of {job_types}, not {job_type}")
+    props = {**job_type_defaults[job_type], **{k: v for k, v in props.items() if v not in (None, '')}}
+    errors = []
+    for name, minimum in numeric_minimums.items():
+        try:
+            if int(props[name]) < minimum:
+                errors.append(f"{name} must be at least {minimum}")
+        except ValueError:
+            errors.append(f"{name} must be an integer, not {props[name]}")
+    for name in boolean_properties:
+        if str(props[name]).lower() not in ('true', 'false'):
+            errors.append(f"{name} must be true or false, not {props[name]}")
+    if props['MetricsLevel'] not in metrics_levels:
+        errors.append(f"MetricsLevel must be one of {metrics_levels}, not {props['MetricsLevel']}")
+    if props['LogLevel'] not in log_levels:
+        errors.append(f"LogLevel must be one of {log_levels}, not {props['LogLevel']}")
+    if errors:
+        raise Exception("Invalid configuration: " + "; ".join(errors))
+    return props
+
+
+def sized(props):
+    '''Properties with the recommended sizing of the sizing mode applied, and the recommendation'''
+    recommendation = parallelism_advisor.recommend_from_properties(props)
+    if recommendation is None:
+        return props, {}
+    LOGGER.info("Recommended sizing %s", recommendation)
+    props = dict(props)
+    for name in ['Parallelism', 'ParallelismPerKpu', 'CheckpointInterval']:
+        props[name] = str(recommendation[name])
+    return props, recommendation
+
+
 def create_app(client, props):
     # check if app already exists
     try:
@@ -45,8 +131,8 @@ def create_app(client, props):
             ApplicationName=props['AppName'])
         LOGGER.info("App already exists %s", describe_response)
         return
-    except botocore.exceptions.ClientError as e:
-        if e.response["Error"]["Code"] != "ResourceNotFoundException":
+    except Exception as e:
+        if aws_clients.error_code(e) != "ResourceNotFoundException":
             raise e
         LOGGER.info("App doesn't exist yet so I am creating it")
 
@@ -57,33 +143,17 @@ def create_app(client, props):
         ServiceExecutionRole=props['ServiceExecutionRole'],
         ApplicationConfiguration={
             "FlinkApplicationConfiguration": {
-                "ParallelismConfiguration": {
-                    "ConfigurationType": "CUSTOM",
-                    "Parallelism": int(props['Parallelism']),
-                    "ParallelismPerKPU": int(props['ParallelismPerKpu']),
-                    "AutoScalingEnabled": bool(props['AutoscalingEnabled']),
-                },
-                "CheckpointConfiguration": {
-                    "ConfigurationType": "CUSTOM",
-                    'CheckpointingEnabled': True,
-                    'CheckpointInterval': int(props["CheckpointInterval"]),
-                    'MinPauseBetweenCheckpoints': int(props["MinPauseBetweenCheckpoints"])
-                },
+                "ParallelismConfiguration": parallelism_configuration(props),
+                "CheckpointConfiguration": checkpoint_configuration(props),
+                "MonitoringConfiguration": monitoring_configuration(props),
             },
+            "ApplicationSnapshotConfiguration": snapshot_configuration(props),
             'EnvironmentProperties': {
-                'PropertyGroups': [
-                    {
-                        'PropertyGroupId': 'BlueprintMetadata',
-                        'PropertyMap': props['ApplicationProperties']
-                    },
-                ]
+                'PropertyGroups': property_groups(props)
             },
             "ApplicationCodeConfiguration": {
                 "CodeContent": {
-                    "S3ContentLocation": {
-                        "BucketARN": props['BucketArn'],
-                        "FileKey": props['FileKey']
-                    },
+                    "S3ContentLocation": code_location(props),
                 },
                 "CodeContentType": "ZIPFILE",
             },
@@ -95,22 +165,126 @@ def create_app(client, props):
     LOGGER.info("Create response %s", response)
 
 
-def delete_app(client, props):
-    # check if app already deleted
-    describe_response = ""
-    try:
-        describe_response = client.describe_application(ApplicationName=props['AppName'])
-        LOGGER.info("App exists, going to delete it %s", describe_response)
-    except botocore.exceptions.ClientError as e:
-        if e.response["Error"]["Code"] != "ResourceNotFoundException":
-            raise e
-        LOGGER.info("App doesn't exist or already deleted %s", e)
+def parallelism_configuration(props):
+    return {
+        "ConfigurationType": "CUSTOM",
+        "Parallelism": int(props['Parallelism']),
+        "ParallelismPerKPU": int(props['ParallelismPerKpu']),
+        "AutoScalingEnabled": is_true(props['AutoscalingEnabled']),
+    }
+
+
+def checkpoint_configuration(props):
+    return {
+        "ConfigurationType": "CUSTOM",
+        'CheckpointingEnabled': is_true(props['CheckpointingEnabled']),
+        'CheckpointInterval': int(props["CheckpointInterval"]),
+        'MinPauseBetweenCheckpoints': int(props["MinPauseBetweenCheckpoints"])
+    }
+
+
+def monitoring_configuration(props):
+    return {
+        "ConfigurationType": "CUSTOM",
+        "MetricsLevel": props['MetricsLevel'],
+        "LogLevel": props['LogLevel'],
+    }
+
+
+def snapshot_configuration(props):
+    return {"SnapshotsEnabled": is_true(props['SnapshotsEnabled'])}
+
+
+def property_groups(props):
+    return [
+        {
+            'PropertyGroupId': 'BlueprintMetadata',
+            'PropertyMap': props['ApplicationProperties']
+        },
+    ]
+
+
+def code_location(props):
+    return {
+        "BucketARN": props['BucketArn'],
+        "FileKey": props['FileKey']
+    }
+
+
+def changed_properties(old_props, props):
+    return sorted(k for k in set(old_props) | set(props) if old_props.get(k) != props.get(k))
+
+
+def as_update(configuration, fields):
+    # every field of an update request is named after the field it changes
+    return {field + 'Update': configuration[field] for field in fields}
+
+
+def configuration_update(changed, props):
+    '''ApplicationConfigurationUpdate changing only the fields of the changed properties'''
+    update = {}
+    flink_update = {}
+    fields = [parallelism_fields[p] for p in changed if p in parallelism_fields]
+    if fields:
+        flink_update['ParallelismConfigurationUpdate'] = as_update(
+            parallelism_configuration(props), ['ConfigurationType'] + fields)
+    fields = [checkpoint_fields[p] for p in changed if p in checkpoint_fields]
+    if fields:
+        flink_update['CheckpointConfigurationUpdate'] = as_update(
+            checkpoint_configuration(props), ['ConfigurationType'] + fields)
+    fields = [monitoring_fields[p] for p in changed if p in monitoring_fields]
+    if fields:
+        flink_update['MonitoringConfigurationUpdate'] = as_update(
+            monitoring_configuration(props), ['ConfigurationType'] + fields)
+    if flink_update:
+        update['FlinkApplicationConfigurationUpdate'] = flink_update
+    fields = [snapshot_fields[p] for p in changed if p in snapshot_fields]
+    if fields:
+        update['ApplicationSnapshotConfigurationUpdate'] = as_update(snapshot_configuration(props), fields)
+    fields = [code_location_fields[p] for p in changed if p in code_location_fields]
+    if fields:
+        update['ApplicationCodeConfigurationUpdate'] = {
+            'CodeContentUpdate': {'S3ContentLocationUpdate': as_update(code_location(props), fields)}}
+    if 'ApplicationProperties' in changed:
+        update['EnvironmentPropertyUpdates'] = {'PropertyGroups': property_groups(props)}
+    return update
+
+
+def update_app(client, old_props, props, context=None):
+    changed = changed_properties(old_props, props)
+    replaced = [p for p in changed if p in replacement_properties]
+    if replaced:
+        raise Exception(f"Unable to update {', '.join(replaced)} in place, the application must be recreated")
+    kwargs = {}
+    update = configuration_update(changed, props)
+    if update:
+        kwargs['ApplicationConfigurationUpdate'] = update
+    if 'ServiceExecutionRole' in changed:
+        kwargs['ServiceExecutionRoleUpdate'] = props['ServiceExecutionRole']
+    if not kwargs:
+        LOGGER.info('Nothing to update')
         return
 
-    create_timestamp = describe_response["ApplicationDetail"]["CreateTimestamp"]
+    backoff = app_waiter.backoff_for(context, timeout_seconds)
+    app_name = props['AppName']
+    if app_waiter.wait_while(client, app_name, app_waiter.transitional_statuses, backoff) is None:
+        raise Exception(f"Unable to update {app_name}, the application does not exist")
+    # the version id guards against concurrent changes since the describe call
+    detail = app_waiter.application_detail(client, app_name, backoff)
+    response = app_waiter.call(client.update_application, backoff, ApplicationName=app_name,
+                               CurrentApplicationVersionId=detail['ApplicationVersionId'], **kwargs)
+    LOGGER.info("Update response %s", response)
+
+    # a running app restarts with the new configuration
+    status = app_waiter.wait_while(client, app_name, app_waiter.transitional_statuses, backoff)
+    if status not in ("READY", "RUNNING"):
+        raise Exception(f"Unable to update the app, it is {status}")
+
 
-    delete_response = client.delete_application(ApplicationName=props['AppName'], CreateTimestamp=create_timestamp)
-    LOGGER.info("Delete response %s", delete_response)
+def delete_app(client, props, context=None):
+    # the service execution role must outlive the app, so wait until it is deleted
+    backoff = app_waiter.backoff_for(context, timeout_seconds)
+    app_waiter.delete_application(client, props['AppName'], backoff)
 
 
 def timeout_handler(_signal, _frame):
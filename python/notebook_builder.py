@@ -0,0 +1,194 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+# Zeppelin notes of the Studio blueprints. The paragraph templates are compiled
+# once at import, a note is rendered from them in one pass and validated as the
+# JSON Zeppelin imports.
+
+import json
+import re
+from string import Template
+
+import datagen_schema
+import studio_notes
+
+zeppelin_version = "0.9.0-rc1-msf1"
+default_interpreter_group = "flink"
+# TextContent of create_application is limited to 100 KiB
+max_note_bytes = 102400
+
+default_watermark_seconds = 15
+default_group_id = "myGroup"
+default_startup_mode = "earliest-offset"
+# generating data with more than one subtask only duplicates the generated rows
+default_parallelism = {'datagen': 1}
+
+note_id_pattern = re.compile(r"^[A-Z0-9]{9}$")
+
+title_template = Template('<h3><font  color="#3071A9">${number}) ${title}</font></h3>')
+
+udf_template = Template(
+    "${header} \n\nclass ${class_name} extends ScalarFunction {\n"
+    "  private val randomStrings: List[String] = List(${values})\n"
+    "    private val random: scala.util.Random = new scala.util.Random(System.nanoTime())\n\n  \n"
+    "  override def isDeterministic(): Boolean = {\n      return false;\n  }\n  \n  \n"
+    "  def eval(): String = {\n        val randomIndex = random.nextInt(randomStrings.length)\n"
+    "        randomStrings(randomIndex)\n    }\n}\n\n"
+    "stenv.registerFunction(\"${function}\", new ${class_name}())")
+
+source_table_template = Template(
+    "${header}\nDROP TABLE IF EXISTS ${table};\nCREATE TABLE ${table} (\n${columns}${watermark}\n) WITH (\n"
+    "  'connector' = 'kafka',\n"
+    "  'topic' = '${topic}',\n"
+    "  'properties.bootstrap.servers' = '${bootstrap_servers}',\n"
+    "  'properties.security.protocol' = 'SASL_SSL',\n"
+    "  'properties.sasl.mechanism' = 'AWS_MSK_IAM',\n"
+    "  'properties.sasl.jaas.config' = 'software.amazon.msk.auth.iam.IAMLoginModule required;',\n"
+    "  'properties.sasl.client.callback.handler.class' = "
+    "'software.amazon.msk.auth.iam.IAMClientCallbackHandler',\n"
+    "  'properties.group.id' = '${group_id}',\n"
+    "  'scan.startup.mode' = '${startup_mode}',\n"
+    "  'format' = 'json'\n);\n\n\nSELECT * FROM ${table};")
+
+watermark_template = Template(",\n  WATERMARK for ${field} as ${field} - INTERVAL '${seconds}' SECONDS")
+
+datagen_template = Template(
+    "${header}\nDROP TABLE IF EXISTS ${datagen_table};\nCREATE TABLE ${datagen_table}(\n${columns}\n)\n"
+    "WITH (\n${options}\n);\n\n\nINSERT INTO ${table} \nSELECT ${select_columns} from ${datagen_table};")
+
+# paragraph kinds of a note, with their interpreter, default local properties and title
+paragraph_kinds = {
+    'udf': ('%flink', {}, Template("User Defined Function for generating ${schema} ${field} data")),
+    'source_table': ('%flink.ssql', {'type': 'update'},
+                     Template("Defining a source table to source MSK topic and querying data")),
+    'datagen': ('%flink.ssql', {}, Template("Please run this paragraph before running any additional event_time "
+                                            "based queries in order to generate new data into the MSK topic")),
+}
+# paragraph kinds running Flink SQL, the kinds a parallelism applies to
+sql_kinds = ['source_table', 'datagen']
+
+
+def header(kind, parallelism=None):
+    '''Interpreter line of a paragraph, e.g. %flink.ssql(type=update,parallelism=2)'''
+    interpreter, local_properties, _ = paragraph_kinds[kind]
+    local_properties = dict(local_properties)
+    if parallelism is not None:
+        local_properties['parallelism'] = parallelism
+    if not local_properties:
+        return interpreter
+    return interpreter + "(" + ",".join(f"{k}={v}" for k, v in local_properties.items()) + ")"
+
+
+def paragraph(kind, number, text, **title_values):
+    return {
+        "text": text,
+        "title": title_template.substitute(number=number, title=paragraph_kinds[kind][2].substitute(title_values)),
+        "config": {"title": "true"},
+    }
+
+
+def udf_name(field):
+    return f"random_{field.name}_udf"
+
+
+def choice_fields(schema):
+    '''Fields the Flink datagen connector cannot generate, a UDF picks their values'''
+    return [f for f in schema.fields if isinstance(f, datagen_schema.Choice)]
+
+
+def event_time_field(schema):
+    return next((f for f in schema.fields if isinstance(f, datagen_schema.EventTime)), None)
+
+
+def datagen_note(name, bootstrap_servers, topic, schema=None, note_id=studio_notes.note_id,
+                 watermark_seconds=default_watermark_seconds, parallelism=None,
+                 group_id=default_group_id, startup_mode=default_startup_mode):
+    '''Note generating records of `schema` into a Kafka topic and querying them
+
+    `parallelism` maps the SQL paragraph kinds (source_table, datagen) to their
+    parallelism, the others run with the parallelism of the application.
+    A watermark is defined on the event time field of the schema unless
+    `watermark_seconds` is None.
+    '''
+    schema = schema or datagen_schema.stock_schema(max_price=datagen_schema.studio_max_price)
+    parallelism = dict(default_parallelism, **(parallelism or {}))
+    unknown = sorted(set(parallelism) - set(sql_kinds))
+    if unknown:
+        raise ValueError(f"Parallelism applies to the paragraphs {sql_kinds}, not to {unknown}")
+    table = f"{schema.name}_table"
+    columns = schema.flink_columns()
+    event_time = event_time_field(schema)
+    watermark = ""
+    if watermark_seconds is not None and event_time is not None:
+        watermark = watermark_template.substitute(field=event_time.name, seconds=watermark_seconds)
+
+    paragraphs = []
+    for field in choice_fields(schema):
+        paragraphs.append(paragraph(
+            'udf', len(paragraphs) + 1,
+            udf_template.substitute(
+                header=header('udf'), values=", ".join(json.dumps(v) for v in field.values),
+                class_name="Random" + field.name.title().replace("_", "") + "UDF", function=udf_name(field)),
+            schema=schema.name, field=field.name))
+    paragraphs.append(paragraph(
+        'source_table', len(paragraphs) + 1,
+        source_table_template.substitute(
+            header=header('source_table', parallelism.get('source_table')), table=table, columns=columns,
+            watermark=watermark, topic=topic, bootstrap_servers=bootstrap_servers, group_id=group_id,
+            startup_mode=startup_mode)))
+    choices = {f.name: f for f in choice_fields(schema)}
+    select_columns = ", ".join(f"{udf_name(choices[n])}() as {n}" if n in choices else n
+                               for n in schema.field_names)
+    paragraphs.append(paragraph(
+        'datagen', len(paragraphs) + 1,
+        datagen_template.substitute(
+            header=header('datagen', parallelism.get('datagen')), datagen_table=f"generate_{schema.name}_data",
+            columns=columns, options=schema.flink_datagen_options(), table=table,
+            select_columns=select_columns)))
+    return note(name, paragraphs, note_id)
+
+
+def note(name, paragraphs, note_id=studio_notes.note_id):
+    return {
+        "paragraphs": paragraphs,
+        "name": name,
+        "id": note_id,
+        "defaultInterpreterGroup": default_interpreter_group,
+        "version": zeppelin_version,
+        "path": "/" + name,
+    }
+
+
+def note_errors(content):
+    '''Problems of a parsed note that would keep Zeppelin from importing or running it'''
+    errors = []
+    if not isinstance(content.get("name"), str) or not content["name"]:
+        errors.append("name is required")
+    if not note_id_pattern.match(str(content.get("id", ""))):
+        errors.append(f"id {content.get('id')!r} is not 9 upper case letters or digits")
+    if not str(content.get("path", "")).startswith("/"):
+        errors.append(f"path {content.get('path')!r} must start with /")
+    paragraphs = content.get("paragraphs")
+    if not isinstance(paragraphs, list) or not paragraphs:
+        errors.append("at least one paragraph is required")
+        paragraphs = []
+    for i, p in enumerate(paragraphs, 1):
+        if not isinstance(p, dict) or not str(p.get("text", "")).startswith("%"):
+            errors.append(f"paragraph {i} does not start with an interpreter, e.g. %flink.ssql")
+    return errors
+
+
+def note_text(content):
+    '''TextContent of a note, validated as the JSON Zeppelin imports
+
+    The TextContent of a Studio app holds a single note. Raises ValueError
+    listing every problem found.
+    '''
+    text = json.dumps(content)
+    errors = note_errors(json.loads(text))
+    size = len(text.encode("utf-8"))
+    if size > max_note_bytes:
+        errors.append(f"{size} bytes exceed {max_note_bytes} bytes")
+    if errors:
+        raise ValueError(f"Invalid note {content.get('name') or content.get('id')}: " + "; ".join(errors))
+    return text
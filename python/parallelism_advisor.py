@@ -0,0 +1,109 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+# Sizing of Flink applications from the expected load. The processing cost of a
+# record on one KPU (one vCPU) is modelled as a fixed cost per record plus a
+# cost per byte of record. benchmark_parallelism.py fits both from measurements.
+
+import math
+
+# seconds of one vCPU per record and per record byte, recalibrate with benchmark_parallelism.py
+default_record_cost_seconds = 20e-6
+default_byte_cost_seconds = 10e-9
+
+# leave headroom for bursts and for catching up after a restart
+target_utilization = 0.7
+# records replayed from the last checkpoint after a failure are caught up within this time
+target_catch_up_seconds = 60
+min_checkpoint_interval_ms = 10000
+# the checkpoint interval of the blueprints
+max_checkpoint_interval_ms = 60000
+max_parallelism_per_kpu = 4
+
+
+class CostModel:
+    '''Processing cost of records on a single KPU'''
+
+    def __init__(self, record_cost_seconds=default_record_cost_seconds, byte_cost_seconds=default_byte_cost_seconds):
+        if record_cost_seconds <= 0 or byte_cost_seconds < 0:
+            raise ValueError(f"Invalid costs: {record_cost_seconds} s/record, {byte_cost_seconds} s/byte")
+        self.record_cost_seconds = record_cost_seconds
+        self.byte_cost_seconds = byte_cost_seconds
+
+    def records_per_second(self, record_bytes):
+        '''Records per second a fully loaded KPU processes'''
+        return 1 / (self.record_cost_seconds + self.byte_cost_seconds * record_bytes)
+
+
+def calibrate(samples):
+    '''Fit a CostModel to (record_bytes, records_per_second) measurements of a single KPU
+
+    The cost per record is a linear function of the record size, it is fitted
+    with least squares and needs measurements of at least two record sizes.
+    '''
+    points = [(float(size), 1 / float(rate)) for size, rate in samples]
+    sizes = {size for size, _ in points}
+    if len(sizes) < 2:
+        raise ValueError("Measurements of at least two record sizes are required")
+    mean_size = sum(size for size, _ in points) / len(points)
+    mean_cost = sum(cost for _, cost in points) / len(points)
+    covariance = sum((size - mean_size) * (cost - mean_cost) for size, cost in points)
+    variance = sum((size - mean_size) ** 2 for size, _ in points)
+    # noise may make the fitted cost of a byte slightly negative
+    byte_cost = max(0.0, covariance / variance)
+    record_cost = mean_cost - byte_cost * mean_size
+    if record_cost <= 0:
+        raise ValueError("Measurements do not fit the cost model, throughput must fall with the record size")
+    return CostModel(record_cost, byte_cost)
+
+
+def smallest_divisor_at_least(value, minimum):
+    return next(d for d in range(minimum, value + 1) if value % d == 0)
+
+
+def recommend(records_per_second, record_bytes, shard_count=None, model=None):
+    '''Recommended Parallelism, ParallelismPerKpu and CheckpointInterval for the expected load
+
+    Parallelism covers the load at the target utilization. Up to the shard
+    count it is raised to a divisor of the shard count, so every source subtask
+    reads the same number of shards. ParallelismPerKpu packs the subtasks onto
+    the fewest KPUs that still cover the load.
+    '''
+    if records_per_second <= 0 or record_bytes <= 0:
+        raise ValueError(f"Expected load must be positive: {records_per_second} records/s of {record_bytes} bytes")
+    if shard_count is not None and shard_count <= 0:
+        raise ValueError(f"Shard count must be positive: {shard_count}")
+    model = model or CostModel()
+    capacity = model.records_per_second(record_bytes)
+    required_kpus = max(1, math.ceil(records_per_second / (capacity * target_utilization)))
+
+    parallelism = required_kpus
+    if shard_count and parallelism <= shard_count:
+        parallelism = smallest_divisor_at_least(shard_count, parallelism)
+    parallelism_per_kpu = max(1, min(max_parallelism_per_kpu, math.ceil(parallelism / required_kpus)))
+    # rounding up may leave fewer KPUs than the load needs, e.g. 5 subtasks for 4 KPUs
+    while parallelism_per_kpu > 1 and math.ceil(parallelism / parallelism_per_kpu) < required_kpus:
+        parallelism_per_kpu -= 1
+    kpus = math.ceil(parallelism / parallelism_per_kpu)
+
+    # capacity left over for replaying the records since the last checkpoint
+    spare = kpus * capacity - records_per_second
+    interval_ms = target_catch_up_seconds * spare / records_per_second * 1000
+    checkpoint_interval = int(min(max_checkpoint_interval_ms, max(min_checkpoint_interval_ms, interval_ms)))
+    return {
+        'Parallelism': parallelism,
+        'ParallelismPerKpu': parallelism_per_kpu,
+        'CheckpointInterval': checkpoint_interval // 1000 * 1000,
+        'KPUs': kpus,
+    }
+
+
+def recommend_from_properties(props, model=None):
+    '''Recommendation for the sizing properties, None when they are not set'''
+    if not props.get('ExpectedRecordsPerSecond'):
+        return None
+    if not props.get('AverageRecordBytes'):
+        raise ValueError("AverageRecordBytes is required with ExpectedRecordsPerSecond")
+    shard_count = int(props['SourceShardCount']) if props.get('SourceShardCount') else None
+    return recommend(float(props['ExpectedRecordsPerSecond']), float(props['AverageRecordBytes']),
+                     shard_count, model)
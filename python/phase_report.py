@@ -0,0 +1,89 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import argparse
+import fileinput
+import json
+
+import kds_load
+
+
+def metric_documents(lines):
+    '''EMF documents printed by handler_metrics, other log lines are skipped
+
+    Lines may carry a prefix, like the timestamp of `aws logs tail`.
+    '''
+    for line in lines:
+        start = line.find('{')
+        if start < 0 or '"_aws"' not in line:
+            continue
+        try:
+            document = json.loads(line[start:])
+        except ValueError:
+            continue
+        if isinstance(document, dict) and 'Handler' in document:
+            yield document
+
+
+def phase_names(document):
+    for metrics in document['_aws']['CloudWatchMetrics']:
+        for metric in metrics['Metrics']:
+            yield metric['Name']
+
+
+def summarize(documents):
+    '''Duration percentiles of every phase per handler and request type
+
+    Returns {(handler, request type): {'requests': n, 'phases': {phase: summary}}},
+    a summary holds the number of requests with the phase, the p50, p95 and
+    max milliseconds per request, and the mean number of calls per request.
+    '''
+    groups = {}
+    for document in documents:
+        group = groups.setdefault((document['Handler'], document['RequestType']), {'requests': 0, 'phases': {}})
+        group['requests'] += 1
+        counts = document.get('PhaseCounts', {})
+        for name in phase_names(document):
+            durations, calls = group['phases'].setdefault(name, ([], []))
+            durations.append(document[name])
+            calls.append(counts.get(name, 1))
+    for group in groups.values():
+        for name, (durations, calls) in group['phases'].items():
+            durations.sort()
+            group['phases'][name] = {
+                'requests': len(durations),
+                'p50': kds_load.percentile(durations, 50),
+                'p95': kds_load.percentile(durations, 95),
+                'max': durations[-1],
+                'calls': sum(calls) / len(calls),
+            }
+    return groups
+
+
+def print_phase_report(groups):
+    for (handler, request_type), group in sorted(groups.items()):
+        print(f"{handler} {request_type}: {group['requests']} requests")
+        phases = sorted(group['phases'].items(), key=lambda item: -item[1]['p50'])
+        width = max(len(name) for name, _ in phases)
+        print(f"  {'Phase':<{width}}  {'Requests':>8}  {'Calls':>7}  {'p50 ms':>10}  {'p95 ms':>10}  {'max ms':>10}")
+        for name, s in phases:
+            print(f"  {name:<{width}}  {s['requests']:>8}  {s['calls']:>7.1f}  "
+                  f"{s['p50']:>10.1f}  {s['p95']:>10.1f}  {s['max']:>10.1f}")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarize the phase timings the custom resource handlers log, e.g. from `aws logs tail`")
+    parser.add_argument("files", nargs="*", help="Log files, standard input when omitted")
+    args = parser.parse_args()
+    with fileinput.input(args.files) as lines:
+        groups = summarize(metric_documents(lines))
+    if not groups:
+        print("No phase timings found")
+        return
+    print_phase_report(groups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+# Compact binary encodings of generated records. The Lambda runtime only ships
+# boto3, so the small subsets of Avro and MessagePack needed for flat records
+# of strings and numbers are implemented here.
+
+import struct
+
+formats = ['json', 'avro', 'msgpack']
+
+
+def varint(value):
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def avro_long(value):
+    # zig-zag encoding maps signed values onto unsigned varints
+    return varint((value << 1) ^ (value >> 63))
+
+
+def avro_string(value):
+    encoded = value.encode('utf-8')
+    return avro_long(len(encoded)) + encoded
+
+
+avro_writers = {
+    'string': avro_string,
+    'int': avro_long,
+    'long': avro_long,
+    'float': struct.Struct('<f').pack,
+    'double': struct.Struct('<d').pack,
+}
+
+
+def avro_writer(avro_type):
+    '''Writer of a type of avro_writers, or of its union with null like ['null', 'string']'''
+    if isinstance(avro_type, list):
+        if len(avro_type) != 2 or avro_type[0] != 'null' or avro_type[1] not in avro_writers:
+            return None
+        write = avro_writers[avro_type[1]]
+        # the union branch index is zig-zag encoded, 0 for null and 1 for the value
+        return lambda value: b'\x00' if value is None else b'\x02' + write(value)
+    return avro_writers.get(avro_type)
+
+
+class AvroEncoder:
+    '''Avro binary encoding of flat records, without container file framing
+
+    Consumers read the datum with the writer schema from `schema()`.
+    '''
+
+    def __init__(self, name, namespace, fields):
+        self.name = name
+        self.namespace = namespace
+        self.fields = list(fields)
+        self.writers = [avro_writer(t) for _, t in self.fields]
+        for (field_name, avro_type), writer in zip(self.fields, self.writers):
+            if writer is None:
+                raise ValueError(f"Unsupported Avro type {avro_type} of field {field_name}")
+
+    def schema(self):
+        return {
+            'name': self.name,
+            'namespace': self.namespace,
+            'type': 'record',
+            'fields': [{'name': n, 'type': t} for n, t in self.fields]
+        }
+
+    def encode(self, row):
+        return b''.join(write(value) for write, value in zip(self.writers, row))
+
+
+def msgpack_str(value):
+    encoded = value.encode('utf-8')
+    size = len(encoded)
+    if size < 32:
+        return bytes([0xa0 | size]) + encoded
+    if size < 0x100:
+        return bytes([0xd9, size]) + encoded
+    if size < 0x10000:
+        return b'\xda' + struct.pack('>H', size) + encoded
+    return b'\xdb' + struct.pack('>I', size) + encoded
+
+
+def msgpack_int(value):
+    if 0 <= value < 0x80:
+        return bytes([value])
+    if -32 <= value < 0:
+        return struct.pack('b', value)
+    if value >= 0:
+        return b'\xcf' + struct.pack('>Q', value)
+    return b'\xd3' + struct.pack('>q', value)
+
+
+def msgpack_value(value):
+    if isinstance(value, str):
+        return msgpack_str(value)
+    if isinstance(value, bool):
+        return b'\xc3' if value else b'\xc2'
+    if isinstance(value, int):
+        return msgpack_int(value)
+    if isinstance(value, float):
+        return b'\xcb' + struct.pack('>d', value)
+    raise ValueError(f"Unsupported MessagePack value: {value!r}")
+
+
+class MessagePackEncoder:
+    '''MessagePack map per record, keyed by field name like the JSON records'''
+
+    def __init__(self, field_names):
+        if len(field_names) >= 16:
+            raise ValueError("Records with 16 or more fields are not supported")
+        self.header = bytes([0x80 | len(field_names)])
+        self.keys = [msgpack_str(n) for n in field_names]
+
+    def encode(self, row):
+        return self.header + b''.join(k + msgpack_value(v) for k, v in zip(self.keys, row))
+
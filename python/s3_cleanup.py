@@ -0,0 +1,102 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+LOGGER = logging.getLogger(__name__)
+
+# DeleteObjects accepts at most 1000 keys per call
+max_keys_per_delete = 1000
+default_max_workers = 8
+
+# Retry settings for keys that fail inside a partially failed DeleteObjects call
+max_attempts = 5
+backoff_base_seconds = 0.1
+backoff_max_seconds = 2
+
+
+def is_versioned(s3_client, bucket):
+    # suspended buckets still hold the versions written while versioning was enabled
+    return s3_client.get_bucket_versioning(Bucket=bucket).get('Status') in ('Enabled', 'Suspended')
+
+
+def list_object_pages(s3_client, bucket):
+    '''Pages of up to 1000 {'Key': ...} identifiers of the current objects'''
+    kwargs = {'Bucket': bucket, 'MaxKeys': max_keys_per_delete}
+    while True:
+        response = s3_client.list_objects_v2(**kwargs)
+        objects = [{'Key': o['Key']} for o in response.get('Contents', [])]
+        if objects:
+            yield objects
+        if not response.get('IsTruncated'):
+            return
+        kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+
+def list_version_pages(s3_client, bucket):
+    '''Pages of up to 1000 {'Key': ..., 'VersionId': ...} identifiers of all versions and delete markers'''
+    kwargs = {'Bucket': bucket, 'MaxKeys': max_keys_per_delete}
+    while True:
+        response = s3_client.list_object_versions(**kwargs)
+        objects = [{'Key': v['Key'], 'VersionId': v['VersionId']}
+                   for v in response.get('Versions', []) + response.get('DeleteMarkers', [])]
+        # a page of versions plus delete markers may exceed the DeleteObjects limit
+        for offset in range(0, len(objects), max_keys_per_delete):
+            yield objects[offset:offset + max_keys_per_delete]
+        if not response.get('IsTruncated'):
+            return
+        kwargs['KeyMarker'] = response['NextKeyMarker']
+        kwargs['VersionIdMarker'] = response['NextVersionIdMarker']
+
+
+def delete_page(s3_client, bucket, objects):
+    '''Delete one page of objects, retrying only the keys that failed'''
+    for attempt in range(max_attempts):
+        response = s3_client.delete_objects(Bucket=bucket, Delete={'Objects': objects, 'Quiet': True})
+        errors = response.get('Errors', [])
+        if not errors:
+            return
+        failed = {(e['Key'], e.get('VersionId')) for e in errors}
+        objects = [o for o in objects if (o['Key'], o.get('VersionId')) in failed]
+        LOGGER.warning("Failed to delete %d objects (attempt %d/%d): %s %s", len(objects),
+                       attempt + 1, max_attempts, errors[0].get('Code'), errors[0].get('Message'))
+        if attempt + 1 < max_attempts:
+            time.sleep(random.uniform(0, min(backoff_max_seconds, backoff_base_seconds * 2 ** attempt)))
+    raise Exception(f"Unable to delete {len(objects)} objects from {bucket} after {max_attempts} attempts: "
+                    f"{errors[0].get('Code')} {errors[0].get('Message')}")
+
+
+def empty_bucket(s3_client, bucket, max_workers=default_max_workers):
+    '''Delete every object, version and delete marker of a bucket
+
+    Listing continues while up to `max_workers` DeleteObjects calls run, at
+    most twice as many pages are held in memory. Returns the number of deleted
+    objects and raises the first failure.
+    '''
+    pages = list_version_pages if is_versioned(s3_client, bucket) else list_object_pages
+    deleted = 0
+    pending = {}
+
+    def collect():
+        nonlocal deleted
+        for future in wait(pending, return_when=FIRST_COMPLETED).done:
+            count = pending.pop(future)
+            future.result()
+            deleted += count
+        LOGGER.info("Deleted %d objects from %s so far", deleted, bucket)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for objects in pages(s3_client, bucket):
+                while len(pending) >= 2 * max_workers:
+                    collect()
+                pending[executor.submit(delete_page, s3_client, bucket, objects)] = len(objects)
+            while pending:
+                collect()
+        finally:
+            for future in pending:
+                future.cancel()
+    return deleted
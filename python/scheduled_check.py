@@ -0,0 +1,50 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+# Custom resource requests that outlive a Lambda invocation. The pending request
+# is kept in a scheduled EventBridge rule re-invoking the function with
+# {key: {'Event': event, 'Deadline': ...}}, the check completing the request
+# cancels the rule and sends the deferred response.
+
+import json
+import logging
+import time
+
+import aws_clients
+
+LOGGER = logging.getLogger(__name__)
+
+check_schedule = 'rate(1 minute)'
+# CloudFormation waits an hour for a custom resource response
+timeout_seconds = 55 * 60
+
+
+def rule_name(prefix, event):
+    return prefix + event['RequestId']
+
+
+def schedule(prefix, key, event, context, description, now=None):
+    '''Re-invoke the function with the pending request every minute until the check is cancelled'''
+    deadline = (now or time.time)() + timeout_seconds
+    pending = {key: {'Event': event, 'Deadline': deadline}}
+    events = aws_clients.client('events')
+    rule = rule_name(prefix, event)
+    events.put_rule(Name=rule, ScheduleExpression=check_schedule, State='ENABLED', Description=description)
+    events.put_targets(Rule=rule, Targets=[
+        {'Id': 'check', 'Arn': context.invoked_function_arn, 'Input': json.dumps(pending)}])
+    return rule
+
+
+def is_expired(pending, now=None):
+    return (now or time.time)() >= pending['Deadline']
+
+
+def cancel(prefix, event):
+    '''Delete the rule of the pending request, so the response is sent once'''
+    rule = rule_name(prefix, event)
+    events = aws_clients.client('events')
+    try:
+        events.remove_targets(Rule=rule, Ids=['check'])
+        events.delete_rule(Name=rule)
+    except Exception as e:
+        LOGGER.error("Unable to delete rule %s: %s", rule, e)
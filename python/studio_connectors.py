@@ -0,0 +1,84 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+# Connector artifacts of Studio apps. A bundle groups the Maven artifacts one
+# connector needs, every Studio runtime gets the artifacts built for its Flink
+# version.
+
+# Flink version of the Studio runtimes with connector artifacts
+runtime_flink_versions = {
+    'ZEPPELIN-FLINK-2_0': '1.13',
+    'ZEPPELIN-FLINK-3_0': '1.15',
+}
+
+# bundle name to the (group id, artifact id, version) of its artifacts per Flink version
+bundles = {
+    'kafka': {
+        '1.13': [("org.apache.flink", "flink-sql-connector-kafka_2.12", "1.13.2")],
+        '1.15': [("org.apache.flink", "flink-connector-kafka", "1.15.4")],
+    },
+    'kinesis': {
+        '1.13': [("org.apache.flink", "flink-sql-connector-kinesis_2.12", "1.13.2")],
+        '1.15': [("org.apache.flink", "flink-sql-connector-kinesis", "1.15.4")],
+    },
+    'msk-iam': {
+        '1.13': [("software.amazon.msk", "aws-msk-iam-auth", "1.1.6")],
+        '1.15': [("software.amazon.msk", "aws-msk-iam-auth", "1.1.6")],
+    },
+    'iceberg': {
+        '1.13': [("org.apache.iceberg", "iceberg-flink-runtime-1.13", "0.13.2")],
+        '1.15': [("org.apache.iceberg", "iceberg-flink-runtime-1.15", "1.1.0")],
+    },
+    'hudi': {
+        '1.13': [("org.apache.hudi", "hudi-flink1.13-bundle", "0.12.1")],
+        '1.15': [("org.apache.hudi", "hudi-flink1.15-bundle", "0.12.2")],
+    },
+    's3': {
+        '1.13': [("org.apache.flink", "flink-s3-fs-hadoop", "1.13.2")],
+        '1.15': [("org.apache.flink", "flink-s3-fs-hadoop", "1.15.4")],
+    },
+}
+
+# the connectors of the Studio blueprints, reading MSK with IAM auth and Kinesis
+default_bundles = ['kafka', 'kinesis', 'msk-iam']
+
+
+def bundle_names(value):
+    '''Bundle names of a resource property, a list or a comma separated string'''
+    if isinstance(value, str):
+        value = value.split(',')
+    return [name.strip().lower() for name in value if name.strip()]
+
+
+def artifact_errors(names, runtime_environment):
+    flink_version = runtime_flink_versions.get(runtime_environment)
+    if flink_version is None:
+        return [f"RuntimeEnvironment must be one of {sorted(runtime_flink_versions)}, not {runtime_environment}"]
+    errors = []
+    for name in names:
+        if name not in bundles:
+            errors.append(f"Unknown connector bundle {name}, expected some of {sorted(bundles)}")
+        elif flink_version not in bundles[name]:
+            errors.append(f"Connector bundle {name} is not available for {runtime_environment}")
+    return errors
+
+
+def custom_artifacts(names, runtime_environment):
+    '''CustomArtifactsConfiguration of the bundles for the runtime, raises ValueError listing every problem'''
+    errors = artifact_errors(names, runtime_environment)
+    if errors:
+        raise ValueError("; ".join(errors))
+    flink_version = runtime_flink_versions[runtime_environment]
+    references = []
+    for name in names:
+        for reference in bundles[name][flink_version]:
+            # a bundle listed twice adds its artifacts once
+            if reference not in references:
+                references.append(reference)
+    return [
+        {
+            'ArtifactType': "DEPENDENCY_JAR",
+            'MavenReference': {'GroupId': group_id, 'ArtifactId': artifact_id, 'Version': version},
+        }
+        for group_id, artifact_id, version in references
+    ]
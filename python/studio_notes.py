@@ -0,0 +1,8 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+# Shared by the create function, which imports the note into the Studio app,
+# and the run notebook function, which runs its paragraphs.
+
+# id of the single note of a Studio blueprint app
+note_id = "ABCDEFGHI"
@@ -0,0 +1,132 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import botocore
+import pytest
+from unittest.mock import MagicMock, patch
+
+import app_waiter
+import lambda_create_studio_app
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeContext:
+    def __init__(self, clock, remaining_seconds):
+        self.clock = clock
+        self.ends = clock.now + remaining_seconds
+
+    def get_remaining_time_in_millis(self):
+        return int((self.ends - self.clock.now) * 1000)
+
+
+def client_error(code):
+    return botocore.exceptions.ClientError({"Error": {"Code": code, "Message": code}}, "DescribeApplication")
+
+
+def described(*statuses):
+    return [s if isinstance(s, Exception) else {"ApplicationDetail": {"ApplicationStatus": s}} for s in statuses]
+
+
+def backoff(clock, remaining_seconds=300):
+    return app_waiter.backoff_for(FakeContext(clock, remaining_seconds), sleep=clock.sleep, clock=clock.time)
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+def test_wait_while_backs_off_exponentially_with_jitter():
+    clock = FakeClock()
+    client = MagicMock()
+    client.describe_application.side_effect = described(*["STARTING"] * 8, "RUNNING")
+
+    status = app_waiter.wait_while(client, "app", ["STARTING"], backoff(clock))
+
+    assert status == "RUNNING"
+    assert len(clock.sleeps) == 8
+    for sleep, delay in zip(clock.sleeps, [1, 2, 4, 8, 16, 20, 20, 20]):
+        assert delay / 2 <= sleep <= delay
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+def test_wait_while_gives_up_before_the_lambda_runs_out_of_time():
+    clock = FakeClock()
+    client = MagicMock()
+    client.describe_application.return_value = described("UPDATING")[0]
+
+    with pytest.raises(Exception, match="Operation timed out"):
+        app_waiter.wait_while(client, "app", ["UPDATING"], backoff(clock, remaining_seconds=60))
+
+    # the safety margin is kept to report the failure to CloudFormation
+    assert 60 - app_waiter.safety_margin_seconds - 1e-9 <= clock.now <= 60 - app_waiter.safety_margin_seconds + 1e-9
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+def test_throttled_describe_calls_are_retried():
+    clock = FakeClock()
+    client = MagicMock()
+    client.describe_application.side_effect = described(
+        client_error("ThrottlingException"), client_error("ThrottlingException"), "RUNNING")
+
+    assert app_waiter.wait_while(client, "app", ["STARTING"], backoff(clock)) == "RUNNING"
+    assert len(clock.sleeps) == 2
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+def test_other_errors_are_raised():
+    clock = FakeClock()
+    client = MagicMock()
+    client.describe_application.side_effect = described(client_error("AccessDeniedException"))
+
+    with pytest.raises(botocore.exceptions.ClientError):
+        app_waiter.wait_while(client, "app", ["STARTING"], backoff(clock))
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+def test_deleted_application_ends_the_wait():
+    clock = FakeClock()
+    client = MagicMock()
+    client.describe_application.side_effect = described("DELETING", client_error("ResourceNotFoundException"))
+
+    assert app_waiter.wait_while(client, "app", ["DELETING"], backoff(clock)) is None
+
+
+def test_deadline_without_context_uses_the_default():
+    clock = FakeClock()
+
+    deadline = app_waiter.Deadline({}, default_seconds=100, clock=clock.time)
+
+    assert deadline.remaining() == 100 - app_waiter.safety_margin_seconds
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("lambda_create_studio_app.LOGGER", MagicMock())
+@patch("time.sleep")
+def test_studio_delete_waits_for_the_vpc_update(sleep):
+    client = MagicMock()
+    detail = {
+        "ApplicationVersionId": 3,
+        "CreateTimestamp": "ts",
+        "ApplicationStatus": "READY",
+        "ApplicationConfigurationDescription": {"VpcConfigurationDescriptions": [{"VpcConfigurationId": "vpc"}]}
+    }
+    client.describe_application.side_effect = [{"ApplicationDetail": detail}] + described(
+        "UPDATING", "UPDATING") + [{"ApplicationDetail": dict(detail, ApplicationConfigurationDescription={})}] + \
+        described(client_error("ResourceNotFoundException"))
+
+    assert lambda_create_studio_app.delete_app(client, "app", app_waiter.backoff_for())
+
+    # after the detach, the two UPDATING polls and the delete
+    assert sleep.call_count == 4
+    client.delete_application_vpc_configuration.assert_called_once_with(
+        ApplicationName="app", CurrentApplicationVersionId=3, VpcConfigurationId="vpc")
+    client.delete_application.assert_called_once_with(ApplicationName="app", CreateTimestamp="ts")
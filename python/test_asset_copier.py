@@ -0,0 +1,274 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import hashlib
+import os
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+from botocore.exceptions import ClientError
+
+import asset_copier
+import lambda_copy_assets_to_s3
+
+
+last_modified = 'Wed, 01 Jan 2025 00:00:00 GMT'
+
+
+def etag(body):
+    return '"' + hashlib.md5(body).hexdigest() + '"'
+
+
+class AssetServer(ThreadingHTTPServer):
+    '''Serves `assets` by path with validators and tracks how many requests overlap'''
+
+    def __init__(self, assets, delay=0.05, validators=True):
+        super().__init__(('127.0.0.1', 0), AssetRequestHandler)
+        self.assets = assets
+        self.delay = delay
+        self.validators = validators
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.responses = []
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class AssetRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        body = server.assets.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        if server.validators and self.headers.get('If-None-Match') == etag(body):
+            server.responses.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+        with server.lock:
+            server.responses.append(200)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(server.delay)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        if server.validators:
+            self.send_header('ETag', etag(body))
+            self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        # write in small pieces so the copier sees short reads
+        for offset in range(0, len(body), 700):
+            self.wfile.write(body[offset:offset + 700])
+        with server.lock:
+            server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(validators=True):
+    assets = {f"/awslabs/asset-{i}.jar": os.urandom(1000 * (i + 1) + 17) for i in range(6)}
+    server = AssetServer(assets, validators=validators)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def server():
+    server = start_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def plain_server():
+    server = start_server(validators=False)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class StubS3Client:
+    '''Assembles single and multipart uploads in memory'''
+
+    def __init__(self, fail_part=None):
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.metadata = {}
+        self.uploads = {}
+        self.aborted = []
+        self.part_calls = 0
+        self.writes = 0
+        self.metadata_copies = 0
+        self.fail_part = fail_part
+
+    def head_object(self, Bucket, Key):
+        with self.lock:
+            if (Bucket, Key) not in self.objects:
+                raise ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+            return {'Metadata': dict(self.metadata[(Bucket, Key)])}
+
+    def put_object(self, Bucket, Key, Body, Metadata):
+        with self.lock:
+            self.writes += 1
+            self.objects[(Bucket, Key)] = Body
+            self.metadata[(Bucket, Key)] = Metadata
+
+    def copy_object(self, Bucket, Key, CopySource, Metadata, MetadataDirective):
+        with self.lock:
+            assert CopySource == {'Bucket': Bucket, 'Key': Key} and MetadataDirective == 'REPLACE'
+            self.metadata_copies += 1
+            self.metadata[(Bucket, Key)] = Metadata
+
+    def create_multipart_upload(self, Bucket, Key, Metadata):
+        with self.lock:
+            upload_id = f"upload-{len(self.uploads)}-{Key}"
+            self.uploads[upload_id] = {'metadata': Metadata, 'parts': {}}
+            return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self.lock:
+            self.part_calls += 1
+            if PartNumber == self.fail_part:
+                raise Exception("InternalError")
+            self.uploads[UploadId]['parts'][PartNumber] = Body
+            return {'ETag': f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        with self.lock:
+            upload = self.uploads.pop(UploadId)
+            parts = upload['parts']
+            assert [p['PartNumber'] for p in MultipartUpload['Parts']] == sorted(parts)
+            self.writes += 1
+            self.objects[(Bucket, Key)] = b''.join(parts[n] for n in sorted(parts))
+            self.metadata[(Bucket, Key)] = upload['metadata']
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        with self.lock:
+            self.aborted.append(Key)
+            self.uploads.pop(UploadId)
+
+
+@patch("asset_copier.LOGGER", MagicMock())
+@patch("asset_copier.part_size", 2048)
+def test_copy_assets_streams_every_asset_into_s3(server):
+    s3 = StubS3Client()
+    urls = [server.url(path) for path in server.assets]
+
+    keys = asset_copier.copy_assets(s3, urls, "bucket", max_workers=3)
+
+    assert keys == [(f"asset-{i}.jar", True) for i in range(6)]
+    for path, body in server.assets.items():
+        assert s3.objects[("bucket", path.rsplit('/', 1)[-1])] == body
+    # the first asset fits into a single part, the others are multipart uploads
+    assert s3.part_calls == sum(-(-len(b) // 2048) for b in server.assets.values() if len(b) >= 2048)
+    assert 1 < server.max_active <= 3
+
+
+@patch("asset_copier.LOGGER", MagicMock())
+@patch("asset_copier.part_size", 2048)
+def test_failed_part_aborts_the_multipart_upload(server):
+    s3 = StubS3Client(fail_part=2)
+
+    with pytest.raises(Exception, match="InternalError"):
+        asset_copier.copy_assets(s3, [server.url("/awslabs/asset-5.jar")], "bucket")
+
+    assert s3.aborted == ["asset-5.jar"]
+    assert s3.uploads == {}
+
+
+def test_missing_asset_fails_the_copy(server):
+    with pytest.raises(Exception, match="404"):
+        asset_copier.copy_assets(StubS3Client(), [server.url("/awslabs/missing.jar")], "bucket")
+
+
+def test_duplicate_file_names_are_rejected():
+    with pytest.raises(Exception, match="distinct"):
+        asset_copier.copy_assets(StubS3Client(), ["https://a/x.jar", "https://b/x.jar"], "bucket")
+
+
+@patch("asset_copier.LOGGER", MagicMock())
+@patch("boto3.client")
+@patch("cfnresponse.send")
+def test_handler_copies_the_asset_list(send, client, server):
+    s3 = StubS3Client()
+    client.return_value = s3
+    urls = [server.url(path) for path in server.assets]
+    event = {"RequestType": "Create"}
+
+    with patch.dict(os.environ, {"AssetList": ",".join(urls), "bucketName": "bucket"}):
+        lambda_copy_assets_to_s3.handler(event, {})
+
+    assert len(s3.objects) == 6
+    assert client.call_count == 1
+    send.assert_called_with(event, {}, "SUCCESS", {"Message": "Resource creation successful!"})
+
+
+@patch("asset_copier.LOGGER", MagicMock())
+@patch("asset_copier.part_size", 2048)
+def test_copies_record_digest_and_source_validators(server):
+    s3 = StubS3Client()
+
+    asset_copier.copy_assets(s3, [server.url(path) for path in server.assets], "bucket")
+
+    for path, body in server.assets.items():
+        assert s3.metadata[("bucket", path.rsplit('/', 1)[-1])] == {
+            'sha256': hashlib.sha256(body).hexdigest(),
+            'source-etag': etag(body),
+            'source-last-modified': last_modified,
+        }
+    # multipart uploads create the object with its digest rather than copying it afterwards
+    assert s3.metadata_copies == 0
+
+
+@patch("asset_copier.LOGGER", MagicMock())
+@patch("asset_copier.part_size", 2048)
+def test_unchanged_assets_are_not_downloaded_again(server):
+    s3 = StubS3Client()
+    urls = [server.url(path) for path in server.assets]
+    asset_copier.copy_assets(s3, urls, "bucket")
+    writes = s3.writes
+
+    results = asset_copier.copy_assets(s3, urls, "bucket")
+
+    assert all(not copied for _, copied in results)
+    assert server.responses[6:] == [304] * 6
+    assert s3.writes == writes
+
+
+@patch("asset_copier.LOGGER", MagicMock())
+@patch("asset_copier.part_size", 2048)
+def test_changed_assets_are_copied_again(server):
+    s3 = StubS3Client()
+    url = server.url("/awslabs/asset-4.jar")
+    asset_copier.copy_assets(s3, [url], "bucket")
+    server.assets["/awslabs/asset-4.jar"] = b"new content" * 1000
+
+    assert asset_copier.copy_assets(s3, [url], "bucket") == [("asset-4.jar", True)]
+    assert s3.objects[("bucket", "asset-4.jar")] == b"new content" * 1000
+
+
+@patch("asset_copier.LOGGER", MagicMock())
+@patch("asset_copier.part_size", 2048)
+def test_identical_content_is_not_uploaded_without_validators(plain_server):
+    s3 = StubS3Client()
+    urls = [plain_server.url(path) for path in plain_server.assets]
+    asset_copier.copy_assets(s3, urls, "bucket")
+    writes = s3.writes
+    part_calls = s3.part_calls
+
+    results = asset_copier.copy_assets(s3, urls, "bucket")
+
+    assert all(not copied for _, copied in results)
+    assert plain_server.responses[6:] == [200] * 6
+    assert s3.writes == writes
+    assert s3.uploads == {}
+    # identical content is recognized before a multipart upload starts
+    assert s3.part_calls == part_calls
+    assert s3.aborted == []
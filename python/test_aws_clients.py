@@ -0,0 +1,48 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+from unittest.mock import MagicMock, patch
+
+import aws_clients
+
+
+@patch("boto3.client")
+def test_client_is_created_once_per_service(boto3_client):
+    boto3_client.side_effect = lambda service, **kwargs: MagicMock(service=service)
+
+    kinesis = aws_clients.client('kinesis')
+
+    assert aws_clients.client('kinesis') is kinesis
+    assert aws_clients.client('s3') is not kinesis
+    assert boto3_client.call_count == 2
+    boto3_client.assert_any_call('kinesis')
+
+
+@patch("boto3.client")
+def test_client_with_a_pool_size_is_separate(boto3_client):
+    boto3_client.side_effect = lambda service, **kwargs: MagicMock()
+
+    default = aws_clients.client('kinesis')
+    pooled = aws_clients.client('kinesis', max_pool_connections=32)
+
+    assert pooled is not default
+    assert aws_clients.client('kinesis', max_pool_connections=32) is pooled
+    assert boto3_client.call_args[1]['config'].max_pool_connections == 32
+
+
+@patch("boto3.client")
+def test_clear_creates_new_clients(boto3_client):
+    boto3_client.side_effect = lambda service, **kwargs: MagicMock()
+    first = aws_clients.client('s3')
+
+    aws_clients.clear()
+
+    assert aws_clients.client('s3') is not first
+
+
+def test_error_code():
+    error = Exception("boom")
+    error.response = {'Error': {'Code': 'ResourceNotFoundException'}}
+
+    assert aws_clients.error_code(error) == 'ResourceNotFoundException'
+    assert aws_clients.error_code(Exception("boom")) is None
@@ -0,0 +1,144 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import json
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import cfnresponse
+
+
+class FlakyServer(ThreadingHTTPServer):
+    '''Answers PUT requests with the scripted `failures` first: a status code, 'drop' or 'slow' '''
+
+    def __init__(self, failures):
+        super().__init__(('127.0.0.1', 0), FlakyRequestHandler)
+        self.failures = list(failures)
+        self.lock = threading.Lock()
+        self.bodies = []
+        self.connections = set()
+
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/response?signature=abc"
+
+
+class FlakyRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_PUT(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with server.lock:
+            server.connections.add(self.client_address)
+            failure = server.failures.pop(0) if server.failures else None
+            if failure is None:
+                server.bodies.append(body)
+        if failure == 'drop':
+            self.close_connection = True
+            return
+        if failure == 'slow':
+            time.sleep(cfnresponse.read_timeout_seconds + 0.2)
+        self.send_response(failure if isinstance(failure, int) else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def flaky_server(request):
+    server = FlakyServer(request.param)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def event(server):
+    return {
+        'ResponseURL': server.url(),
+        'StackId': 'stack',
+        'RequestId': 'request',
+        'LogicalResourceId': 'resource',
+    }
+
+
+context = MagicMock(log_stream_name='log-stream')
+
+
+@pytest.mark.parametrize("flaky_server", [[]], indirect=True)
+@patch("cfnresponse.LOGGER", MagicMock())
+def test_send_puts_a_compact_body(flaky_server):
+    status = cfnresponse.send(event(flaky_server), context, cfnresponse.SUCCESS, {"Message": "done"})
+
+    assert status == 200
+    body, = flaky_server.bodies
+    assert b'": ' not in body and b', "' not in body
+    assert json.loads(body) == {
+        'Status': 'SUCCESS',
+        'Reason': 'See the details in CloudWatch Log Stream: log-stream',
+        'PhysicalResourceId': 'log-stream',
+        'StackId': 'stack',
+        'RequestId': 'request',
+        'LogicalResourceId': 'resource',
+        'NoEcho': False,
+        'Data': {"Message": "done"},
+    }
+
+
+@pytest.mark.parametrize("flaky_server", [[503, 'drop', 500]], indirect=True)
+@patch("cfnresponse.LOGGER", MagicMock())
+@patch("time.sleep")
+def test_send_retries_server_and_connection_errors(sleep, flaky_server):
+    status = cfnresponse.send(event(flaky_server), context, cfnresponse.FAILED, {"Message": "boom"},
+                              physicalResourceId='app')
+
+    assert status == 200
+    assert json.loads(flaky_server.bodies[0])['PhysicalResourceId'] == 'app'
+    assert sleep.call_count == 3
+    for call, delay in zip(sleep.call_args_list, [0.5, 1, 2]):
+        assert 0 <= call[0][0] <= delay
+
+
+@pytest.mark.parametrize("flaky_server", [['slow']], indirect=True)
+@patch("cfnresponse.LOGGER", MagicMock())
+@patch("cfnresponse.read_timeout_seconds", 0.2)
+@patch("time.sleep")
+def test_send_retries_after_a_read_timeout(sleep, flaky_server):
+    with patch("cfnresponse.http", cfnresponse.urllib3.PoolManager(
+            timeout=cfnresponse.urllib3.Timeout(connect=1, read=0.2), retries=False)):
+        status = cfnresponse.send(event(flaky_server), context, cfnresponse.SUCCESS, {})
+
+    assert status == 200
+    assert sleep.call_count == 1
+
+
+@pytest.mark.parametrize("flaky_server", [[403]], indirect=True)
+@patch("cfnresponse.LOGGER", MagicMock())
+@patch("time.sleep")
+def test_send_does_not_retry_client_errors(sleep, flaky_server):
+    assert cfnresponse.send(event(flaky_server), context, cfnresponse.SUCCESS, {}) == 403
+    sleep.assert_not_called()
+
+
+@pytest.mark.parametrize("flaky_server", [[502] * cfnresponse.max_attempts], indirect=True)
+@patch("cfnresponse.LOGGER", MagicMock())
+@patch("time.sleep")
+def test_send_gives_up_without_raising(sleep, flaky_server):
+    assert cfnresponse.send(event(flaky_server), context, cfnresponse.SUCCESS, {}) is None
+    assert sleep.call_count == cfnresponse.max_attempts - 1
+    assert flaky_server.bodies == []
+
+
+@pytest.mark.parametrize("flaky_server", [[]], indirect=True)
+@patch("cfnresponse.LOGGER", MagicMock())
+def test_send_reuses_the_connection(flaky_server):
+    for _ in range(3):
+        cfnresponse.send(event(flaky_server), context, cfnresponse.SUCCESS, {})
+
+    assert len(flaky_server.bodies) == 3
+    assert len(flaky_server.connections) == 1
@@ -0,0 +1,216 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import datetime
+import json
+import struct
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import datagen_schema
+
+start_us = 1700000000 * 1000000 + 999990
+
+
+def records(schema, count, seed=1, **kwargs):
+    return [json.loads(e['Data']) for e in schema.generate_entries(count, seed=seed, start_us=start_us, **kwargs)]
+
+
+def test_stock_records_are_valid_json_without_newlines():
+    entries = list(datagen_schema.stock_schema().generate_entries(100, seed=1, start_us=start_us))
+
+    assert len(entries) == 100
+    for entry in entries:
+        assert b"\n" not in entry['Data']
+        record = json.loads(entry['Data'])
+        assert list(record) == ['ticker', 'event_time', 'price']
+        assert record['ticker'] == entry['PartitionKey']
+        assert record['ticker'] in datagen_schema.stock_tickers
+        assert 0 <= record['price'] <= 100
+
+
+def test_event_times_are_monotonic_across_seconds():
+    times = [datetime.datetime.fromisoformat(r['event_time'])
+             for r in records(datagen_schema.stock_schema(), 30)]
+
+    assert times == sorted(times)
+    assert times[0] == datagen_schema.epoch + datetime.timedelta(microseconds=start_us)
+    assert times[-1] - times[0] == datetime.timedelta(microseconds=29)
+
+
+def test_same_seed_reproduces_the_data_set_regardless_of_chunking():
+    schema = datagen_schema.stock_schema()
+
+    one_chunk = records(schema, 500, seed=7, chunk_size=500)
+    many_chunks = records(schema, 500, seed=7, chunk_size=64)
+    other_seed = records(schema, 500, seed=8)
+
+    assert one_chunk == many_chunks
+    assert one_chunk != other_seed
+
+
+def test_key_skew_makes_the_first_ticker_hot():
+    uniform = Counter(r['ticker'] for r in records(datagen_schema.stock_schema(ticker_count=50), 20000))
+    skewed = Counter(r['ticker'] for r in records(datagen_schema.stock_schema(ticker_count=50, skew=1.2), 20000))
+
+    assert len(uniform) == 50
+    assert uniform.most_common(1)[0][1] < 600
+    assert skewed.most_common(1)[0] == ('AAPL', skewed['AAPL'])
+    assert skewed['AAPL'] > 4000
+
+
+def test_payload_pads_records():
+    schema = datagen_schema.stock_schema(payload_bytes=1000)
+
+    entries = list(schema.generate_entries(10, seed=1, start_us=start_us))
+
+    assert all(len(json.loads(e['Data'])['payload']) == 1000 for e in entries)
+    assert all(1000 < len(e['Data']) < 1100 for e in entries)
+
+
+def test_stock_schema_from_properties():
+    schema = datagen_schema.stock_schema_from_properties(
+        {'TickerCount': '8', 'KeySkew': '0.5', 'PayloadBytes': '16'})
+
+    assert schema.field('ticker').values[-1] == 'T0007'
+    assert schema.field_names == ['ticker', 'event_time', 'price', 'payload']
+
+
+def test_flink_ddl_fragments():
+    schema = datagen_schema.orders_schema()
+
+    assert schema.flink_columns().splitlines()[0] == "  product_id BIGINT,"
+    options = schema.flink_datagen_options()
+    assert "'connector' = 'datagen'" in options
+    assert "'fields.quantity.max' = '25'" in options
+    assert "'fields.buyer.length' = '15'" in options
+
+
+def test_entry_factory_is_thread_safe():
+    factory = datagen_schema.stock_schema().entry_factory(seed=3, chunk_size=100)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        entries = list(executor.map(lambda _: factory(), range(5000)))
+
+    assert len(entries) == 5000
+    assert all(e['PartitionKey'] in datagen_schema.stock_tickers for e in entries)
+
+
+def offsets_us(rows, step_us=1):
+    # event time of every record relative to its undisturbed position
+    base = datagen_schema.epoch + datetime.timedelta(microseconds=start_us)
+    return [(datetime.datetime.fromisoformat(r['event_time']) - base) // datetime.timedelta(microseconds=1) - i * step_us
+            for i, r in enumerate(rows)]
+
+
+def test_late_records_are_bounded():
+    disorder = datagen_schema.EventTimeDisorder(max_lateness_ms=50, late_fraction=0.2)
+    rows = records(datagen_schema.stock_schema(disorder=disorder), 10000)
+
+    late = [o for o in offsets_us(rows) if o < 0]
+    assert 1700 < len(late) < 2300
+    assert min(late) >= -50000
+    assert [r['price'] for r in rows] == [r['price'] for r in records(datagen_schema.stock_schema(), 10000)]
+
+
+def test_bursts_share_event_times_and_keep_the_rate():
+    disorder = datagen_schema.EventTimeDisorder(burst_probability=0.1, burst_size=20)
+    rows = records(datagen_schema.stock_schema(disorder=disorder), 5000, chunk_size=1000)
+
+    times = [r['event_time'] for r in rows]
+    assert times == sorted(times)
+    assert Counter(times).most_common(1)[0][1] == 20
+    assert len(set(times)) < 2500
+    assert all(abs(o) < 5000 for o in offsets_us(rows))
+
+
+def test_key_clock_skew_is_fixed_per_ticker():
+    disorder = datagen_schema.EventTimeDisorder(key_clock_skew_ms=100)
+    rows = records(datagen_schema.stock_schema(disorder=disorder), 1000)
+
+    per_ticker = {}
+    for row, offset in zip(rows, offsets_us(rows)):
+        per_ticker.setdefault(row['ticker'], set()).add(offset)
+    assert all(len(o) == 1 for o in per_ticker.values())
+    assert all(abs(o.pop()) <= 100000 for o in per_ticker.values())
+
+
+def test_idle_tickers_pause_every_other_period():
+    disorder = datagen_schema.EventTimeDisorder(idle_key_fraction=0.4, idle_period_ms=1)
+    schema = datagen_schema.stock_schema(ticker_count=10, disorder=disorder)
+    rows = [json.loads(e['Data']) for e in schema.generate_entries(20000, seed=1, start_us=0)]
+
+    idle = set(schema.field('ticker').values[6:])
+    for i, row in enumerate(rows):
+        if (i // 1000) % 2 == 1:
+            assert row['ticker'] not in idle
+    assert idle <= {r['ticker'] for r in rows}
+
+
+def test_disorder_from_properties():
+    schema = datagen_schema.stock_schema_from_properties(
+        {'MaxLatenessMs': '5000', 'LateFraction': '0.1', 'LatenessDistribution': 'uniform'})
+
+    assert schema.disorder.max_lateness_us == 5000000
+    assert schema.disorder.lateness_distribution == 'uniform'
+    assert datagen_schema.stock_schema_from_properties({}).disorder is None
+    with pytest.raises(ValueError):
+        datagen_schema.stock_schema_from_properties({'LateFraction': '2'})
+
+
+def read_avro_stock(data):
+    def read_long(offset):
+        value = shift = 0
+        while True:
+            byte = data[offset]
+            offset += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                return (value >> 1) ^ -(value & 1), offset
+
+    def read_string(offset):
+        length, offset = read_long(offset)
+        return data[offset:offset + length].decode('utf-8'), offset + length
+
+    ticker, offset = read_string(0)
+    event_time, offset = read_string(offset)
+    price, = struct.unpack('<f', data[offset:offset + 4])
+    branch, offset = read_long(offset + 4)
+    payload = None
+    if branch == 1:
+        payload, offset = read_string(offset)
+    assert offset == len(data)
+    return {'ticker': ticker, 'event_time': event_time, 'price': price, 'payload': payload}
+
+
+def test_binary_formats_carry_the_json_values():
+    schema = datagen_schema.stock_schema()
+    rows = records(schema, 50)
+
+    avro = list(schema.generate_entries(50, seed=1, start_us=start_us, fmt='avro'))
+    msgpack = list(schema.generate_entries(50, seed=1, start_us=start_us, fmt='msgpack'))
+
+    for row, avro_entry, msgpack_entry in zip(rows, avro, msgpack):
+        decoded = read_avro_stock(avro_entry['Data'])
+        assert decoded['ticker'] == row['ticker'] == avro_entry['PartitionKey']
+        assert decoded['event_time'] == row['event_time']
+        assert decoded['price'] == pytest.approx(row['price'], abs=1e-4)
+        assert decoded['payload'] is None
+        assert row['ticker'].encode('utf-8') in msgpack_entry['Data']
+        assert len(avro_entry['Data']) < len(msgpack_entry['Data']) < len(json.dumps(row))
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        list(datagen_schema.stock_schema().generate_entries(1, fmt='xml'))
+
+
+def test_avro_records_carry_the_payload():
+    schema = datagen_schema.stock_schema(payload_bytes=20)
+
+    decoded = [read_avro_stock(e['Data']) for e in schema.generate_entries(10, seed=1, fmt='avro')]
+
+    assert all(len(d['payload']) == 20 for d in decoded)
@@ -0,0 +1,190 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import threading
+
+import botocore
+import pytest
+from unittest.mock import MagicMock, patch
+
+import fleet_manager
+
+
+class StubMsfClient:
+    '''Applications that pass through a transitional status for `polls` describe calls'''
+
+    def __init__(self, statuses, polls=2):
+        self.statuses = dict(statuses)
+        self.polls = polls
+        self.pending = {}
+        self.snapshots = {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def transition(self, name, transitional, final):
+        self.statuses[name] = transitional
+        self.pending[name] = (self.polls, final)
+
+    def describe_application(self, ApplicationName):
+        with self.lock:
+            self.calls.append(("describe_application", ApplicationName))
+            if ApplicationName not in self.statuses:
+                raise botocore.exceptions.ClientError(
+                    {"Error": {"Code": "ResourceNotFoundException", "Message": "not found"}}, "DescribeApplication")
+            status = self.statuses[ApplicationName]
+            if ApplicationName in self.pending:
+                remaining, final = self.pending[ApplicationName]
+                if remaining > 1:
+                    self.pending[ApplicationName] = (remaining - 1, final)
+                else:
+                    del self.pending[ApplicationName]
+                    if final is None:
+                        del self.statuses[ApplicationName]
+                    else:
+                        self.statuses[ApplicationName] = final
+            return {"ApplicationDetail": {"ApplicationStatus": status, "CreateTimestamp": "ts"}}
+
+    def start_application(self, ApplicationName):
+        with self.lock:
+            self.calls.append(("start_application", ApplicationName))
+            self.transition(ApplicationName, "STARTING", "RUNNING")
+
+    def stop_application(self, ApplicationName):
+        with self.lock:
+            self.calls.append(("stop_application", ApplicationName))
+            self.transition(ApplicationName, "STOPPING", "READY")
+
+    def delete_application(self, ApplicationName, CreateTimestamp):
+        with self.lock:
+            self.calls.append(("delete_application", ApplicationName))
+            self.transition(ApplicationName, "DELETING", None)
+
+    def create_application_snapshot(self, ApplicationName, SnapshotName):
+        with self.lock:
+            self.calls.append(("create_application_snapshot", ApplicationName))
+            self.snapshots[(ApplicationName, SnapshotName)] = ["CREATING", "READY"]
+
+    def describe_application_snapshot(self, ApplicationName, SnapshotName):
+        with self.lock:
+            statuses = self.snapshots[(ApplicationName, SnapshotName)]
+            status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+            return {"SnapshotDetails": {"SnapshotName": SnapshotName, "SnapshotStatus": status}}
+
+    def called(self, method):
+        return sorted(app for m, app in self.calls if m == method)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.lock = threading.Lock()
+
+    def time(self):
+        with self.lock:
+            return self.now
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.now += seconds
+
+
+def run_fleet(client, app_names, action, **kwargs):
+    clock = FakeClock()
+    return fleet_manager.run_fleet(client, app_names, action, clock=clock.time, sleep=clock.sleep, **kwargs)
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("fleet_manager.LOGGER", MagicMock())
+def test_start_only_starts_ready_apps_and_waits_for_all():
+    client = StubMsfClient({"a": "READY", "b": "RUNNING", "c": "READY"})
+
+    results = run_fleet(client, ["a", "b", "c"], "start")
+
+    assert [(r["app"], r["status"], r["error"]) for r in results] == [
+        ("a", "RUNNING", None), ("b", "RUNNING", None), ("c", "RUNNING", None)]
+    assert client.called("start_application") == ["a", "c"]
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("fleet_manager.LOGGER", MagicMock())
+def test_stop_waits_until_apps_are_ready():
+    client = StubMsfClient({"a": "RUNNING", "b": "READY"})
+
+    results = run_fleet(client, ["a", "b"], "stop", max_workers=1)
+
+    assert [r["status"] for r in results] == ["READY", "READY"]
+    assert client.called("stop_application") == ["a"]
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("fleet_manager.LOGGER", MagicMock())
+def test_delete_waits_until_apps_are_gone():
+    client = StubMsfClient({"a": "RUNNING", "b": "READY"})
+
+    results = run_fleet(client, ["a", "b", "missing"], "delete")
+
+    assert [(r["status"], r["error"]) for r in results] == [(None, None)] * 3
+    assert client.called("delete_application") == ["a", "b"]
+    assert client.statuses == {}
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("fleet_manager.LOGGER", MagicMock())
+def test_snapshot_waits_for_the_snapshot():
+    client = StubMsfClient({"a": "RUNNING", "b": "READY"})
+
+    results = run_fleet(client, ["a", "b"], "snapshot", snapshot_name="s1")
+
+    assert results[0]["status"] == "READY" and results[0]["error"] is None
+    assert results[1]["error"] == "Unable to snapshot the app in state: READY"
+    assert client.called("create_application_snapshot") == ["a"]
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("fleet_manager.LOGGER", MagicMock())
+def test_failing_app_does_not_stop_the_others():
+    client = StubMsfClient({"a": "READY", "b": "READY"})
+
+    results = run_fleet(client, ["a", "missing", "b"], "start", max_workers=1)
+
+    assert [r["error"] for r in results] == [None, "Unable to start the app in state: None", None]
+    assert client.called("start_application") == ["a", "b"]
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("fleet_manager.LOGGER", MagicMock())
+def test_api_calls_of_all_apps_share_the_rate_limit():
+    clock = FakeClock()
+    client = StubMsfClient({name: "READY" for name in "abcd"}, polls=1)
+
+    fleet_manager.run_fleet(client, list("abcd"), "start", calls_per_second=2,
+                            clock=clock.time, sleep=clock.sleep)
+
+    # describe, start and two polls per app, the first two calls use the initial tokens
+    assert len(client.calls) == 16
+    assert clock.now >= (len(client.calls) - 2) / 2 - 1e-9
+
+
+@pytest.mark.parametrize("app_names, action, kwargs, message", [
+    (["a", "a"], "start", {}, "Applications must be distinct"),
+    (["a"], "restart", {}, "Unknown action restart"),
+    (["a"], "snapshot", {}, "A snapshot name is required"),
+])
+def test_invalid_arguments(app_names, action, kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        fleet_manager.run_fleet(MagicMock(), app_names, action, **kwargs)
+
+
+def test_report_lists_every_app(capsys):
+    results = [
+        {"app": "a", "action": "stop", "status": "READY", "error": None, "seconds": 4.0},
+        {"app": "bb", "action": "stop", "status": None, "error": "boom", "seconds": 2.0},
+    ]
+
+    fleet_manager.print_fleet_report(results, 5.0)
+
+    out = capsys.readouterr().out.splitlines()
+    assert out[1].split() == ["a", "stop", "4.0", "READY"]
+    assert out[2].split() == ["bb", "stop", "2.0", "FAILED:", "boom"]
+    assert out[3] == "1 of 2 applications succeeded in 5.0 s"
+    assert out[4] == "Duration per application: p50 2.0 s, max 4.0 s"
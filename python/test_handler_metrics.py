@@ -0,0 +1,122 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import json
+from unittest.mock import MagicMock, patch
+
+import app_waiter
+import handler_metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class StubClient:
+    '''describe_application takes a second per call and reports the scripted statuses'''
+
+    def __init__(self, clock, statuses):
+        self.clock = clock
+        self.statuses = list(statuses)
+
+    def describe_application(self, ApplicationName):
+        self.clock.advance(1)
+        return {'ApplicationDetail': {'ApplicationStatus': self.statuses.pop(0)}}
+
+
+def run(handler, event, clock):
+    lines = []
+    instrumented = handler_metrics.instrumented('handler', emit=lines.append, clock=clock)(handler)
+    result = instrumented(event, MagicMock())
+    document, = [json.loads(line) for line in lines]
+    return result, document
+
+
+def test_phases_outside_a_request_are_not_recorded():
+    with handler_metrics.phase('idle'):
+        pass
+    assert handler_metrics._active is None
+
+
+def test_instrumented_emits_an_emf_document():
+    clock = FakeClock()
+
+    def handler(event, context):
+        clock.advance(0.5)
+        with handler_metrics.phase('create'):
+            clock.advance(2)
+        return 'done'
+
+    result, document = run(handler, {'RequestType': 'Create'}, clock)
+
+    assert result == 'done'
+    assert document['Handler'] == 'handler'
+    assert document['RequestType'] == 'Create'
+    assert document['create'] == 2000
+    assert document['total'] == 2500
+    metrics, = document['_aws']['CloudWatchMetrics']
+    assert metrics['Namespace'] == handler_metrics.namespace
+    assert metrics['Dimensions'] == [['Handler', 'RequestType']]
+    assert {m['Name'] for m in metrics['Metrics']} == {'create', 'total'}
+    assert all(m['Unit'] == 'Milliseconds' for m in metrics['Metrics'])
+    assert handler_metrics._active is None
+
+
+def test_instrumented_emits_when_the_handler_raises():
+    clock = FakeClock()
+
+    def handler(event, context):
+        with handler_metrics.phase('create'):
+            clock.advance(1)
+            raise Exception('boom')
+
+    lines = []
+    instrumented = handler_metrics.instrumented('handler', emit=lines.append, clock=clock)(handler)
+    try:
+        instrumented({'PendingStart': {}}, MagicMock())
+    except Exception:
+        pass
+
+    document = json.loads(lines[0])
+    assert document['RequestType'] == 'PendingStart'
+    assert document['create'] == 1000
+    assert handler_metrics._active is None
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+def test_api_calls_and_wait_loops_are_timed():
+    clock = FakeClock()
+    client = handler_metrics.TimedClient(StubClient(clock, ['STARTING', 'STARTING', 'RUNNING']))
+    backoff = app_waiter.Backoff(app_waiter.Deadline(None, 60, clock), sleep=clock.advance)
+
+    def handler(event, context):
+        return app_waiter.wait_while(client, 'app', ['STARTING'], backoff)
+
+    with patch("random.uniform", lambda low, high: high):
+        status, document = run(handler, {'RequestType': 'Create'}, clock)
+
+    assert status == 'RUNNING'
+    # three describes of a second each and backoff sleeps of 1 and 2 seconds
+    assert document['describe_application'] == 3000
+    assert document['PhaseCounts']['describe_application'] == 3
+    assert document['wait_for_status'] == 6000
+    assert document['PhaseCounts']['wait_for_status'] == 1
+
+
+def test_timed_client_passes_attributes_through():
+    client = MagicMock()
+    client.region = 'eu-west-1'
+    client.put_record.__name__ = 'put_record'
+    timed = handler_metrics.TimedClient(client)
+
+    assert timed.region == 'eu-west-1'
+    assert timed.put_record.__name__ == 'put_record'
+    timed.put_record(Data=b'x')
+    client.put_record.assert_called_once_with(Data=b'x')
@@ -1,9 +1,12 @@
 import cfnresponse
 import botocore
+import copy
+import pytest
 from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 import msf_java_app_custom_resource_handler
+import parallelism_advisor
 
 event = {
     "RequestType": "Create",
@@ -225,3 +228,271 @@ def test_delete_stack_when_delete_application_fails(client, send):
 
     # Assert
     send.assert_called_with(event, context, cfnresponse.FAILED, {"Message": str(delete_application_response)})
+
+
+@patch("msf_java_app_custom_resource_handler.LOGGER", MagicMock())
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+@patch("time.sleep")
+def test_delete_stack_waits_for_transitions_and_deletion(sleep, client, send):
+    # Arrange
+    msfClient = MagicMock()
+    client.return_value = msfClient
+    context = {}
+    event["RequestType"] = "Delete"
+    def detail(status): return {"ApplicationDetail": {"CreateTimestamp": "ts", "ApplicationStatus": status}}
+    not_found = botocore.exceptions.ClientError(error_response={"Error": {"Message": "Resource not found", "Code": "ResourceNotFoundException"}}, operation_name="describe_application")
+    msfClient.describe_application.side_effect = [
+        detail("UPDATING"), detail("UPDATING"), detail("RUNNING"), detail("DELETING"), not_found]
+
+    # Act
+    msf_java_app_custom_resource_handler.handler(event, context)
+
+    # Assert
+    msfClient.delete_application.assert_called_once_with(ApplicationName=event["ResourceProperties"]["AppName"], CreateTimestamp="ts")
+    assert sleep.call_count == 2
+    send.assert_called_with(event, context, cfnresponse.SUCCESS, {"Message": "Successfully Deleted Application"})
+
+
+def update_event(**changes):
+    update = copy.deepcopy(event)
+    update["RequestType"] = "Update"
+    update["OldResourceProperties"] = copy.deepcopy(event["ResourceProperties"])
+    update["ResourceProperties"].update(changes)
+    return update
+
+
+def described(*statuses):
+    return [{"ApplicationDetail": {"ApplicationStatus": s, "ApplicationVersionId": 7}} for s in statuses]
+
+
+@patch("msf_java_app_custom_resource_handler.LOGGER", MagicMock())
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+@patch("time.sleep")
+def test_update_changes_only_the_changed_settings(sleep, client, send):
+    # Arrange
+    msfClient = MagicMock()
+    client.return_value = msfClient
+    context = {}
+    update = update_event(Parallelism="4", FileKey="key-v2")
+    msfClient.describe_application.side_effect = described("RUNNING", "RUNNING", "UPDATING", "RUNNING")
+
+    # Act
+    msf_java_app_custom_resource_handler.handler(update, context)
+
+    # Assert
+    msfClient.update_application.assert_called_once_with(
+        ApplicationName="app",
+        CurrentApplicationVersionId=7,
+        ApplicationConfigurationUpdate={
+            "FlinkApplicationConfigurationUpdate": {
+                "ParallelismConfigurationUpdate": {"ConfigurationTypeUpdate": "CUSTOM", "ParallelismUpdate": 4},
+            },
+            "ApplicationCodeConfigurationUpdate": {
+                "CodeContentUpdate": {"S3ContentLocationUpdate": {"FileKeyUpdate": "key-v2"}},
+            },
+        })
+    assert sleep.call_count == 1
+    send.assert_called_with(update, context, cfnresponse.SUCCESS, {"Message": "Successfully Updated Application"})
+
+
+@patch("msf_java_app_custom_resource_handler.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+def test_update_checkpointing_and_properties(client, send):
+    # Arrange
+    msfClient = MagicMock()
+    client.return_value = msfClient
+    context = {}
+    update = update_event(CheckpointInterval="5000", ApplicationProperties={"PropA": 11})
+    msfClient.describe_application.side_effect = described("READY", "READY", "READY")
+
+    # Act
+    msf_java_app_custom_resource_handler.handler(update, context)
+
+    # Assert
+    request = msfClient.update_application.call_args.kwargs["ApplicationConfigurationUpdate"]
+    assert request["FlinkApplicationConfigurationUpdate"] == {
+        "CheckpointConfigurationUpdate": {"ConfigurationTypeUpdate": "CUSTOM", "CheckpointIntervalUpdate": 5000}}
+    assert request["EnvironmentPropertyUpdates"]["PropertyGroups"][0]["PropertyMap"] == {"PropA": 11}
+    send.assert_called_with(update, context, cfnresponse.SUCCESS, {"Message": "Successfully Updated Application"})
+
+
+@patch("msf_java_app_custom_resource_handler.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+def test_update_without_relevant_changes(client, send):
+    # Arrange
+    msfClient = MagicMock()
+    client.return_value = msfClient
+    context = {}
+    update = update_event(Subnets=["subnet-1"])
+
+    # Act
+    msf_java_app_custom_resource_handler.handler(update, context)
+
+    # Assert
+    msfClient.describe_application.assert_not_called()
+    msfClient.update_application.assert_not_called()
+    send.assert_called_with(update, context, cfnresponse.SUCCESS, {"Message": "Successfully Updated Application"})
+
+
+@patch("msf_java_app_custom_resource_handler.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+def test_update_of_properties_requiring_a_new_app(client, send):
+    # Arrange
+    msfClient = MagicMock()
+    client.return_value = msfClient
+    context = {}
+    update = update_event(RuntimeEnvironment="FLINK-1_18", Parallelism="4")
+
+    # Act
+    msf_java_app_custom_resource_handler.handler(update, context)
+
+    # Assert
+    msfClient.update_application.assert_not_called()
+    send.assert_called_with(update, context, cfnresponse.FAILED, {
+        "Message": "Unable to update RuntimeEnvironment in place, the application must be recreated"})
+
+
+@patch("msf_java_app_custom_resource_handler.LOGGER", MagicMock())
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+@patch("time.sleep")
+def test_update_that_is_rolled_back(sleep, client, send):
+    # Arrange
+    msfClient = MagicMock()
+    client.return_value = msfClient
+    context = {}
+    update = update_event(ParallelismPerKpu="2")
+    msfClient.describe_application.side_effect = described("RUNNING", "RUNNING", "ROLLING_BACK", "ROLLED_BACK")
+
+    # Act
+    msf_java_app_custom_resource_handler.handler(update, context)
+
+    # Assert
+    send.assert_called_with(update, context, cfnresponse.FAILED, {"Message": "Unable to update the app, it is ROLLED_BACK"})
+
+
+@patch("msf_java_app_custom_resource_handler.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+def test_create_app_with_recommended_sizing(client, send):
+    # Arrange
+    msfClient = MagicMock()
+    client.return_value = msfClient
+    context = {}
+    create = copy.deepcopy(event)
+    create["RequestType"] = "Create"
+    create["ResourceProperties"].update(ExpectedRecordsPerSecond="100000", AverageRecordBytes="200", SourceShardCount="8")
+    msfClient.describe_application.side_effect = botocore.exceptions.ClientError(error_response={"Error": {"Message": "Resource not found", "Code": "ResourceNotFoundException"}}, operation_name="describe_application")
+    recommendation = parallelism_advisor.recommend(100000, 200, 8)
+
+    # Act
+    msf_java_app_custom_resource_handler.handler(create, context)
+
+    # Assert
+    flinkConfig = msfClient.create_application.call_args.kwargs["ApplicationConfiguration"]["FlinkApplicationConfiguration"]
+    assert flinkConfig["ParallelismConfiguration"]["Parallelism"] == recommendation["Parallelism"]
+    assert flinkConfig["ParallelismConfiguration"]["ParallelismPerKPU"] == recommendation["ParallelismPerKpu"]
+    assert flinkConfig["CheckpointConfiguration"]["CheckpointInterval"] == recommendation["CheckpointInterval"]
+    send.assert_called_with(create, context, cfnresponse.SUCCESS, {"Message": "Successfully Created Application", **recommendation})
+
+
+@patch("msf_java_app_custom_resource_handler.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+def test_update_of_the_load_that_keeps_the_sizing(client, send):
+    # Arrange
+    msfClient = MagicMock()
+    client.return_value = msfClient
+    context = {}
+    update = update_event(ExpectedRecordsPerSecond="1100", AverageRecordBytes="200")
+    update["OldResourceProperties"].update(ExpectedRecordsPerSecond="1000", AverageRecordBytes="200")
+
+    # Act
+    msf_java_app_custom_resource_handler.handler(update, context)
+
+    # Assert
+    msfClient.update_application.assert_not_called()
+    assert send.call_args[0][2] == cfnresponse.SUCCESS
+
+
+def test_resolve_applies_the_defaults_of_the_job_type():
+    props = msf_java_app_custom_resource_handler.resolve({"AppName": "app", "JobType": "STATELESS", "CheckpointInterval": "120000"})
+
+    assert props["CheckpointInterval"] == "120000"
+    assert props["SnapshotsEnabled"] == "false"
+    assert props["MetricsLevel"] == "APPLICATION"
+    stateful = msf_java_app_custom_resource_handler.resolve({"AppName": "app"})
+    assert stateful["SnapshotsEnabled"] == "true"
+    # finer metrics levels are only used when set explicitly
+    assert stateful["MetricsLevel"] == "APPLICATION"
+
+
+@pytest.mark.parametrize("changes, message", [
+    ({"JobType": "BATCH"}, "JobType must be one of"),
+    ({"MetricsLevel": "JOB"}, "MetricsLevel must be one of"),
+    ({"LogLevel": "TRACE"}, "LogLevel must be one of"),
+    ({"Parallelism": "0"}, "Parallelism must be at least 1"),
+    ({"CheckpointInterval": "often"}, "CheckpointInterval must be an integer"),
+    ({"SnapshotsEnabled": "yes"}, "SnapshotsEnabled must be true or false"),
+])
+def test_resolve_rejects_invalid_properties(changes, message):
+    with pytest.raises(Exception, match=message):
+        msf_java_app_custom_resource_handler.resolve({**event["ResourceProperties"], **changes})
+
+
+@patch("msf_java_app_custom_resource_handler.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+def test_create_app_with_monitoring_and_snapshot_configuration(client, send):
+    # Arrange
+    msfClient = MagicMock()
+    client.return_value = msfClient
+    context = {}
+    create = copy.deepcopy(event)
+    create["RequestType"] = "Create"
+    create["ResourceProperties"].update(MetricsLevel="OPERATOR", SnapshotsEnabled="false", CheckpointingEnabled="false")
+    msfClient.describe_application.side_effect = botocore.exceptions.ClientError(error_response={"Error": {"Message": "Resource not found", "Code": "ResourceNotFoundException"}}, operation_name="describe_application")
+
+    # Act
+    msf_java_app_custom_resource_handler.handler(create, context)
+
+    # Assert
+    appConfig = msfClient.create_application.call_args.kwargs["ApplicationConfiguration"]
+    assert appConfig["FlinkApplicationConfiguration"]["MonitoringConfiguration"] == {
+        "ConfigurationType": "CUSTOM", "MetricsLevel": "OPERATOR", "LogLevel": "INFO"}
+    assert appConfig["FlinkApplicationConfiguration"]["CheckpointConfiguration"]["CheckpointingEnabled"] is False
+    assert appConfig["ApplicationSnapshotConfiguration"] == {"SnapshotsEnabled": False}
+
+
+@patch("msf_java_app_custom_resource_handler.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+def test_update_of_the_job_type_changes_its_defaults(client, send):
+    # Arrange
+    msfClient = MagicMock()
+    client.return_value = msfClient
+    context = {}
+    update = update_event(JobType="STATELESS")
+    del update["ResourceProperties"]["CheckpointInterval"]
+    del update["ResourceProperties"]["MinPauseBetweenCheckpoints"]
+    msfClient.describe_application.side_effect = described("READY", "READY", "READY")
+
+    # Act
+    msf_java_app_custom_resource_handler.handler(update, context)
+
+    # Assert
+    request = msfClient.update_application.call_args.kwargs["ApplicationConfigurationUpdate"]
+    assert request["FlinkApplicationConfigurationUpdate"] == {
+        "CheckpointConfigurationUpdate": {"ConfigurationTypeUpdate": "CUSTOM", "CheckpointIntervalUpdate": 300000,
+                                          "MinPauseBetweenCheckpointsUpdate": 60000},
+    }
+    assert request["ApplicationSnapshotConfigurationUpdate"] == {"SnapshotsEnabledUpdate": False}
+    assert send.call_args[0][2] == cfnresponse.SUCCESS
@@ -0,0 +1,193 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+
+import kds_load
+import kds_producer
+from rate_limiter import TokenBucket
+
+max_hash_key = 2 ** 128 - 1
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class StubKinesisClient:
+    def __init__(self, shard_count, page_size=2, throttle_every=0):
+        step = (max_hash_key + 1) // shard_count
+        self.shards = [{
+            'ShardId': f"shardId-{i:012d}",
+            'HashKeyRange': {
+                'StartingHashKey': str(i * step),
+                'EndingHashKey': str(max_hash_key if i == shard_count - 1 else (i + 1) * step - 1)
+            }
+        } for i in range(shard_count)]
+        self.page_size = page_size
+        self.throttle_every = throttle_every
+        self.list_calls = []
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.delivered = []
+
+    def list_shards(self, **kwargs):
+        self.list_calls.append(kwargs)
+        start = int(kwargs.get('NextToken', 0))
+        response = {'Shards': self.shards[start:start + self.page_size]}
+        if start + self.page_size < len(self.shards):
+            response['NextToken'] = str(start + self.page_size)
+        return response
+
+    def put_records(self, StreamARN, Records):
+        with self.lock:
+            self.calls += 1
+            throttle = self.throttle_every and self.calls % self.throttle_every == 0
+            results = []
+            for entry in Records:
+                if throttle:
+                    results.append({'ErrorCode': 'ProvisionedThroughputExceededException'})
+                else:
+                    self.delivered.append(entry)
+                    results.append({'SequenceNumber': '1'})
+            return {'FailedRecordCount': sum(1 for r in results if 'ErrorCode' in r), 'Records': results}
+
+    def shard_of(self, entry):
+        key = int(entry['ExplicitHashKey'])
+        for shard in self.shards:
+            hash_range = shard['HashKeyRange']
+            if int(hash_range['StartingHashKey']) <= key <= int(hash_range['EndingHashKey']):
+                return shard['ShardId']
+
+
+def entry_factory():
+    return kds_producer.to_entry(b'{"ticker": "AAPL"}', "AAPL")
+
+
+def test_token_bucket_limits_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(100, capacity=10, clock=clock.time, sleep=clock.sleep)
+
+    for _ in range(50):
+        bucket.acquire(10)
+
+    # the initial burst is free, the remaining 490 tokens take 4.9 s at 100/s
+    assert clock.now == pytest.approx(4.9)
+
+
+def test_token_bucket_rejects_requests_above_capacity():
+    bucket = TokenBucket(10, capacity=5)
+
+    with pytest.raises(ValueError):
+        bucket.acquire(6)
+
+
+def test_list_shard_hash_ranges_follows_pagination():
+    client = StubKinesisClient(shard_count=5)
+
+    ranges = kds_load.list_shard_hash_ranges(client, "arn")
+
+    assert [r[0] for r in ranges] == [s['ShardId'] for s in client.shards]
+    assert client.list_calls[0] == {'StreamARN': "arn", 'ShardFilter': {'Type': 'AT_LATEST'}}
+    assert client.list_calls[1] == {'NextToken': "2"}
+
+
+@pytest.mark.parametrize("shards, workers, expected", [
+    ([1, 2, 3, 4], 2, [[1, 2, 3, 4], [2, 3, 4, 1]]),
+    ([1, 2], 3, [[1, 2], [2, 1], [1, 2]]),
+    ([1], 2, [[1], [1]]),
+])
+def test_assign_shards(shards, workers, expected):
+    assert kds_load.assign_shards(shards, workers) == expected
+
+
+@patch("kds_producer.LOGGER", MagicMock())
+@patch("kds_load.LOGGER", MagicMock())
+def test_run_load_spreads_records_over_shards():
+    client = StubKinesisClient(shard_count=4)
+
+    summary = kds_load.run_load(client, "arn", 2000, rate=1000000, workers=4,
+                                entry_factory=entry_factory, batch_size=50)
+
+    assert summary['records'] == 2000
+    assert summary['put_calls'] == 40
+    assert summary['throttled_records'] == 0
+    per_shard = {}
+    for entry in client.delivered:
+        per_shard[client.shard_of(entry)] = per_shard.get(client.shard_of(entry), 0) + 1
+    # a single hot partition key still lands evenly on every shard
+    assert len(per_shard) == 4
+    assert max(per_shard.values()) - min(per_shard.values()) <= 4
+
+
+@patch("kds_producer.LOGGER", MagicMock())
+@patch("kds_load.LOGGER", MagicMock())
+@patch("time.sleep", MagicMock())
+def test_run_load_reports_throttling():
+    client = StubKinesisClient(shard_count=2, throttle_every=3)
+
+    summary = kds_load.run_load(client, "arn", 1000, rate=1000000, workers=1,
+                                entry_factory=entry_factory, batch_size=100)
+
+    assert summary['records'] == 1000
+    assert len(client.delivered) == 1000
+    assert summary['throttled_records'] > 0
+    assert summary['p99_latency_ms'] >= summary['p50_latency_ms']
+
+
+@patch("kds_producer.LOGGER", MagicMock())
+@patch("kds_load.LOGGER", MagicMock())
+@patch("time.sleep", MagicMock())
+def test_run_load_stops_all_workers_on_first_failure():
+    # every call is throttled, so the first batch of each worker gives up
+    client = StubKinesisClient(shard_count=2, throttle_every=1)
+
+    with pytest.raises(Exception, match="ProvisionedThroughputExceededException"):
+        kds_load.run_load(client, "arn", 100000, rate=1000000, workers=2,
+                          entry_factory=entry_factory, batch_size=10)
+
+    assert client.calls <= 2 * kds_producer.max_attempts
+
+
+@patch("kds_load.LOGGER", MagicMock())
+def test_run_load_stops_all_workers_when_a_later_worker_fails():
+    client = StubKinesisClient(shard_count=2)
+    failing = client.shards[1]['ShardId']
+    put_records = client.put_records
+
+    def fail_on_second_worker(StreamARN, Records):
+        # with an even batch size only the second worker starts its batches on the second shard
+        if client.shard_of(Records[0]) == failing:
+            raise Exception("second worker failed")
+        return put_records(StreamARN, Records)
+    client.put_records = fail_on_second_worker
+
+    with pytest.raises(Exception, match="second worker failed"):
+        kds_load.run_load(client, "arn", 100000, rate=1000000, workers=2,
+                          entry_factory=entry_factory, batch_size=10)
+
+    # the first worker stops with the failure rather than sending the whole budget
+    assert len(client.delivered) < 50000
+
+
+@pytest.mark.parametrize("rate, workers, batchSize", [
+    (0, 1, 10),
+    (-5, 1, 10),
+    (10, 0, 10),
+    (10, 1, 0),
+])
+def test_run_load_rejects_invalid_settings(rate, workers, batchSize):
+    with pytest.raises(ValueError):
+        kds_load.run_load(StubKinesisClient(shard_count=1), "arn", 10, rate, workers,
+                          entry_factory, batchSize)
@@ -0,0 +1,230 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+import kds_producer
+import lambda_kds_datagen
+
+
+class StubKinesisClient:
+    '''Records every PutRecords call and fails entries listed in fail_plan'''
+
+    def __init__(self, fail_plan=None):
+        # maps partition key -> number of times that entry should fail
+        self.fail_plan = dict(fail_plan or {})
+        self.calls = []
+        self.delivered = []
+
+    def put_records(self, StreamARN, Records):
+        self.calls.append(list(Records))
+        results = []
+        for entry in Records:
+            key = entry['PartitionKey']
+            if self.fail_plan.get(key, 0) > 0:
+                self.fail_plan[key] -= 1
+                results.append({
+                    'ErrorCode': 'ProvisionedThroughputExceededException',
+                    'ErrorMessage': 'Rate exceeded for shard'})
+            else:
+                self.delivered.append(entry)
+                results.append({'SequenceNumber': '1', 'ShardId': 'shardId-000000000000'})
+        return {
+            'FailedRecordCount': sum(1 for r in results if 'ErrorCode' in r),
+            'Records': results
+        }
+
+
+def entries(count, size=10):
+    return [kds_producer.to_entry(b"x" * size, str(i)) for i in range(count)]
+
+
+@pytest.mark.parametrize("count, expectedBatchSizes", [
+    (1, [1]),
+    (500, [500]),
+    (501, [500, 1]),
+    (1250, [500, 500, 250]),
+])
+def test_batches_respect_record_count_limit(count, expectedBatchSizes):
+    batches = list(kds_producer.batch_entries(entries(count)))
+
+    assert [len(b) for b in batches] == expectedBatchSizes
+
+
+def test_batches_respect_request_size_limit():
+    # 12 records of ~1 MiB (data + key) cannot fit in a single 5 MiB request
+    records = entries(12, size=kds_producer.max_bytes_per_record - 2)
+
+    batches = list(kds_producer.batch_entries(records))
+
+    assert [len(b) for b in batches] == [5, 5, 2]
+    for batch in batches:
+        assert sum(kds_producer.entry_size(e) for e in batch) <= kds_producer.max_bytes_per_request
+
+
+def test_record_over_size_limit_is_rejected():
+    with pytest.raises(Exception, match="exceeds"):
+        list(kds_producer.batch_entries(entries(1, size=kds_producer.max_bytes_per_record)))
+
+
+@patch("kds_producer.LOGGER", MagicMock())
+@patch("time.sleep")
+def test_put_records_sends_everything_in_batches(sleep):
+    client = StubKinesisClient()
+
+    sent = kds_producer.put_records(client, "arn", iter(entries(1200)))
+
+    assert sent == 1200
+    assert [len(c) for c in client.calls] == [500, 500, 200]
+    assert len(client.delivered) == 1200
+    sleep.assert_not_called()
+
+
+@patch("kds_producer.LOGGER", MagicMock())
+@patch("time.sleep")
+def test_put_records_retries_only_failed_entries(sleep):
+    client = StubKinesisClient(fail_plan={"3": 1, "7": 2})
+
+    kds_producer.put_records(client, "arn", entries(10))
+
+    assert [len(c) for c in client.calls] == [10, 2, 1]
+    assert [e['PartitionKey'] for e in client.calls[1]] == ["3", "7"]
+    assert [e['PartitionKey'] for e in client.calls[2]] == ["7"]
+    assert sorted(int(e['PartitionKey']) for e in client.delivered) == list(range(10))
+    assert sleep.call_count == 2
+
+
+@patch("kds_producer.LOGGER", MagicMock())
+@patch("time.sleep")
+def test_put_records_gives_up_after_max_attempts(sleep):
+    client = StubKinesisClient(fail_plan={"0": 100})
+
+    with pytest.raises(Exception, match="ProvisionedThroughputExceededException"):
+        kds_producer.put_records(client, "arn", entries(3))
+
+    assert len(client.calls) == kds_producer.max_attempts
+
+
+@patch("kds_producer.LOGGER", MagicMock())
+@patch("boto3.client")
+def test_lambda_generate_records_uses_put_records(client):
+    stub = StubKinesisClient()
+    client.return_value = stub
+
+    lambda_kds_datagen.generate_records("arn", 700)
+
+    assert [len(c) for c in stub.calls] == [500, 200]
+    assert all(e['PartitionKey'] in ['AAPL', 'AMZN', 'MSFT', 'INTC', 'TBV'] for e in stub.delivered)
+
+
+class SlowKinesisClient(StubKinesisClient):
+    '''Tracks how many calls overlap and how far the producer runs ahead'''
+
+    def __init__(self, produced, fail_plan=None):
+        super().__init__(fail_plan)
+        self.produced = produced
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.max_ahead = 0
+
+    def put_records(self, StreamARN, Records):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.max_ahead = max(self.max_ahead, self.produced[0] - len(self.delivered))
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+            return super().put_records(StreamARN, Records)
+
+
+def counting_entries(count, produced):
+    for entry in entries(count):
+        produced[0] += 1
+        yield entry
+
+
+@patch("kds_producer.LOGGER", MagicMock())
+def test_put_records_concurrently_bounds_in_flight_calls_and_memory():
+    produced = [0]
+    client = SlowKinesisClient(produced)
+
+    sent = kds_producer.put_records_concurrently(
+        client, "arn", counting_entries(20000, produced), in_flight=4)
+
+    assert sent == 20000
+    assert len(client.delivered) == 20000
+    assert 1 < client.max_active <= 4
+    # queued and in flight batches, the batch waiting to be queued and the one being assembled
+    assert client.max_ahead <= (2 * 4 + 2) * kds_producer.max_records_per_request
+
+
+@patch("kds_producer.LOGGER", MagicMock())
+@patch("kds_producer.max_attempts", 2)
+def test_put_records_concurrently_surfaces_failures():
+    client = StubKinesisClient(fail_plan={"42": 100})
+
+    with pytest.raises(Exception, match="ProvisionedThroughputExceededException"):
+        kds_producer.put_records_concurrently(client, "arn", entries(5000), in_flight=3)
+
+
+@patch("kds_producer.LOGGER", MagicMock())
+@patch("boto3.client")
+def test_lambda_handler_uses_in_flight_requests(client):
+    stub = StubKinesisClient()
+    client.return_value = stub
+    event = {
+        "RequestType": "Create",
+        "ResourceProperties": {"StreamArn": "arn", "NumberOfItems": "1200", "InFlightRequests": "3"}
+    }
+
+    with patch("cfnresponse.send") as send:
+        lambda_kds_datagen.handler(event, {})
+
+    assert len(stub.delivered) == 1200
+    assert client.call_args.kwargs["config"].max_pool_connections == 3
+    send.assert_called_with(event, {}, "SUCCESS", {"Message": "Resource created"})
+
+
+def test_aggregated_records_round_trip():
+    records = [kds_producer.to_entry(b"x" * 100, f"key-{i % 7}") for i in range(2000)]
+
+    aggregated = list(kds_producer.aggregate_entries(records, max_bytes=10000))
+
+    assert 15 < len(aggregated) < 30
+    assert all(kds_producer.entry_size(e) <= 10000 for e in aggregated)
+    assert all(e['Data'].startswith(kds_producer.kpl_magic) for e in aggregated)
+    assert aggregated[0]['PartitionKey'] == "key-0"
+    assert [e for a in aggregated for e in kds_producer.deaggregate(a)] == records
+
+
+def test_deaggregate_passes_plain_records_through():
+    entry = kds_producer.to_entry(b'{"ticker": "AAPL"}', "AAPL")
+
+    assert kds_producer.deaggregate(entry) == [entry]
+
+
+@pytest.mark.parametrize("aggregate", ["true", True])
+@patch("kds_producer.LOGGER", MagicMock())
+@patch("boto3.client")
+def test_lambda_handler_aggregates_binary_records(client, aggregate):
+    stub = StubKinesisClient()
+    client.return_value = stub
+    event = {
+        "RequestType": "Create",
+        "ResourceProperties": {"StreamArn": "arn", "NumberOfItems": "3000",
+                               "RecordFormat": "avro", "AggregateRecords": aggregate}
+    }
+
+    with patch("cfnresponse.send") as send:
+        lambda_kds_datagen.handler(event, {})
+
+    records = [e for a in stub.delivered for e in kds_producer.deaggregate(a)]
+    assert len(stub.delivered) < 10
+    assert len(records) == 3000
+    assert all(not r['Data'].startswith(b'{') for r in records)
+    send.assert_called_with(event, {}, "SUCCESS", {"Message": "Resource created"})
@@ -0,0 +1,331 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import botocore.exceptions
+import cfnresponse
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+
+import app_waiter
+import lambda_create_studio_app
+import scheduled_check
+import studio_connectors
+
+
+def create(props):
+    client = MagicMock()
+    client.describe_application.side_effect = Exception("ResourceNotFoundException")
+    lambda_create_studio_app.create_app(
+        client, 'app', 'role', 'b-1:9098', 'bootstrap-stack', 'subnet', 'topic', 'sg', 'glue', 'log-stream',
+        'ZEPPELIN-FLINK-3_0', 'blueprint', 'stack', props)
+    return client.create_application.call_args[1]['ApplicationConfiguration']
+
+
+@patch("lambda_create_studio_app.LOGGER", MagicMock())
+def test_defaults_keep_the_blueprint_configuration():
+    configuration = create(lambda_create_studio_app.resolve({'ServiceToken': 'arn'}, 'ZEPPELIN-FLINK-3_0'))
+
+    assert configuration['FlinkApplicationConfiguration']['ParallelismConfiguration'] == {
+        'ConfigurationType': 'CUSTOM', 'Parallelism': 4, 'ParallelismPerKPU': 1, 'AutoScalingEnabled': False}
+    artifacts = configuration['ZeppelinApplicationConfiguration']['CustomArtifactsConfiguration']
+    assert [a['MavenReference']['ArtifactId'] for a in artifacts] == [
+        'flink-connector-kafka', 'flink-sql-connector-kinesis', 'aws-msk-iam-auth']
+
+
+@patch("lambda_create_studio_app.LOGGER", MagicMock())
+@patch.dict("os.environ", {'Parallelism': '2'})
+def test_resource_properties_replace_the_environment():
+    props = lambda_create_studio_app.resolve(
+        {'ParallelismPerKpu': '2', 'AutoscalingEnabled': 'true', 'ConnectorBundles': ['kafka', 'msk-iam', 'hudi']},
+        'ZEPPELIN-FLINK-3_0')
+    configuration = create(props)
+
+    assert configuration['FlinkApplicationConfiguration']['ParallelismConfiguration'] == {
+        'ConfigurationType': 'CUSTOM', 'Parallelism': 2, 'ParallelismPerKPU': 2, 'AutoScalingEnabled': True}
+    artifacts = configuration['ZeppelinApplicationConfiguration']['CustomArtifactsConfiguration']
+    assert [a['MavenReference']['ArtifactId'] for a in artifacts] == [
+        'flink-connector-kafka', 'aws-msk-iam-auth', 'hudi-flink1.15-bundle']
+
+
+def test_invalid_properties_are_reported_together():
+    with pytest.raises(Exception) as e:
+        lambda_create_studio_app.resolve(
+            {'Parallelism': '0', 'ParallelismPerKpu': '9', 'AutoscalingEnabled': 'yes', 'ConnectorBundles': 'nats'},
+            'ZEPPELIN-FLINK-3_0')
+
+    message = str(e.value)
+    assert message.startswith("Invalid configuration: ")
+    assert "Parallelism must be at least 1, not 0" in message
+    assert "ParallelismPerKpu must be at least 1 and at most 8, not 9" in message
+    assert "AutoscalingEnabled must be true or false, not yes" in message
+    assert "Unknown connector bundle nats" in message
+
+
+def client_error(code):
+    return botocore.exceptions.ClientError({"Error": {"Code": code, "Message": code}}, "Operation")
+
+
+class StubStudioClient:
+    '''A Studio app going through the teardown, every change of state takes `busy` describes'''
+
+    def __init__(self, status, vpc_ids, busy=1):
+        self.status = status
+        self.vpc_ids = list(vpc_ids)
+        self.version = 1
+        self.busy = busy
+        self.transition = None
+        self.calls = []
+        self.conflicts = 0
+
+    def change(self, status, then):
+        self.status = status
+        self.transition = [then, self.busy]
+
+    def describe_application(self, ApplicationName):
+        if self.transition:
+            self.transition[1] -= 1
+            if self.transition[1] <= 0:
+                self.status, self.transition = self.transition[0], None
+        if self.status is None:
+            raise client_error("ResourceNotFoundException")
+        return {"ApplicationDetail": {
+            "ApplicationStatus": self.status,
+            "ApplicationVersionId": self.version,
+            "CreateTimestamp": "ts",
+            "ApplicationConfigurationDescription": {
+                "VpcConfigurationDescriptions": [{"VpcConfigurationId": v} for v in self.vpc_ids]},
+        }}
+
+    def stop_application(self, ApplicationName):
+        self.calls.append("stop")
+        self.change("STOPPING", "READY")
+
+    def delete_application_vpc_configuration(self, ApplicationName, CurrentApplicationVersionId, VpcConfigurationId):
+        if self.conflicts:
+            self.conflicts -= 1
+            raise client_error("ConcurrentModificationException")
+        assert CurrentApplicationVersionId == self.version
+        self.calls.append("detach " + VpcConfigurationId)
+        self.vpc_ids.remove(VpcConfigurationId)
+        self.version += 1
+        self.change("UPDATING", "READY")
+
+    def delete_application(self, ApplicationName, CreateTimestamp):
+        self.calls.append("delete")
+        self.change("DELETING", None)
+
+
+class StubEventsClient:
+    def __init__(self):
+        self.rules = {}
+        self.targets = {}
+
+    def put_rule(self, Name, ScheduleExpression, State, Description):
+        self.rules[Name] = ScheduleExpression
+
+    def put_targets(self, Rule, Targets):
+        self.targets[Rule] = Targets
+
+    def remove_targets(self, Rule, Ids):
+        del self.targets[Rule]
+
+    def delete_rule(self, Name):
+        del self.rules[Name]
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeContext:
+    invoked_function_arn = "arn:fn"
+
+    def __init__(self, clock, remaining_seconds):
+        self.clock = clock
+        self.ends = clock.now + remaining_seconds
+
+    def get_remaining_time_in_millis(self):
+        return int((self.ends - self.clock.now) * 1000)
+
+
+def backoff(clock, context=None, seconds=300):
+    return app_waiter.Backoff(app_waiter.Deadline(context, seconds, clock), clock.sleep)
+
+
+environment = {
+    "app_name": "app", "execution_role": "role", "bootstrap_string": "b-1:9098",
+    "bootstrapStackName": "bootstrap-stack", "subnet_1": "subnet", "source_topic_name": "topic",
+    "security_group": "sg", "glue_db_arn": "glue", "log_stream_arn": "log-stream",
+    "RuntimeEnvironment": "ZEPPELIN-FLINK-3_0", "blueprintName": "blueprint", "stackId": "stack",
+}
+
+
+@pytest.fixture
+def clock():
+    clock = FakeClock()
+    # the deadlines and backoffs of the handler run on the fake clock
+    with patch("app_waiter.backoff_for", lambda context=None, seconds=300: backoff(clock, context, seconds)), \
+            patch("time.time", clock):
+        yield clock
+
+
+def stub_clients(studio, events):
+    return patch("aws_clients.client", lambda service, **kwargs: events if service == "events" else studio)
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("lambda_create_studio_app.LOGGER", MagicMock())
+def test_delete_stops_the_app_and_detaches_every_vpc_configuration():
+    clock = FakeClock()
+    studio = StubStudioClient("RUNNING", ["vpc-1", "vpc-2"], busy=2)
+
+    assert lambda_create_studio_app.delete_app(studio, "app", backoff(clock))
+
+    assert studio.calls == ["stop", "detach vpc-1", "detach vpc-2", "delete"]
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("lambda_create_studio_app.LOGGER", MagicMock())
+def test_delete_retries_a_detach_conflicting_with_another_change():
+    clock = FakeClock()
+    studio = StubStudioClient("READY", ["vpc-1"])
+    studio.conflicts = 1
+
+    assert lambda_create_studio_app.delete_app(studio, "app", backoff(clock))
+
+    assert studio.calls == ["detach vpc-1", "delete"]
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("lambda_create_studio_app.LOGGER", MagicMock())
+def test_delete_resumes_where_an_earlier_call_stopped():
+    clock = FakeClock()
+    studio = StubStudioClient("READY", ["vpc-1", "vpc-2"], busy=100)
+
+    assert not lambda_create_studio_app.delete_app(studio, "app", backoff(clock, seconds=60))
+    assert studio.calls == ["detach vpc-1"]
+
+    studio.busy = studio.transition[1] = 1
+    assert lambda_create_studio_app.delete_app(studio, "app", backoff(clock))
+    assert studio.calls == ["detach vpc-1", "detach vpc-2", "delete"]
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("lambda_create_studio_app.LOGGER", MagicMock())
+@patch.dict("os.environ", environment)
+@patch("cfnresponse.send")
+def test_handler_schedules_a_check_when_the_delete_outlasts_the_lambda(send, clock):
+    event = {"RequestType": "Delete", "RequestId": "r1", "ResourceProperties": {}}
+    studio = StubStudioClient("RUNNING", ["vpc-1"], busy=100)
+    events = StubEventsClient()
+
+    with stub_clients(studio, events):
+        lambda_create_studio_app.handler(event, FakeContext(clock, 60))
+
+    send.assert_not_called()
+    assert studio.calls == ["stop"]
+    assert events.rules == {"msf-studio-delete-r1": "rate(1 minute)"}
+    target, = events.targets["msf-studio-delete-r1"]
+    assert json.loads(target["Input"]) == {
+        "PendingDelete": {"Event": event, "Deadline": clock.now + scheduled_check.timeout_seconds}}
+
+
+@pytest.mark.parametrize("busy, now, cfnResponseStatus, cfnResponseMsg", [
+    (1, 1000.0, cfnresponse.SUCCESS, "Successfully Deleted Application"),
+    (100, 1000.0, None, None),
+    (100, 5000.0, cfnresponse.FAILED, "Operation timed out"),
+])
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("lambda_create_studio_app.LOGGER", MagicMock())
+@patch.dict("os.environ", environment)
+@patch("cfnresponse.send")
+def test_handler_checks_pending_delete(send, clock, busy, now, cfnResponseStatus, cfnResponseMsg):
+    clock.now = now
+    event = {"RequestType": "Delete", "RequestId": "r1", "ResourceProperties": {}}
+    studio = StubStudioClient("UPDATING", [], busy=busy)
+    studio.transition = ["READY", busy]
+    events = StubEventsClient()
+    events.rules["msf-studio-delete-r1"] = "rate(1 minute)"
+    events.targets["msf-studio-delete-r1"] = [{"Id": "check"}]
+    context = FakeContext(clock, 300)
+
+    with stub_clients(studio, events):
+        lambda_create_studio_app.handler({"PendingDelete": {"Event": event, "Deadline": 4000.0}}, context)
+
+    if cfnResponseStatus is None:
+        send.assert_not_called()
+        assert "msf-studio-delete-r1" in events.rules
+    else:
+        send.assert_called_once_with(event, context, cfnResponseStatus, {"Message": cfnResponseMsg})
+        assert events.rules == {} and events.targets == {}
+    # a check ends before the next one starts
+    assert clock.now - now < lambda_create_studio_app.check_seconds
+
+
+def studio_detail(parallelism=4, bundles=None):
+    artifacts = studio_connectors.custom_artifacts(bundles or studio_connectors.default_bundles, 'ZEPPELIN-FLINK-3_0')
+    return {"ApplicationDetail": {
+        "ApplicationStatus": "RUNNING",
+        "ApplicationVersionId": 7,
+        "ApplicationConfigurationDescription": {
+            "FlinkApplicationConfigurationDescription": {"ParallelismConfigurationDescription": {
+                "ConfigurationType": "CUSTOM", "Parallelism": parallelism, "ParallelismPerKPU": 1,
+                "AutoScalingEnabled": False, "CurrentParallelism": parallelism}},
+            "ZeppelinApplicationConfigurationDescription": {"CustomArtifactsConfigurationDescription": [
+                {"ArtifactType": a["ArtifactType"], "MavenReferenceDescription": a["MavenReference"]}
+                for a in artifacts]},
+        },
+    }}
+
+
+def update_event(**props):
+    return {"RequestType": "Update", "RequestId": "r1", "ResourceProperties": props, "OldResourceProperties": {}}
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("lambda_create_studio_app.LOGGER", MagicMock())
+@patch.dict("os.environ", environment)
+@patch("cfnresponse.send")
+def test_update_applies_the_changed_parallelism(send):
+    studio = MagicMock()
+    studio.describe_application.return_value = studio_detail()
+    event = update_event(Parallelism="8", ConnectorBundles="kafka,msk-iam")
+
+    with stub_clients(studio, StubEventsClient()):
+        lambda_create_studio_app.handler(event, {})
+
+    studio.create_application.assert_not_called()
+    studio.update_application.assert_called_once()
+    kwargs = studio.update_application.call_args.kwargs
+    assert kwargs["CurrentApplicationVersionId"] == 7
+    update = kwargs["ApplicationConfigurationUpdate"]
+    assert update["FlinkApplicationConfigurationUpdate"] == {"ParallelismConfigurationUpdate": {
+        "ConfigurationTypeUpdate": "CUSTOM", "ParallelismUpdate": 8, "ParallelismPerKPUUpdate": 1,
+        "AutoScalingEnabledUpdate": False}}
+    artifacts = update["ZeppelinApplicationConfigurationUpdate"]["CustomArtifactsConfigurationUpdate"]
+    assert [a["MavenReference"]["ArtifactId"] for a in artifacts] == ["flink-connector-kafka", "aws-msk-iam-auth"]
+    send.assert_called_once_with(event, {}, cfnresponse.SUCCESS, {"Message": "Successfully Updated Application"})
+
+
+@patch("app_waiter.LOGGER", MagicMock())
+@patch("lambda_create_studio_app.LOGGER", MagicMock())
+@patch.dict("os.environ", environment)
+@patch("cfnresponse.send")
+def test_update_without_changes_leaves_the_app_alone(send):
+    studio = MagicMock()
+    studio.describe_application.return_value = studio_detail()
+    event = update_event(Parallelism="4")
+
+    with stub_clients(studio, StubEventsClient()):
+        lambda_create_studio_app.handler(event, {})
+
+    studio.update_application.assert_not_called()
+    send.assert_called_once_with(event, {}, cfnresponse.SUCCESS, {"Message": "Successfully Updated Application"})
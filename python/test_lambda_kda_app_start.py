@@ -2,10 +2,12 @@
 # Apache-2.0
 
 import cfnresponse
+import json
 import pytest
 from unittest.mock import MagicMock, patch
 
 import lambda_msf_app_start
+import scheduled_check
 
 
 @pytest.mark.parametrize("requestType, statuses, shouldStart, shouldSleep, cfnResponseStatus, cfnResponseMsg", [
@@ -75,7 +77,8 @@ def test_handler_when_create_and_update(sleep, client, send, requestType, status
     if shouldStart:
         msfClient.start_application.assert_called_with(ApplicationName="a")
     if shouldSleep:
-        sleep.assert_called_with(1)
+        # the first poll waits for the jittered initial delay
+        assert 0.5 <= sleep.call_args_list[0][0][0] <= 1
     send.assert_called_with(event, context, cfnResponseStatus, {
                             "Message": cfnResponseMsg})
 
@@ -202,7 +205,6 @@ def test_handler_when_start_application_fails(sleep, client, send):
 
 
 @patch("lambda_msf_app_start.timeout_seconds", 2)
-@patch("lambda_msf_app_start.poll_interval_seconds", 10)
 @patch("lambda_msf_app_start.LOGGER", MagicMock())
 @patch("cfnresponse.send")
 @patch("boto3.client")
@@ -232,3 +234,268 @@ def test_handler_when_times_out(sleep, client, send):
     # Assert
     send.assert_called_with(event, context, cfnresponse.FAILED, {
                             "Message": "Operation timed out"})
+
+
+class StubMsfClient:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.started = []
+
+    def describe_application(self, ApplicationName):
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return {"ApplicationDetail": {"ApplicationStatus": status}}
+
+    def start_application(self, ApplicationName):
+        self.started.append(ApplicationName)
+
+
+class StubEventsClient:
+    def __init__(self):
+        self.rules = {}
+        self.targets = {}
+
+    def put_rule(self, Name, ScheduleExpression, State, Description):
+        self.rules[Name] = ScheduleExpression
+
+    def put_targets(self, Rule, Targets):
+        self.targets[Rule] = Targets
+
+    def remove_targets(self, Rule, Ids):
+        del self.targets[Rule]
+
+    def delete_rule(self, Name):
+        del self.rules[Name]
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def async_event(requestType="Create"):
+    return {
+        "RequestType": requestType,
+        "RequestId": "r1",
+        "ResourceProperties": {
+            "AppName": "a",
+            "Async": "true"
+        }
+    }
+
+
+def stub_clients(client, msfClient, eventsClient):
+    client.side_effect = lambda service, **kwargs: eventsClient if service == "events" else msfClient
+
+
+@pytest.mark.parametrize("requestType", ["Create", "Update"])
+@patch("lambda_msf_app_start.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+@patch("time.sleep")
+def test_handler_async_schedules_status_check(sleep, client, send, requestType):
+    event = async_event(requestType)
+    context = MagicMock(invoked_function_arn="arn:fn")
+    msfClient = StubMsfClient(["READY", "STARTING"])
+    eventsClient = StubEventsClient()
+    stub_clients(client, msfClient, eventsClient)
+
+    with patch("time.time", FakeClock()):
+        lambda_msf_app_start.handler(event, context)
+
+    assert msfClient.started == ["a"]
+    sleep.assert_not_called()
+    send.assert_not_called()
+    assert eventsClient.rules == {"msf-app-start-r1": "rate(1 minute)"}
+    target, = eventsClient.targets["msf-app-start-r1"]
+    assert target["Arn"] == "arn:fn"
+    assert json.loads(target["Input"]) == {
+        "PendingStart": {"Event": event, "Deadline": 1000.0 + scheduled_check.timeout_seconds}}
+
+
+@patch("lambda_msf_app_start.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+def test_handler_async_responds_when_already_running(client, send):
+    event = async_event()
+    context = MagicMock()
+    msfClient = StubMsfClient(["RUNNING"])
+    eventsClient = StubEventsClient()
+    stub_clients(client, msfClient, eventsClient)
+
+    lambda_msf_app_start.handler(event, context)
+
+    assert msfClient.started == []
+    assert eventsClient.rules == {}
+    send.assert_called_with(event, context, cfnresponse.SUCCESS, {"Message": "Resource created"})
+
+
+@patch("lambda_msf_app_start.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+def test_handler_async_fails_when_start_fails(client, send):
+    event = async_event()
+    context = MagicMock()
+    stub_clients(client, StubMsfClient(["READY", "FAILED"]), StubEventsClient())
+
+    lambda_msf_app_start.handler(event, context)
+
+    send.assert_called_with(event, context, cfnresponse.FAILED, {
+                            "Message": "Unable to start the app in state: FAILED"})
+
+
+@pytest.mark.parametrize("status, now, cfnResponseStatus, cfnResponseMsg", [
+    ("STARTING", 1000.0, None, None),
+    ("STARTING", 2000.0, cfnresponse.FAILED, "Operation timed out"),
+    ("RUNNING", 1000.0, cfnresponse.SUCCESS, "Resource created"),
+    ("READY", 1000.0, cfnresponse.FAILED, "Unable to start the app in state: READY"),
+])
+@patch("lambda_msf_app_start.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+def test_handler_async_checks_pending_start(client, send, status, now, cfnResponseStatus, cfnResponseMsg):
+    event = async_event()
+    context = MagicMock()
+    eventsClient = StubEventsClient()
+    eventsClient.rules["msf-app-start-r1"] = "rate(1 minute)"
+    eventsClient.targets["msf-app-start-r1"] = [{"Id": "check"}]
+    stub_clients(client, StubMsfClient([status]), eventsClient)
+
+    with patch("time.time", FakeClock(now)):
+        lambda_msf_app_start.handler({"PendingStart": {"Event": event, "Deadline": 1500.0}}, context)
+
+    if cfnResponseStatus is None:
+        send.assert_not_called()
+        assert "msf-app-start-r1" in eventsClient.rules
+    else:
+        send.assert_called_once_with(event, context, cfnResponseStatus, {"Message": cfnResponseMsg})
+        assert eventsClient.rules == {} and eventsClient.targets == {}
+
+
+@pytest.mark.parametrize("props, runConfiguration", [
+    ({}, None),
+    ({"ApplicationRestoreType": "SKIP_RESTORE"},
+     {"ApplicationRestoreConfiguration": {"ApplicationRestoreType": "SKIP_RESTORE"}}),
+    ({"ApplicationRestoreType": "RESTORE_FROM_CUSTOM_SNAPSHOT", "SnapshotName": "s1", "AllowNonRestoredState": "true"},
+     {"ApplicationRestoreConfiguration": {"ApplicationRestoreType": "RESTORE_FROM_CUSTOM_SNAPSHOT", "SnapshotName": "s1"},
+      "FlinkRunConfiguration": {"AllowNonRestoredState": True}}),
+    ({"AllowNonRestoredState": "false"}, {"FlinkRunConfiguration": {"AllowNonRestoredState": False}}),
+])
+def test_run_configuration_of(props, runConfiguration):
+    assert lambda_msf_app_start.run_configuration_of(props) == runConfiguration
+
+
+@pytest.mark.parametrize("props, message", [
+    ({"ApplicationRestoreType": "RESTORE"}, "Unknown ApplicationRestoreType: RESTORE"),
+    ({"ApplicationRestoreType": "RESTORE_FROM_CUSTOM_SNAPSHOT"}, "SnapshotName is required"),
+])
+def test_run_configuration_of_invalid_properties(props, message):
+    with pytest.raises(Exception, match=message):
+        lambda_msf_app_start.run_configuration_of(props)
+
+
+class StubRestartClient:
+    '''Running app that moves through STOPPING and STARTING for one describe call'''
+
+    def __init__(self, status="RUNNING"):
+        self.status = status
+        self.next_status = None
+        self.calls = []
+
+    def describe_application(self, ApplicationName):
+        status = self.status
+        if self.next_status:
+            self.status, self.next_status = self.next_status, None
+        return {"ApplicationDetail": {"ApplicationStatus": status}}
+
+    def create_application_snapshot(self, **kwargs):
+        self.calls.append(("create_application_snapshot", kwargs))
+
+    def describe_application_snapshot(self, ApplicationName, SnapshotName):
+        return {"SnapshotDetails": {"SnapshotStatus": "READY"}}
+
+    def stop_application(self, **kwargs):
+        self.calls.append(("stop_application", kwargs))
+        self.status, self.next_status = "STOPPING", "READY"
+
+    def start_application(self, **kwargs):
+        self.calls.append(("start_application", kwargs))
+        self.status, self.next_status = "STARTING", "RUNNING"
+
+
+@pytest.mark.parametrize("restoreType, shouldSnapshot", [
+    ("RESTORE_FROM_LATEST_SNAPSHOT", True),
+    ("SKIP_RESTORE", False),
+])
+@patch("lambda_msf_app_start.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+@patch("time.sleep")
+def test_handler_snapshots_before_restart_on_update(sleep, client, send, restoreType, shouldSnapshot):
+    event = {
+        "RequestType": "Update",
+        "RequestId": "r1",
+        "ResourceProperties": {
+            "AppName": "a",
+            "RestartOnUpdate": "true",
+            "ApplicationRestoreType": restoreType
+        }
+    }
+    context = {}
+    msfClient = StubRestartClient()
+    client.return_value = msfClient
+
+    lambda_msf_app_start.handler(event, context)
+
+    runConfiguration = {"ApplicationRestoreConfiguration": {"ApplicationRestoreType": restoreType}}
+    expected = [
+        ("stop_application", {"ApplicationName": "a"}),
+        ("start_application", {"ApplicationName": "a", "RunConfiguration": runConfiguration}),
+    ]
+    if shouldSnapshot:
+        expected.insert(0, ("create_application_snapshot", {"ApplicationName": "a", "SnapshotName": "restart-r1"}))
+    assert msfClient.calls == expected
+    send.assert_called_with(event, context, cfnresponse.SUCCESS, {"Message": "Resource updated"})
+
+
+@patch("lambda_msf_app_start.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+def test_handler_does_not_restart_without_restart_on_update(client, send):
+    event = {
+        "RequestType": "Update",
+        "RequestId": "r1",
+        "ResourceProperties": {
+            "AppName": "a",
+            "ApplicationRestoreType": "RESTORE_FROM_LATEST_SNAPSHOT"
+        }
+    }
+    context = {}
+    msfClient = StubRestartClient()
+    client.return_value = msfClient
+
+    lambda_msf_app_start.handler(event, context)
+
+    assert msfClient.calls == []
+    send.assert_called_with(event, context, cfnresponse.SUCCESS, {"Message": "Resource updated"})
+
+
+@patch("lambda_msf_app_start.LOGGER", MagicMock())
+@patch("cfnresponse.send")
+@patch("boto3.client")
+def test_handler_fails_on_invalid_restore_type_before_touching_the_app(client, send):
+    event = {
+        "RequestType": "Create",
+        "ResourceProperties": {
+            "AppName": "a",
+            "ApplicationRestoreType": "RESTORE"
+        }
+    }
+    context = {}
+
+    lambda_msf_app_start.handler(event, context)
+
+    client.assert_not_called()
+    assert send.call_args[0][2] == cfnresponse.FAILED
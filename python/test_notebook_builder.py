@@ -0,0 +1,85 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import json
+import pytest
+
+import datagen_schema
+import notebook_builder
+import studio_notes
+
+
+def texts(note):
+    return [p['text'] for p in note['paragraphs']]
+
+
+def test_stock_note():
+    note = notebook_builder.datagen_note('app', 'b-1:9098', 'stocks')
+
+    assert note['id'] == studio_notes.note_id
+    assert note['path'] == '/app'
+    udf, source, datagen = texts(note)
+    assert udf.startswith('%flink \n\nclass RandomTickerUDF extends ScalarFunction')
+    assert '"AAPL", "AMZN"' in udf
+    assert 'stenv.registerFunction("random_ticker_udf", new RandomTickerUDF())' in udf
+    assert source.startswith('%flink.ssql(type=update)\nDROP TABLE IF EXISTS stock_table;')
+    assert "'topic' = 'stocks'" in source
+    assert "'properties.bootstrap.servers' = 'b-1:9098'" in source
+    assert "WATERMARK for event_time as event_time - INTERVAL '15' SECONDS" in source
+    assert datagen.startswith('%flink.ssql(parallelism=1)\n')
+    assert 'SELECT random_ticker_udf() as ticker, event_time, price from generate_stock_data;' in datagen
+    # the Studio blueprint generates prices up to 1000
+    assert "'fields.price.min' = '0.00',\n    'fields.price.max' = '1000.00'" in datagen
+    assert note['paragraphs'][2]['title'].startswith('<h3><font  color="#3071A9">3) Please run')
+
+
+def test_note_parameters():
+    note = notebook_builder.datagen_note(
+        'orders', 'b-1:9098', 'orders', schema=datagen_schema.orders_schema(), note_id='ORDERS001',
+        watermark_seconds=None, parallelism={'source_table': 4, 'datagen': 2})
+
+    source, datagen = texts(note)
+    assert source.startswith('%flink.ssql(type=update,parallelism=4)\nDROP TABLE IF EXISTS orders_table;')
+    assert 'WATERMARK' not in source
+    assert datagen.startswith('%flink.ssql(parallelism=2)\n')
+    assert "'fields.product_id.min' = '1'" in datagen
+
+
+def test_watermark_seconds():
+    note = notebook_builder.datagen_note('app', 'b-1:9098', 'stocks', watermark_seconds=5)
+    assert "INTERVAL '5' SECONDS" in texts(note)[1]
+
+
+def test_parallelism_of_unknown_paragraphs_is_rejected():
+    with pytest.raises(ValueError, match="udf"):
+        notebook_builder.datagen_note('app', 'b-1:9098', 'stocks', parallelism={'udf': 2})
+
+
+def test_note_text_is_valid_json():
+    note = notebook_builder.datagen_note('hot-keys', 'b-1:9098', 'hot', note_id='HOTKEYS01',
+                                         schema=datagen_schema.stock_schema(ticker_count=50, skew=1.2))
+
+    parsed = json.loads(notebook_builder.note_text(note))
+
+    assert parsed == note
+    assert '"T0049"' in parsed['paragraphs'][0]['text']
+
+
+def test_note_text_reports_every_problem():
+    invalid = notebook_builder.note('', [{'text': 'SELECT 1'}], note_id='abc')
+
+    with pytest.raises(ValueError) as e:
+        notebook_builder.note_text(invalid)
+
+    message = str(e.value)
+    assert message.startswith("Invalid note abc: ")
+    assert "name is required" in message
+    assert "id 'abc' is not 9 upper case letters or digits" in message
+    assert "paragraph 1 does not start with an interpreter" in message
+
+
+def test_note_size_is_limited():
+    note = notebook_builder.datagen_note('app', 'b-1:9098', 'stocks',
+                                         schema=datagen_schema.stock_schema(ticker_count=20000))
+    with pytest.raises(ValueError, match="exceed"):
+        notebook_builder.note_text(note)
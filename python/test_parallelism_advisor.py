@@ -0,0 +1,95 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import pytest
+
+import parallelism_advisor
+
+
+def test_calibrate_recovers_the_costs_of_exact_measurements():
+    model = parallelism_advisor.CostModel(25e-6, 20e-9)
+    samples = [(size, model.records_per_second(size)) for size in [100, 500, 2000]]
+
+    fitted = parallelism_advisor.calibrate(samples)
+
+    assert fitted.record_cost_seconds == pytest.approx(25e-6)
+    assert fitted.byte_cost_seconds == pytest.approx(20e-9)
+
+
+@pytest.mark.parametrize("samples", [
+    [(100, 1000), (100, 1100)],
+    [(100, 100000), (200, 1000)],
+])
+def test_calibrate_rejects_measurements_that_do_not_fit(samples):
+    with pytest.raises(ValueError):
+        parallelism_advisor.calibrate(samples)
+
+
+def test_light_load_fits_a_single_kpu():
+    assert parallelism_advisor.recommend(1000, 200) == {
+        'Parallelism': 1, 'ParallelismPerKpu': 1,
+        'CheckpointInterval': parallelism_advisor.max_checkpoint_interval_ms, 'KPUs': 1}
+
+
+def test_parallelism_covers_the_load_at_the_target_utilization():
+    model = parallelism_advisor.CostModel(100e-6, 0)
+
+    recommendation = parallelism_advisor.recommend(20000, 100, model=model)
+
+    # 10000 records/s per KPU at 70% utilization
+    assert recommendation['Parallelism'] == 3
+    assert recommendation['KPUs'] == 3
+    # 30000 - 20000 spare records/s catch up on 60 s of replay in 30 s
+    assert recommendation['CheckpointInterval'] == 30000
+
+
+def test_parallelism_is_raised_to_a_divisor_of_the_shard_count_on_shared_kpus():
+    model = parallelism_advisor.CostModel(100e-6, 0)
+
+    recommendation = parallelism_advisor.recommend(12000, 100, shard_count=7, model=model)
+
+    # two KPUs cover the load, each of the 7 shards gets its own subtask
+    assert recommendation['Parallelism'] == 7
+    assert recommendation['ParallelismPerKpu'] == 4
+    assert recommendation['KPUs'] == 2
+
+
+@pytest.mark.parametrize("records_per_second, shard_count, parallelism, parallelism_per_kpu, kpus", [
+    # 3 KPUs for 5 subtasks
+    (20000, 10, 5, 2, 3),
+    # 4 KPUs for 5 subtasks, 2 subtasks per KPU would only allocate 3
+    (27000, 5, 5, 1, 5),
+])
+def test_parallelism_not_a_multiple_of_the_required_kpus(records_per_second, shard_count, parallelism,
+                                                           parallelism_per_kpu, kpus):
+    model = parallelism_advisor.CostModel(100e-6, 0)
+
+    recommendation = parallelism_advisor.recommend(records_per_second, 100, shard_count=shard_count, model=model)
+
+    assert recommendation['Parallelism'] == parallelism
+    assert recommendation['ParallelismPerKpu'] == parallelism_per_kpu
+    assert recommendation['KPUs'] == kpus
+
+
+def test_parallelism_beyond_the_shard_count():
+    model = parallelism_advisor.CostModel(100e-6, 0)
+
+    recommendation = parallelism_advisor.recommend(60000, 100, shard_count=4, model=model)
+
+    assert recommendation['Parallelism'] == 9
+    assert recommendation['ParallelismPerKpu'] == 1
+
+
+@pytest.mark.parametrize("props, recommended", [
+    ({}, False),
+    ({'ExpectedRecordsPerSecond': '1000', 'AverageRecordBytes': '200', 'SourceShardCount': '2'}, True),
+])
+def test_recommend_from_properties(props, recommended):
+    recommendation = parallelism_advisor.recommend_from_properties(props)
+
+    assert (recommendation is not None) == recommended
+
+
+def test_recommend_from_properties_requires_the_record_size():
+    with pytest.raises(ValueError, match="AverageRecordBytes is required"):
+        parallelism_advisor.recommend_from_properties({'ExpectedRecordsPerSecond': '1000'})
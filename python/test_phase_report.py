@@ -0,0 +1,45 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import json
+
+import handler_metrics
+import phase_report
+
+
+def log_line(handler, request_type, phases):
+    recording = handler_metrics.Recording(handler, request_type, clock=lambda: 0.0)
+    for name, seconds in phases:
+        recording.add(name, seconds)
+    return "2024-01-01T00:00:00 " + json.dumps(recording.metrics(0))
+
+
+def test_metric_documents_skip_other_lines():
+    lines = [
+        "START RequestId: 1",
+        log_line('start', 'Create', [('describe_application', 0.1)]),
+        '{"not": "emf"}',
+        '{"_aws": broken',
+    ]
+
+    documents = list(phase_report.metric_documents(lines))
+
+    assert [d['Handler'] for d in documents] == ['start']
+
+
+def test_summarize_percentiles_per_phase():
+    lines = [log_line('start', 'Create', [('describe_application', seconds / 1000)] * 2)
+             for seconds in range(1, 21)]
+    lines.append(log_line('start', 'Delete', []))
+
+    groups = phase_report.summarize(phase_report.metric_documents(lines))
+
+    create = groups[('start', 'Create')]
+    assert create['requests'] == 20
+    describe = create['phases']['describe_application']
+    assert describe['requests'] == 20
+    assert describe['calls'] == 2
+    assert describe['p50'] == 20
+    assert describe['p95'] == 38
+    assert describe['max'] == 40
+    assert groups[('start', 'Delete')]['phases']['total']['requests'] == 1
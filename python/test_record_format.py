@@ -0,0 +1,73 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import struct
+import pytest
+
+import datagen_schema
+import record_format
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0, b'\x00'),
+    (-1, b'\x01'),
+    (1, b'\x02'),
+    (-64, b'\x7f'),
+    (64, b'\x80\x01'),
+])
+def test_avro_long_uses_zig_zag_varints(value, expected):
+    assert record_format.avro_long(value) == expected
+
+
+def test_avro_encoder_writes_fields_in_schema_order():
+    encoder = record_format.AvroEncoder('Test', None, [('s', 'string'), ('l', 'long'), ('f', 'float')])
+
+    assert encoder.encode(('foo', 3, 1.0)) == b'\x06foo' + b'\x06' + struct.pack('<f', 1.0)
+
+
+def test_avro_encoder_rejects_unsupported_types():
+    with pytest.raises(ValueError):
+        record_format.AvroEncoder('Test', None, [('m', 'map')])
+
+
+def test_stock_avro_schema_matches_the_java_stock_pojo():
+    schema = datagen_schema.stock_schema().avro_encoder().schema()
+
+    assert schema['name'] == 'Stock'
+    assert schema['namespace'] == 'com.amazonaws.services.kinesisanalytics.stock'
+    assert schema['fields'] == [
+        {'name': 'ticker', 'type': 'string'},
+        {'name': 'event_time', 'type': 'string'},
+        {'name': 'price', 'type': 'float'},
+        {'name': 'payload', 'type': ['null', 'string']},
+    ]
+    # with a payload the writer schema stays the same
+    assert datagen_schema.stock_schema(payload_bytes=10).avro_encoder().schema()['fields'] == schema['fields']
+
+
+def test_avro_encoder_writes_nullable_fields_as_unions():
+    encoder = record_format.AvroEncoder('Test', None, [('s', ['null', 'string']), ('l', ['null', 'long'])])
+
+    assert encoder.encode(('foo', None)) == b'\x02' + b'\x06foo' + b'\x00'
+    with pytest.raises(ValueError):
+        record_format.AvroEncoder('Test', None, [('u', ['string', 'long'])])
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("a", b'\xa1a'),
+    ("x" * 40, b'\xd9\x28' + b"x" * 40),
+    (5, b'\x05'),
+    (-3, b'\xfd'),
+    (300, b'\xcf' + struct.pack('>Q', 300)),
+    (-300, b'\xd3' + struct.pack('>q', -300)),
+    (1.5, b'\xcb' + struct.pack('>d', 1.5)),
+    (True, b'\xc3'),
+])
+def test_msgpack_values(value, expected):
+    assert record_format.msgpack_value(value) == expected
+
+
+def test_msgpack_encoder_writes_a_map_per_record():
+    encoder = record_format.MessagePackEncoder(['a', 'b'])
+
+    assert encoder.encode(('x', 1)) == b'\x82\xa1a\xa1x\xa1b\x01'
@@ -0,0 +1,130 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import os
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+
+import lambda_copy_assets_to_s3
+import s3_cleanup
+
+
+class StubS3Client:
+    '''A bucket of `count` keys, optionally with an older version and a delete marker per key'''
+
+    def __init__(self, count, versioned=False, fail_plan=None):
+        self.versioned = versioned
+        self.lock = threading.Lock()
+        self.objects = {}
+        for i in range(count):
+            key = f"job_start=1/dt=2024-01-01-00/part-{i:06d}.parquet"
+            self.objects[(key, "v2" if versioned else None)] = True
+            if versioned:
+                self.objects[(key, "v1")] = True
+                self.objects[(key, "marker")] = False
+        # maps key -> number of times deleting it fails
+        self.fail_plan = dict(fail_plan or {})
+        self.delete_calls = []
+        self.list_calls = 0
+
+    def get_bucket_versioning(self, Bucket):
+        return {'Status': 'Enabled'} if self.versioned else {}
+
+    def page(self, kwargs, marker):
+        with self.lock:
+            self.list_calls += 1
+            remaining = sorted((k for k in self.objects if k > marker), key=lambda k: (k[0], k[1] or ''))
+            return remaining[:kwargs['MaxKeys']], len(remaining) > kwargs['MaxKeys']
+
+    def list_objects_v2(self, **kwargs):
+        assert not self.versioned
+        page, truncated = self.page(kwargs, (kwargs.get('ContinuationToken', ''), None))
+        response = {'Contents': [{'Key': k} for k, _ in page], 'IsTruncated': truncated}
+        if truncated:
+            response['NextContinuationToken'] = page[-1][0]
+        return response
+
+    def list_object_versions(self, **kwargs):
+        assert self.versioned
+        page, truncated = self.page(kwargs, (kwargs.get('KeyMarker', ''), kwargs.get('VersionIdMarker', '')))
+        response = {
+            'Versions': [{'Key': k, 'VersionId': v} for k, v in page if self.objects[(k, v)]],
+            'DeleteMarkers': [{'Key': k, 'VersionId': v} for k, v in page if not self.objects[(k, v)]],
+            'IsTruncated': truncated
+        }
+        if truncated:
+            response['NextKeyMarker'], response['NextVersionIdMarker'] = page[-1]
+        return response
+
+    def delete_objects(self, Bucket, Delete):
+        assert len(Delete['Objects']) <= 1000
+        with self.lock:
+            self.delete_calls.append(len(Delete['Objects']))
+            errors = []
+            for o in Delete['Objects']:
+                if self.fail_plan.get(o['Key'], 0) > 0:
+                    self.fail_plan[o['Key']] -= 1
+                    errors.append({'Key': o['Key'], 'Code': 'InternalError', 'Message': 'Try again'})
+                else:
+                    del self.objects[(o['Key'], o.get('VersionId'))]
+            return {'Errors': errors} if errors else {}
+
+
+@patch("s3_cleanup.LOGGER", MagicMock())
+def test_empty_bucket_deletes_in_batches_of_1000():
+    s3 = StubS3Client(25500)
+
+    deleted = s3_cleanup.empty_bucket(s3, "bucket", max_workers=4)
+
+    assert deleted == 25500
+    assert s3.objects == {}
+    assert sorted(s3.delete_calls) == [500] + [1000] * 25
+
+
+@patch("s3_cleanup.LOGGER", MagicMock())
+def test_empty_bucket_deletes_versions_and_delete_markers():
+    s3 = StubS3Client(4000, versioned=True)
+
+    deleted = s3_cleanup.empty_bucket(s3, "bucket", max_workers=4)
+
+    assert deleted == 12000
+    assert s3.objects == {}
+    assert max(s3.delete_calls) == 1000
+
+
+@patch("s3_cleanup.LOGGER", MagicMock())
+@patch("time.sleep")
+def test_partial_failures_retry_only_the_failed_keys(sleep):
+    key = "job_start=1/dt=2024-01-01-00/part-000042.parquet"
+    s3 = StubS3Client(3000, fail_plan={key: 2})
+
+    assert s3_cleanup.empty_bucket(s3, "bucket") == 3000
+    assert s3.objects == {}
+    assert sorted(s3.delete_calls) == [1, 1, 1000, 1000, 1000]
+    assert sleep.call_count == 2
+
+
+@patch("s3_cleanup.LOGGER", MagicMock())
+@patch("time.sleep", MagicMock())
+def test_persistent_failures_fail_the_teardown():
+    key = "job_start=1/dt=2024-01-01-00/part-000042.parquet"
+    s3 = StubS3Client(100, fail_plan={key: 100})
+
+    with pytest.raises(Exception, match="Unable to delete 1 objects"):
+        s3_cleanup.empty_bucket(s3, "bucket")
+
+
+@patch("s3_cleanup.LOGGER", MagicMock())
+@patch("boto3.client")
+@patch("cfnresponse.send")
+def test_handler_empties_the_bucket_on_delete(send, client):
+    s3 = StubS3Client(2500)
+    client.return_value = s3
+    event = {"RequestType": "Delete"}
+
+    with patch.dict(os.environ, {"bucketName": "bucket"}):
+        lambda_copy_assets_to_s3.handler(event, {})
+
+    assert s3.objects == {}
+    send.assert_called_with(event, {}, "SUCCESS", {"Message": "Resource deletion successful!"})
@@ -0,0 +1,45 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# Apache-2.0
+
+import pytest
+
+import studio_connectors
+
+
+def references(artifacts):
+    return [(a['MavenReference']['ArtifactId'], a['MavenReference']['Version']) for a in artifacts]
+
+
+def test_default_bundles_of_flink_1_15():
+    artifacts = studio_connectors.custom_artifacts(studio_connectors.default_bundles, 'ZEPPELIN-FLINK-3_0')
+
+    assert all(a['ArtifactType'] == 'DEPENDENCY_JAR' for a in artifacts)
+    assert references(artifacts) == [
+        ('flink-connector-kafka', '1.15.4'),
+        ('flink-sql-connector-kinesis', '1.15.4'),
+        ('aws-msk-iam-auth', '1.1.6'),
+    ]
+
+
+def test_bundles_follow_the_runtime():
+    artifacts = studio_connectors.custom_artifacts(['kafka', 'iceberg', 'kafka'], 'ZEPPELIN-FLINK-2_0')
+
+    assert references(artifacts) == [('flink-sql-connector-kafka_2.12', '1.13.2'),
+                                     ('iceberg-flink-runtime-1.13', '0.13.2')]
+
+
+def test_bundle_names():
+    assert studio_connectors.bundle_names(" Kafka, hudi,,s3") == ['kafka', 'hudi', 's3']
+    assert studio_connectors.bundle_names(['kinesis']) == ['kinesis']
+
+
+def test_invalid_bundles_are_reported_together():
+    with pytest.raises(ValueError) as e:
+        studio_connectors.custom_artifacts(['kafka', 'pulsar', 'delta'], 'ZEPPELIN-FLINK-3_0')
+    assert "Unknown connector bundle pulsar" in str(e.value)
+    assert "Unknown connector bundle delta" in str(e.value)
+
+
+def test_runtime_without_bundles():
+    with pytest.raises(ValueError, match="RuntimeEnvironment must be one of"):
+        studio_connectors.custom_artifacts(['kafka'], 'ZEPPELIN-FLINK-1_0')